@@ -0,0 +1,20 @@
+"""Alert schemas shared by the correlator and the alert consumers."""
+from common.alerts.compact import (
+    ALERT_SCHEMAS,
+    CONTEXT_FIELDS,
+    EXCERPT_FIELDS,
+    AlertDecoder,
+    AlertEncoder,
+    alert_owner,
+    context_hash,
+)
+
+__all__ = [
+    "ALERT_SCHEMAS",
+    "CONTEXT_FIELDS",
+    "EXCERPT_FIELDS",
+    "AlertDecoder",
+    "AlertEncoder",
+    "alert_owner",
+    "context_hash",
+]
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Mapping
+
+from common.infra.partition_keys import device_key
+
+ALERT_SCHEMAS = (1, 2)
+
+# ``event_excerpt`` fields of a schema 1 alert, in the order the correlator writes them.
+EXCERPT_FIELDS = (
+    "event_id",
+    "event_ts",
+    "type",
+    "subtype",
+    "action",
+    "policyid",
+    "policytype",
+    "sessionid",
+    "proto",
+    "srcip",
+    "srcport",
+    "srcintf",
+    "srcintfrole",
+    "dstip",
+    "dstport",
+    "dstintf",
+    "dstintfrole",
+    "service",
+    "src_device_key",
+    "srcmac",
+    "devname",
+    "srcname",
+    "devtype",
+    "vendor",
+    "family",
+    "version",
+    "appcat",
+    "bytes_total",
+    "pkts_total",
+    "source_path",
+    "source_inode",
+)
+CONTEXT_FIELDS = ("topology_context", "device_profile", "change_context")
+
+
+def context_hash(context: Any) -> str:
+    """Stable digest of a context object; equal contents give equal hashes."""
+    canonical = json.dumps(context, sort_keys=True, separators=(",", ":"), ensure_ascii=True, default=str)
+    return hashlib.sha1(canonical.encode("utf-8"), usedforsecurity=False).hexdigest()[:16]
+
+
+def alert_owner(alert: Mapping[str, Any]) -> str:
+    """Device an alert belongs to (``src_device_key``, else ``srcip``), else its ``alert_id``."""
+    entity = alert.get("event_excerpt") or alert.get("dimensions") or {}
+    return device_key(entity) or str(alert.get("alert_id") or "")
+
+
+class AlertEncoder:
+    """Writes schema 1 alerts as compact schema 2 alerts.
+
+    ``event_excerpt`` drops its null fields. ``topology_context``,
+    ``device_profile`` and ``change_context`` are replaced by their hashes in
+    ``context_refs``; the full objects go in ``contexts`` until an alert of the
+    owner (``alert_owner``) carrying them is confirmed with ``delivered``, again
+    when they change, and once ``refresh_sec`` have passed, so a consumer that
+    missed them catches up. Alerts must be keyed by owner on the topic, so each
+    owner's alerts reach one consumer in order.
+
+    A context equal to the owner's previous one (by ``repr``, within this
+    process) reuses its hash instead of serializing and hashing it again.
+    """
+
+    def __init__(self, refresh_sec: float = 600.0, max_owners: int = 100_000, clock: Callable[[], float] = time.monotonic) -> None:
+        self.refresh_sec = refresh_sec
+        self.max_owners = max(int(max_owners), 1)
+        self.clock = clock
+        # (owner, context field) -> (hash, monotonic time it was last sent in full)
+        self._sent: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        # (owner, context field) -> (hash of the context's repr, context_hash) of the last context seen
+        self._digests: OrderedDict[tuple[str, str], tuple[int, str]] = OrderedDict()
+
+    def encode(self, alert: Mapping[str, Any]) -> dict[str, Any]:
+        owner = alert_owner(alert)
+        now = self.clock()
+        compact: dict[str, Any] = {}
+        refs: dict[str, str] = {}
+        defs: dict[str, Any] = {}
+        for field, value in alert.items():
+            if field == "schema_version":
+                compact[field] = 2
+            elif field == "event_excerpt" and isinstance(value, Mapping):
+                compact[field] = {name: item for name, item in value.items() if item is not None}
+            elif field in CONTEXT_FIELDS:
+                if not refs:
+                    compact["context_refs"] = refs
+                digest = self._digest(owner, field, value)
+                refs[field] = digest
+                if self._due(owner, field, digest, now):
+                    defs[digest] = value
+            else:
+                compact[field] = value
+        if defs:
+            compact["contexts"] = defs
+        return compact
+
+    def delivered(self, compact: Mapping[str, Any]) -> None:
+        """Record the contexts an encoded alert carried in full once the broker has acked it."""
+        defs = compact.get("contexts")
+        if not defs:
+            return
+        sent = self._sent
+        owner = alert_owner(compact)
+        now = self.clock()
+        for field, digest in (compact.get("context_refs") or {}).items():
+            if digest in defs:
+                key = (owner, field)
+                sent[key] = (digest, now)
+                sent.move_to_end(key)
+        while len(sent) > self.max_owners:
+            sent.popitem(last=False)
+
+    def _digest(self, owner: str, field: str, context: Any) -> str:
+        digests = self._digests
+        key = (owner, field)
+        fingerprint = hash(repr(context))
+        last = digests.get(key)
+        if last is not None and last[0] == fingerprint:
+            digests.move_to_end(key)
+            return last[1]
+        digest = context_hash(context)
+        digests[key] = (fingerprint, digest)
+        digests.move_to_end(key)
+        if len(digests) > self.max_owners:
+            digests.popitem(last=False)
+        return digest
+
+    def _due(self, owner: str, field: str, digest: str, now: float) -> bool:
+        key = (owner, field)
+        last = self._sent.get(key)
+        if last is None:
+            return True
+        self._sent.move_to_end(key)
+        return last[0] != digest or now - last[1] >= self.refresh_sec
+
+
+class AlertDecoder:
+    """Reads schema 1 and 2 alerts back as schema 1 alerts.
+
+    Contexts sent in full are cached by hash (LRU, ``max_contexts``). A
+    reference to a context this decoder has not seen decodes as ``{}`` and
+    counts in ``unresolved``.
+    """
+
+    def __init__(self, max_contexts: int = 100_000) -> None:
+        self.max_contexts = max(int(max_contexts), 1)
+        self.unresolved = 0
+        self._contexts: OrderedDict[str, Any] = OrderedDict()
+
+    def decode(self, alert: dict[str, Any]) -> dict[str, Any]:
+        if alert.get("schema_version") != 2:
+            return alert
+        contexts = self._contexts
+        for digest, context in (alert.get("contexts") or {}).items():
+            contexts[digest] = context
+            contexts.move_to_end(digest)
+        while len(contexts) > self.max_contexts:
+            contexts.popitem(last=False)
+
+        decoded: dict[str, Any] = {}
+        for field, value in alert.items():
+            if field == "schema_version":
+                decoded[field] = 1
+            elif field == "event_excerpt" and isinstance(value, dict):
+                excerpt = {name: value.get(name) for name in EXCERPT_FIELDS}
+                excerpt.update(value)
+                decoded[field] = excerpt
+            elif field == "context_refs":
+                for name, digest in (value or {}).items():
+                    context = contexts.get(digest)
+                    if context is None:
+                        self.unresolved += 1
+                        context = {}
+                    else:
+                        contexts.move_to_end(digest)
+                    decoded[name] = dict(context)
+            elif field != "contexts":
+                decoded[field] = value
+        return decoded
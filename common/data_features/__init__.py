@@ -1,19 +1,34 @@
 from common.data_features.adaptive import (
+    FEATURE_ENCODINGS,
     LCORE_D_SOURCE_URL,
     AdaptiveFeatureExtractor,
     FeaturePlan,
     build_feature_plan,
+    digest_event_id,
+    event_time_key,
     infer_fault_state,
+    row_digest,
+    row_entity_key,
     row_to_canonical_event,
 )
-from common.data_features.io import iter_records_from_paths
+from common.data_features.io import CsvRecord, iter_records_from_paths
+from common.data_features.vectors import FeaturePlanRegistry, FeatureVectorView, feature_vector_view
 
 __all__ = [
+    "FEATURE_ENCODINGS",
     "LCORE_D_SOURCE_URL",
     "AdaptiveFeatureExtractor",
+    "CsvRecord",
     "FeaturePlan",
+    "FeaturePlanRegistry",
+    "FeatureVectorView",
     "build_feature_plan",
+    "digest_event_id",
+    "event_time_key",
+    "feature_vector_view",
     "infer_fault_state",
     "iter_records_from_paths",
+    "row_digest",
+    "row_entity_key",
     "row_to_canonical_event",
 ]
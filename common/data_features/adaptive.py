@@ -1,18 +1,29 @@
 from __future__ import annotations
 
+import base64
 import hashlib
 import json
 import math
 import re
+import sys
+from array import array
 from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Any, Iterable, Mapping
+from functools import cached_property, lru_cache
+from typing import Any, Callable, Iterable, Mapping
+
+from common.data_features.io import CsvRecord
 
 LCORE_D_SOURCE_URL = "https://data.mendeley.com/datasets/77sztrg5ks/2"
 
 _TOKEN_RE = re.compile(r"[^a-z0-9]+")
 _GENERATED_START_TS = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
+# map: {"metric": value} per event (original contract).
+# dense: [value|null, ...] in plan.metric_fields order.
+# f32b64: base64 of little-endian float32 values, NaN for missing.
+FEATURE_ENCODINGS = ("map", "dense", "f32b64")
+
 _TIME_MARKERS = {
     "time",
     "timestamp",
@@ -207,10 +218,35 @@ class FeaturePlan:
     scenario_values: list[str]
     generated_timestamp_start: str = _GENERATED_START_TS.isoformat()
     schema_version: int = 1
+    feature_encoding: str = "map"
+    # Rows profiled when the field roles last changed, and why profiling stopped
+    # ("stable", "sample_limit", or "exhausted").
+    stable_after_rows: int = 0
+    profile_stop_reason: str = ""
 
     def to_dict(self) -> dict[str, Any]:
         return asdict(self)
 
+    def to_document(self) -> dict[str, Any]:
+        """Plan JSON as published next to the event stream, including its hash."""
+        data = self.to_dict()
+        data["plan_hash"] = self.plan_hash()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "FeaturePlan":
+        names = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def plan_hash(self) -> str:
+        return self._plan_hash
+
+    @cached_property
+    def _plan_hash(self) -> str:
+        # Plans are not mutated after build_feature_plan, so the hash is computed once.
+        raw = json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
 
 class AdaptiveFeatureExtractor:
     def __init__(
@@ -219,11 +255,17 @@ class AdaptiveFeatureExtractor:
         source_uri: str = LCORE_D_SOURCE_URL,
         max_sample_rows: int = 5000,
         max_metric_fields: int = 64,
+        feature_encoding: str = "map",
+        checkpoint_rows: int = 0,
+        stable_checkpoints: int = 0,
     ) -> None:
         self.dataset_id = dataset_id
         self.source_uri = source_uri
         self.max_sample_rows = max_sample_rows
         self.max_metric_fields = max_metric_fields
+        self.feature_encoding = feature_encoding
+        self.checkpoint_rows = checkpoint_rows
+        self.stable_checkpoints = stable_checkpoints
 
     def build_plan(self, rows: Iterable[Mapping[str, Any]]) -> FeaturePlan:
         return build_feature_plan(
@@ -232,6 +274,9 @@ class AdaptiveFeatureExtractor:
             source_uri=self.source_uri,
             max_sample_rows=self.max_sample_rows,
             max_metric_fields=self.max_metric_fields,
+            feature_encoding=self.feature_encoding,
+            checkpoint_rows=self.checkpoint_rows,
+            stable_checkpoints=self.stable_checkpoints,
         )
 
     def transform(
@@ -251,18 +296,90 @@ def build_feature_plan(
     source_uri: str = LCORE_D_SOURCE_URL,
     max_sample_rows: int = 5000,
     max_metric_fields: int = 64,
+    feature_encoding: str = "map",
+    checkpoint_rows: int = 0,
+    stable_checkpoints: int = 0,
 ) -> FeaturePlan:
+    """Profile up to ``max_sample_rows`` rows and assign field roles.
+
+    With ``checkpoint_rows`` and ``stable_checkpoints`` both set, roles are
+    re-ranked every ``checkpoint_rows`` rows and profiling stops early once they
+    have not changed for ``stable_checkpoints`` consecutive checkpoints.
+    """
+    if feature_encoding not in FEATURE_ENCODINGS:
+        raise ValueError(f"unsupported feature_encoding: {feature_encoding!r}")
     profiles: dict[str, ColumnProfile] = {}
     observed_rows = 0
+    early_stop = checkpoint_rows > 0 and stable_checkpoints > 0
+    signature: tuple[Any, ...] | None = None
+    stable_after_rows = 0
+    stable_count = 0
+    stop_reason = "exhausted"
 
     for row in rows:
         observed_rows += 1
         for key, value in row.items():
             profiles.setdefault(str(key), ColumnProfile(str(key))).observe(value)
         if observed_rows >= max_sample_rows:
+            stop_reason = "sample_limit"
             break
+        if early_stop and observed_rows % checkpoint_rows == 0:
+            current = _role_signature(_rank_roles(list(profiles.values()), max_metric_fields))
+            if current == signature:
+                stable_count += 1
+                if stable_count >= stable_checkpoints:
+                    stop_reason = "stable"
+                    break
+            else:
+                signature = current
+                stable_after_rows = observed_rows
+                stable_count = 0
 
     ordered_profiles = list(profiles.values())
+    final_roles = _rank_roles(ordered_profiles, max_metric_fields)
+    if _role_signature(final_roles) != signature:
+        stable_after_rows = observed_rows
+    selected = set(
+        final_roles["time_fields"]
+        + final_roles["label_fields"]
+        + final_roles["entity_fields"]
+        + final_roles["topology_fields"]
+        + final_roles["metric_fields"]
+        + final_roles["categorical_fields"]
+    )
+    ignored_fields = [profile.name for profile in ordered_profiles if profile.name not in selected]
+
+    return FeaturePlan(
+        dataset_id=dataset_id,
+        source_uri=source_uri,
+        observed_rows=observed_rows,
+        total_columns=len(ordered_profiles),
+        primary_time_field=final_roles["time_fields"][0] if final_roles["time_fields"] else None,
+        label_fields=final_roles["label_fields"],
+        entity_fields=final_roles["entity_fields"],
+        topology_fields=final_roles["topology_fields"],
+        metric_fields=final_roles["metric_fields"],
+        categorical_fields=final_roles["categorical_fields"],
+        ignored_fields=ignored_fields,
+        scenario_values=final_roles["scenario_values"],
+        feature_encoding=feature_encoding,
+        stable_after_rows=stable_after_rows,
+        profile_stop_reason=stop_reason,
+    )
+
+
+def _role_signature(roles: dict[str, Any]) -> tuple[Any, ...]:
+    # Which field plays which role; score-order shuffles among the same fields
+    # (e.g. metric range widths still growing) do not count as a change.
+    time_fields = roles["time_fields"]
+    return (
+        time_fields[0] if time_fields else None,
+        tuple(frozenset(roles[key]) for key in ("time_fields", "label_fields", "entity_fields", "topology_fields", "metric_fields", "categorical_fields")),
+        tuple(roles["scenario_values"]),
+    )
+
+
+def _rank_roles(ordered_profiles: list[ColumnProfile], max_metric_fields: int) -> dict[str, Any]:
     time_fields = _rank_time_fields(ordered_profiles)
     label_fields = _rank_label_fields(ordered_profiles)
     entity_fields = _rank_marker_fields(ordered_profiles, _ENTITY_MARKERS, require_name_match=True)
@@ -275,24 +392,15 @@ def build_feature_plan(
         ordered_profiles,
         excluded=set(time_fields + label_fields + entity_fields + topology_fields + metric_fields),
     )
-
-    selected = set(time_fields + label_fields + entity_fields + topology_fields + metric_fields + categorical_fields)
-    ignored_fields = [profile.name for profile in ordered_profiles if profile.name not in selected]
-
-    return FeaturePlan(
-        dataset_id=dataset_id,
-        source_uri=source_uri,
-        observed_rows=observed_rows,
-        total_columns=len(ordered_profiles),
-        primary_time_field=time_fields[0] if time_fields else None,
-        label_fields=label_fields,
-        entity_fields=entity_fields,
-        topology_fields=topology_fields,
-        metric_fields=metric_fields,
-        categorical_fields=categorical_fields,
-        ignored_fields=ignored_fields,
-        scenario_values=_scenario_values(ordered_profiles, label_fields),
-    )
+    return {
+        "time_fields": time_fields,
+        "label_fields": label_fields,
+        "entity_fields": entity_fields,
+        "topology_fields": topology_fields,
+        "metric_fields": metric_fields,
+        "categorical_fields": categorical_fields,
+        "scenario_values": _scenario_values(ordered_profiles, label_fields),
+    }
 
 
 def row_to_canonical_event(
@@ -306,7 +414,7 @@ def row_to_canonical_event(
     entity_key = _entity_key(row, plan)
     topology_context = _build_topology_context(row, plan, entity_key)
     service = _first_by_markers(row, _SERVICE_MARKERS)
-    feature_vector = _feature_vector(row, plan.metric_fields)
+    feature_vector = _encode_feature_vector(row, plan)
     categorical_context = {
         field: _clean_text(row.get(field))
         for field in plan.categorical_fields
@@ -316,7 +424,7 @@ def row_to_canonical_event(
     bytes_total = _select_metric_value(row, plan.metric_fields, _BYTES_MARKERS)
     pkts_total = _select_metric_value(row, plan.metric_fields, _PKT_MARKERS)
 
-    return {
+    event = {
         "schema_version": 1,
         "event_id": _stable_event_id(plan.dataset_id, row_index, row, run_id=run_id),
         "host": plan.dataset_id,
@@ -352,6 +460,32 @@ def row_to_canonical_event(
         "feature_vector": feature_vector,
         "categorical_context": categorical_context,
     }
+    if plan.feature_encoding != "map":
+        event["dataset_context"]["feature_plan_hash"] = plan.plan_hash()
+        event["dataset_context"]["feature_encoding"] = plan.feature_encoding
+    return event
+
+
+def event_time_key(plan: FeaturePlan) -> Callable[[Mapping[str, Any]], float | None]:
+    """Row ordering key on the plan's primary time field, as epoch seconds.
+
+    Meant for ``iter_records_from_paths(order_by=...)``; rows without a
+    parseable time return None.
+    """
+    field_name = plan.primary_time_field
+
+    def key(row: Mapping[str, Any]) -> float | None:
+        if not field_name:
+            return None
+        parsed = _parse_timestamp(row.get(field_name))
+        return None if parsed is None else parsed.timestamp()
+
+    return key
+
+
+def row_entity_key(row: Mapping[str, Any], plan: FeaturePlan) -> str:
+    """The ``src_device_key`` ``row_to_canonical_event`` would assign to this row."""
+    return _entity_key(row, plan)
 
 
 def infer_fault_state(row: Mapping[str, Any], plan: FeaturePlan) -> dict[str, Any]:
@@ -587,11 +721,21 @@ def _feature_vector(row: Mapping[str, Any], metric_fields: list[str]) -> dict[st
     return features
 
 
+def _encode_feature_vector(row: Mapping[str, Any], plan: FeaturePlan) -> Any:
+    if plan.feature_encoding == "map":
+        return _feature_vector(row, plan.metric_fields)
+    values = [_coerce_number(row.get(field_name)) for field_name in plan.metric_fields]
+    if plan.feature_encoding == "dense":
+        return values
+    packed = array("f", [math.nan if value is None else value for value in values])
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
 def _select_metric_value(row: Mapping[str, Any], metric_fields: list[str], markers: set[str]) -> int | None:
     values = []
-    for field_name in metric_fields:
-        if not _has_marker(_normalize_name(field_name), markers):
-            continue
+    for field_name in _fields_with_markers(tuple(metric_fields), frozenset(markers)):
         number = _coerce_number(row.get(field_name))
         if number is not None:
             values.append(number)
@@ -655,36 +799,18 @@ def _path_signature(
 
 
 def _first_interface_name(row: Mapping[str, Any]) -> str:
-    names = {
-        "interface",
-        "ifname",
-        "port",
-        "srcintf",
-        "src_interface",
-        "source_interface",
-    }
-    for key, value in row.items():
-        if str(key).startswith("_"):
-            continue
-        normalized = _normalize_name(str(key))
-        if "interface_type" in normalized:
-            continue
-        if normalized in names or normalized.endswith("_ifname") or normalized.endswith("_interface"):
-            text = _clean_text(value)
-            if text and not text.isdigit():
-                return text
+    for key in _interface_name_keys(_row_keys(row)):
+        text = _clean_text(row.get(key))
+        if text and not text.isdigit():
+            return text
     return ""
 
 
 def _first_interface_type(row: Mapping[str, Any]) -> str:
-    for key, value in row.items():
-        if str(key).startswith("_"):
-            continue
-        normalized = _normalize_name(str(key))
-        if "interface_type" in normalized:
-            text = _clean_text(value)
-            if text:
-                return text
+    for key in _interface_type_keys(_row_keys(row)):
+        text = _clean_text(row.get(key))
+        if text:
+            return text
     return ""
 
 
@@ -699,25 +825,79 @@ def _first_non_empty(row: Mapping[str, Any], fields: list[str]) -> str:
 
 
 def _first_by_name(row: Mapping[str, Any], names: list[str]) -> str:
+    for key in _keys_matching_names(_row_keys(row), tuple(names)):
+        text = _clean_text(row.get(key))
+        if text:
+            return text
+    return ""
+
+
+def _first_by_markers(row: Mapping[str, Any], markers: set[str]) -> str:
+    for key in _keys_matching_markers(_row_keys(row), frozenset(markers)):
+        text = _clean_text(row.get(key))
+        if text:
+            return text
+    return ""
+
+
+# Column-name matching only depends on the row's header, not its values, so the
+# lookups below are compiled once per (header, names) pair and reused for every
+# row of the same file. This keeps canonicalization cost proportional to the
+# matched columns instead of columns x candidate names.
+@lru_cache(maxsize=4096)
+def _keys_matching_names(keys: tuple[Any, ...], names: tuple[str, ...]) -> tuple[Any, ...]:
     wanted = {_normalize_name(name) for name in names}
-    for key, value in row.items():
+    matched = []
+    for key in keys:
         if str(key).startswith("_"):
             continue
         normalized = _normalize_name(str(key))
         if normalized in wanted or any(_normalized_name_matches(normalized, wanted_name) for wanted_name in wanted):
-            text = _clean_text(value)
-            if text:
-                return text
-    return ""
+            matched.append(key)
+    return tuple(matched)
 
 
-def _first_by_markers(row: Mapping[str, Any], markers: set[str]) -> str:
-    for key, value in row.items():
-        if _has_marker(_normalize_name(str(key)), markers):
-            text = _clean_text(value)
-            if text:
-                return text
-    return ""
+@lru_cache(maxsize=1024)
+def _keys_matching_markers(keys: tuple[Any, ...], markers: frozenset[str]) -> tuple[Any, ...]:
+    return tuple(key for key in keys if _has_marker(_normalize_name(str(key)), markers))
+
+
+@lru_cache(maxsize=1024)
+def _fields_with_markers(fields: tuple[str, ...], markers: frozenset[str]) -> tuple[str, ...]:
+    return tuple(field_name for field_name in fields if _has_marker(_normalize_name(field_name), markers))
+
+
+@lru_cache(maxsize=1024)
+def _interface_name_keys(keys: tuple[Any, ...]) -> tuple[Any, ...]:
+    names = {
+        "interface",
+        "ifname",
+        "port",
+        "srcintf",
+        "src_interface",
+        "source_interface",
+    }
+    matched = []
+    for key in keys:
+        if str(key).startswith("_"):
+            continue
+        normalized = _normalize_name(str(key))
+        if "interface_type" in normalized:
+            continue
+        if normalized in names or normalized.endswith("_ifname") or normalized.endswith("_interface"):
+            matched.append(key)
+    return tuple(matched)
+
+
+@lru_cache(maxsize=1024)
+def _interface_type_keys(keys: tuple[Any, ...]) -> tuple[Any, ...]:
+    matched = []
+    for key in keys:
+        if str(key).startswith("_"):
+            continue
+        if "interface_type" in _normalize_name(str(key)):
+            matched.append(key)
+    return tuple(matched)
 
 
 def _looks_like_local_path(value: str) -> bool:
@@ -803,12 +983,33 @@ def _normalize_scenario(value: Any) -> str:
     return text or "unknown_fault"
 
 
-def _stable_event_id(dataset_id: str, row_index: int, row: Mapping[str, Any], run_id: str = "") -> str:
-    raw = json.dumps(row, sort_keys=True, ensure_ascii=True, default=str)
-    seed = f"{dataset_id}|{run_id}|{row_index}|{raw}"
+def row_digest(row: Mapping[str, Any]) -> bytes:
+    """Fixed-size digest of a source row, for replay paths that re-derive event ids without the row."""
+    return hashlib.sha256(_row_identity_text(row).encode("utf-8")).digest()
+
+
+def digest_event_id(dataset_id: str, run_id: str, row_index: int, digest: bytes) -> str:
+    """Event id of a row from its ``row_digest``; every emit path derives ids this way."""
+    seed = f"{dataset_id}|{run_id}|{row_index}|{digest.hex()}"
     return hashlib.sha256(seed.encode("utf-8")).hexdigest()[:32]
 
 
+def _stable_event_id(dataset_id: str, row_index: int, row: Mapping[str, Any], run_id: str = "") -> str:
+    return digest_event_id(dataset_id, run_id, row_index, row_digest(row))
+
+
+def _row_identity_text(row: Mapping[str, Any]) -> str:
+    if isinstance(row, CsvRecord):
+        row = row.to_dict()
+    elif not isinstance(row, dict):
+        row = dict(row)
+    return json.dumps(row, sort_keys=True, ensure_ascii=True, default=str)
+
+
+def _row_keys(row: Mapping[str, Any]) -> tuple[str, ...]:
+    return row.field_names if isinstance(row, CsvRecord) else tuple(row)
+
+
 def _normalize_name(name: str) -> str:
     return _TOKEN_RE.sub("_", name.strip().lower()).strip("_")
 
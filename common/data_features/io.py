@@ -1,24 +1,94 @@
 from __future__ import annotations
 
 import csv
+import heapq
+import io
 import json
+import math
+import queue
+import re
+import threading
 import zipfile
 from pathlib import Path
-from typing import Any, Iterable, Mapping
+from typing import Any, Callable, Iterable, Iterator, Mapping, TextIO
 
 _SUPPORTED_SUFFIXES = {".csv", ".jsonl", ".ndjson", ".json"}
+_JSON_CONTAINER_KEYS = ("records", "rows", "data")
+_JSON_CHUNK_CHARS = 1 << 16
+_READ_AHEAD_BATCH_ROWS = 256
+_WHITESPACE = " \t\n\r"
+_ARRAY_SEPARATOR_RE = re.compile(r"[ \t\n\r]*,[ \t\n\r]*")
 
 
-def iter_records_from_paths(paths: Iterable[str | Path]) -> Iterable[dict[str, Any]]:
+def iter_records_from_paths(
+    paths: Iterable[str | Path],
+    read_ahead: int = 0,
+    order_by: Callable[[Mapping[str, Any]], float | None] | None = None,
+) -> Iterable[Mapping[str, Any]]:
+    """Yield rows from CSV/JSONL/JSON files, zip archives, and directories.
+
+    Inputs are concatenated file by file. With ``order_by`` every file (and zip
+    member) becomes a separate source and rows are k-way merged on that key
+    instead; see ``_merge_sources``.
+
+    With ``read_ahead > 0`` files are read and decoded on a background thread
+    that stays at most ``read_ahead`` batches of rows ahead of the consumer.
+    """
+    rows = _iter_paths(paths) if order_by is None else _merge_sources(_iter_sources(paths), order_by)
+    if read_ahead > 0:
+        return _ReadAhead(rows, read_ahead)
+    return rows
+
+
+def _iter_paths(paths: Iterable[str | Path]) -> Iterator[Mapping[str, Any]]:
+    for _, rows in _iter_sources(paths):
+        yield from rows
+
+
+def _iter_sources(paths: Iterable[str | Path]) -> Iterator[tuple[str, Iterator[Mapping[str, Any]]]]:
+    """Yield ``(source name, lazy row iterator)`` per file or zip member, in input order."""
     for raw_path in paths:
         path = Path(raw_path)
         if path.is_dir():
-            yield from iter_records_from_paths(_discover_files(path))
+            yield from _iter_sources(_discover_files(path))
             continue
         if path.suffix.lower() == ".zip":
-            yield from _iter_zip(path)
+            with zipfile.ZipFile(path) as archive:
+                members = [member for member in sorted(archive.namelist()) if Path(member).suffix.lower() in _SUPPORTED_SUFFIXES]
+            for member in members:
+                yield f"{path}!{member}", _iter_zip_member(path, member)
             continue
-        yield from _iter_file(path)
+        if path.suffix.lower() in _SUPPORTED_SUFFIXES:
+            yield str(path), _iter_file(path)
+
+
+def _merge_sources(
+    sources: Iterable[tuple[str, Iterator[Mapping[str, Any]]]],
+    order_by: Callable[[Mapping[str, Any]], float | None],
+) -> Iterator[Mapping[str, Any]]:
+    """k-way merge of per-source row streams on ``order_by(row)``.
+
+    Memory holds one pending row per source. Rows without a key inherit the
+    previous key of their source, so they stay in place within it. Ties go to
+    the earlier source. The output is monotonic as long as each source is.
+    """
+    heap: list[tuple[float, int, Mapping[str, Any], Iterator[Mapping[str, Any]]]] = []
+    for order, (_, rows) in enumerate(sources):
+        rows = iter(rows)
+        for row in rows:
+            key = order_by(row)
+            heap.append((-math.inf if key is None else key, order, row, rows))
+            break
+    heapq.heapify(heap)
+    while heap:
+        key, order, row, rows = heap[0]
+        yield row
+        for next_row in rows:
+            next_key = order_by(next_row)
+            heapq.heapreplace(heap, (key if next_key is None else next_key, order, next_row, rows))
+            break
+        else:
+            heapq.heappop(heap)
 
 
 def _discover_files(directory: Path) -> list[Path]:
@@ -31,30 +101,31 @@ def _discover_files(directory: Path) -> list[Path]:
     return files
 
 
-def _iter_zip(path: Path) -> Iterable[dict[str, Any]]:
-    with zipfile.ZipFile(path) as archive:
-        for member in sorted(archive.namelist()):
-            suffix = Path(member).suffix.lower()
-            if suffix not in _SUPPORTED_SUFFIXES:
-                continue
-            with archive.open(member) as fp:
-                text = (line.decode("utf-8", "replace") for line in fp)
-                yield from _iter_lines(member, suffix, text)
+def _iter_zip_member(path: Path, member: str) -> Iterator[Mapping[str, Any]]:
+    suffix = Path(member).suffix.lower()
+    with zipfile.ZipFile(path) as archive, archive.open(member) as fp:
+        if suffix == ".json":
+            with io.TextIOWrapper(fp, encoding="utf-8", errors="replace", newline="") as text_fp:
+                yield from _iter_json_document(member, text_fp)
+            return
+        text = (line.decode("utf-8", "replace") for line in fp)
+        yield from _iter_lines(member, suffix, text)
 
 
-def _iter_file(path: Path) -> Iterable[dict[str, Any]]:
+def _iter_file(path: Path) -> Iterator[Mapping[str, Any]]:
     suffix = path.suffix.lower()
     if suffix not in _SUPPORTED_SUFFIXES:
         return
     with path.open("r", encoding="utf-8", errors="replace", newline="") as fp:
-        yield from _iter_lines(str(path), suffix, fp)
+        if suffix == ".json":
+            yield from _iter_json_document(str(path), fp)
+        else:
+            yield from _iter_lines(str(path), suffix, fp)
 
 
-def _iter_lines(source_name: str, suffix: str, lines: Iterable[str]) -> Iterable[dict[str, Any]]:
+def _iter_lines(source_name: str, suffix: str, lines: Iterable[str]) -> Iterable[Mapping[str, Any]]:
     if suffix == ".csv":
-        reader = csv.DictReader(lines)
-        for row in reader:
-            yield _with_source(row, source_name)
+        yield from _iter_csv(source_name, lines)
         return
 
     if suffix in {".jsonl", ".ndjson"}:
@@ -65,24 +136,334 @@ def _iter_lines(source_name: str, suffix: str, lines: Iterable[str]) -> Iterable
             obj = json.loads(text)
             if isinstance(obj, dict):
                 yield _with_source(obj, source_name, line_no)
-        return
 
-    text = "".join(lines)
-    if not text.strip():
+
+def _iter_csv(source_name: str, lines: Iterable[str]) -> Iterator[Mapping[str, Any]]:
+    reader = csv.reader(lines)
+    for fieldnames in reader:
+        if fieldnames:
+            break
+    else:
         return
-    obj = json.loads(text)
-    if isinstance(obj, list):
-        for line_no, item in enumerate(obj, start=1):
+    header = _CsvHeader(fieldnames)
+    width = len(fieldnames)
+    for values in reader:
+        if not values:
+            continue
+        if len(values) > width:
+            # csv.DictReader semantics for ragged rows: extras under the None key.
+            row: dict[Any, Any] = dict(zip(fieldnames, values))
+            row[None] = values[width:]
+            yield _with_source(row, source_name)
+            continue
+        yield CsvRecord(header, values, source_name, reader.line_num)
+
+
+class _CsvHeader:
+    """Column layout shared by every ``CsvRecord`` of one CSV file."""
+
+    __slots__ = ("fieldnames", "keys", "index")
+
+    def __init__(self, fieldnames: list[str]) -> None:
+        self.fieldnames = tuple(fieldnames)
+        index: dict[str, int] = {}
+        for position, name in enumerate(fieldnames):
+            index[name] = position  # duplicate columns: last value wins, as in a dict
+        if "_source_file" not in index:
+            index["_source_file"] = _SOURCE_FILE_SLOT
+        self.index = index
+        self.keys = tuple(index)
+
+
+_SOURCE_FILE_SLOT = -1
+
+
+class CsvRecord(Mapping[str, Any]):
+    """Read-only row of a CSV file, backed by the ``csv.reader`` value list.
+
+    Provenance lives in ``source_file``/``source_line`` attributes. ``_source_file``
+    is also exposed as a key so plans and event ids match the dict rows produced
+    by ``csv.DictReader`` plus ``_with_source``.
+    """
+
+    __slots__ = ("_header", "_values", "source_file", "source_line")
+
+    def __init__(self, header: _CsvHeader, values: list[str], source_file: str, source_line: int) -> None:
+        self._header = header
+        self._values = values
+        self.source_file = source_file
+        self.source_line = source_line
+
+    @property
+    def field_names(self) -> tuple[str, ...]:
+        """Keys of this row, shared by every row of the file."""
+        return self._header.keys
+
+    def to_dict(self) -> dict[str, Any]:
+        header = self._header
+        values = self._values
+        out: dict[str, Any] = dict(zip(header.fieldnames, values))
+        if len(values) < len(header.fieldnames):
+            for name in header.fieldnames[len(values) :]:
+                out.setdefault(name, None)
+        out.setdefault("_source_file", self.source_file)
+        return out
+
+    def __getitem__(self, key: str) -> Any:
+        position = self._header.index[key]
+        if position == _SOURCE_FILE_SLOT:
+            return self.source_file
+        values = self._values
+        return values[position] if position < len(values) else None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        position = self._header.index.get(key)
+        if position is None:
+            return default
+        if position == _SOURCE_FILE_SLOT:
+            return self.source_file
+        values = self._values
+        return values[position] if position < len(values) else None
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._header.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._header.keys)
+
+    def __len__(self) -> int:
+        return len(self._header.keys)
+
+    def items(self) -> Iterator[tuple[str, Any]]:  # type: ignore[override]
+        values = self._values
+        width = len(values)
+        for key, position in self._header.index.items():
+            if position == _SOURCE_FILE_SLOT:
+                yield key, self.source_file
+            else:
+                yield key, values[position] if position < width else None
+
+    def __repr__(self) -> str:
+        return f"CsvRecord({dict(self.items())!r})"
+
+
+def _iter_json_document(source_name: str, fp: TextIO) -> Iterator[dict[str, Any]]:
+    """Stream rows out of a JSON array or a ``{"records"|"rows"|"data": [...]}`` object.
+
+    Memory stays bounded by the largest single row. For objects, the first
+    non-empty container array in document order is used; other members are
+    kept only to yield the object itself when it has no container array.
+    """
+    reader = _JsonChunkReader(fp)
+    first = reader.peek()
+    if first == "[":
+        reader.expect("[")
+        for line_no, item in enumerate(reader.iter_array(), start=1):
             if isinstance(item, dict):
                 yield _with_source(item, source_name, line_no)
-    elif isinstance(obj, dict):
-        rows = obj.get("records") or obj.get("rows") or obj.get("data")
-        if isinstance(rows, list):
-            for line_no, item in enumerate(rows, start=1):
+        return
+    if first != "{":
+        if first:
+            reader.value()
+        return
+
+    reader.expect("{")
+    members: dict[str, Any] = {}
+    found_container = False
+    yielded = 0
+    while True:
+        if reader.peek() == "}":
+            break
+        key = reader.value()
+        reader.expect(":")
+        if key in _JSON_CONTAINER_KEYS and yielded == 0 and reader.peek() == "[":
+            found_container = True
+            reader.expect("[")
+            for line_no, item in enumerate(reader.iter_array(), start=1):
                 if isinstance(item, dict):
+                    yielded += 1
                     yield _with_source(item, source_name, line_no)
         else:
-            yield _with_source(obj, source_name)
+            members[key] = reader.value()
+        if reader.peek() == ",":
+            reader.expect(",")
+    reader.expect("}")
+    if not found_container:
+        yield _with_source(members, source_name)
+
+
+class _JsonChunkReader:
+    """Incremental ``raw_decode`` over a text stream read in fixed-size chunks."""
+
+    def __init__(self, fp: TextIO, chunk_chars: int = _JSON_CHUNK_CHARS) -> None:
+        self._fp = fp
+        self._chunk_chars = chunk_chars
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_chars: int) -> bool:
+        if self._eof:
+            return False
+        if self._pos > self._chunk_chars:
+            self._buf = self._buf[self._pos :]
+            self._pos = 0
+        chunk = self._fp.read(max(self._chunk_chars, min_chars))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def peek(self) -> str:
+        while True:
+            buf = self._buf
+            pos = self._pos
+            if pos < len(buf) and buf[pos] not in _WHITESPACE:
+                return buf[pos]
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill(0):
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"expected {char!r}", self._buf, self._pos)
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read more (at least doubling the pending text so
+                # a large row is not re-parsed once per chunk) and retry.
+                if self._fill(len(self._buf) - self._pos):
+                    continue
+                raise
+            # A number or literal ending exactly at the buffer edge may continue in the next chunk.
+            if end == len(self._buf) and self._fill(0):
+                continue
+            self._pos = end
+            return obj
+
+    def iter_array(self) -> Iterator[Any]:
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        decode = self._decoder.raw_decode
+        separator = _ARRAY_SEPARATOR_RE.match
+        while True:
+            # Fast path: decode straight from the buffer while an item and the
+            # separator after it are fully buffered.
+            buf = self._buf
+            limit = len(buf)
+            pos = self._pos
+            while True:
+                try:
+                    obj, end = decode(buf, pos)
+                except json.JSONDecodeError:
+                    break
+                match = separator(buf, end) if end < limit else None
+                if match is None or match.end() >= limit:
+                    break
+                self._pos = pos = match.end()
+                yield obj
+            # Slow path: the item straddles a chunk boundary or closes the array.
+            yield self.value()
+            if self.peek() == "]":
+                self._pos += 1
+                return
+            self.expect(",")
+
+
+class _ReadAhead:
+    """Consumer side of a row iterator running on a daemon thread, handed over in batches."""
+
+    def __init__(self, rows: Iterator[Mapping[str, Any]], max_batches: int, batch_rows: int = _READ_AHEAD_BATCH_ROWS) -> None:
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(max_batches, 1))
+        self._stop = threading.Event()
+        self._batch: list[Mapping[str, Any]] = []
+        self._index = 0
+        self._finished = False
+        # The worker holds no reference to this object, so an abandoned reader is
+        # collected and its __del__ stops the thread.
+        threading.Thread(
+            target=_read_ahead_worker,
+            args=(rows, self._queue, self._stop, max(batch_rows, 1)),
+            name="lcore-read-ahead",
+            daemon=True,
+        ).start()
+
+    def __iter__(self) -> "_ReadAhead":
+        return self
+
+    def __next__(self) -> Mapping[str, Any]:
+        while self._index >= len(self._batch):
+            if self._finished:
+                raise StopIteration
+            item = self._queue.get()
+            if item is _READ_AHEAD_DONE:
+                self._finished = True
+                raise StopIteration
+            if isinstance(item, BaseException):
+                self._finished = True
+                raise item
+            self._batch = item
+            self._index = 0
+        row = self._batch[self._index]
+        self._index += 1
+        return row
+
+    def close(self) -> None:
+        self._finished = True
+        self._stop.set()
+
+    def __del__(self) -> None:
+        self._stop.set()
+
+
+_READ_AHEAD_DONE = object()
+
+
+def _read_ahead_worker(
+    rows: Iterator[Mapping[str, Any]],
+    out: "queue.Queue[Any]",
+    stop: threading.Event,
+    batch_rows: int,
+) -> None:
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    batch: list[Mapping[str, Any]] = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                if not put(batch):
+                    return
+                batch = []
+        if batch and not put(batch):
+            return
+        put(_READ_AHEAD_DONE)
+    except Exception as exc:  # re-raised on the consumer thread
+        put(exc)
+    finally:
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
 
 
 def _with_source(row: Mapping[str, Any], source_name: str, line_no: int | None = None) -> dict[str, Any]:
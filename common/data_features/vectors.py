@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import base64
+import json
+import math
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+from common.data_features.adaptive import FeaturePlan
+
+_EMPTY: Mapping[str, float] = {}
+
+
+class FeaturePlanRegistry:
+    """Metric-name layouts of published feature plans, keyed by plan hash."""
+
+    def __init__(self) -> None:
+        self._metric_fields: dict[str, tuple[str, ...]] = {}
+
+    def register(self, plan: FeaturePlan | Mapping[str, Any]) -> str:
+        if not isinstance(plan, FeaturePlan):
+            plan = FeaturePlan.from_dict(plan)
+        plan_hash = plan.plan_hash()
+        self._metric_fields[plan_hash] = tuple(plan.metric_fields)
+        return plan_hash
+
+    def load(self, path: str | Path) -> str:
+        return self.register(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def metric_fields(self, plan_hash: str) -> tuple[str, ...] | None:
+        return self._metric_fields.get(plan_hash)
+
+    def __contains__(self, plan_hash: object) -> bool:
+        return plan_hash in self._metric_fields
+
+    def __len__(self) -> int:
+        return len(self._metric_fields)
+
+
+class FeatureVectorView(Mapping[str, float]):
+    """Read-only ``{metric: value}`` view over a dense or packed feature vector.
+
+    The payload is only decoded on first access, so consumers that never look
+    at metrics do not pay for them. Missing metrics are left out, matching the
+    ``map`` encoding.
+    """
+
+    __slots__ = ("_names", "_payload", "_encoding", "_values")
+
+    def __init__(self, names: tuple[str, ...], payload: Any, encoding: str) -> None:
+        self._names = names
+        self._payload = payload
+        self._encoding = encoding
+        self._values: dict[str, float] | None = None
+
+    def _decoded(self) -> dict[str, float]:
+        if self._values is None:
+            if self._encoding == "f32b64":
+                raw = array("f")
+                raw.frombytes(base64.b64decode(self._payload))
+                if sys.byteorder != "little":
+                    raw.byteswap()
+                values: Any = raw
+            else:
+                values = self._payload
+            self._values = {
+                name: float(value)
+                for name, value in zip(self._names, values)
+                if value is not None and not math.isnan(value)
+            }
+            self._payload = None
+        return self._values
+
+    def __getitem__(self, key: str) -> float:
+        return self._decoded()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._decoded())
+
+    def __len__(self) -> int:
+        return len(self._decoded())
+
+    def __repr__(self) -> str:
+        return f"FeatureVectorView({self._decoded()!r})"
+
+
+def feature_vector_view(event: Mapping[str, Any], registry: FeaturePlanRegistry) -> Mapping[str, float]:
+    """Return the event's feature vector as a mapping regardless of its encoding.
+
+    ``map`` vectors are returned as-is. Dense and packed vectors need their plan
+    in ``registry``; an unknown plan hash raises ``KeyError``.
+    """
+    vector = event.get("feature_vector")
+    if isinstance(vector, Mapping):
+        return vector
+    if vector is None:
+        return _EMPTY
+    context = event.get("dataset_context") or {}
+    plan_hash = str(context.get("feature_plan_hash") or "")
+    names = registry.metric_fields(plan_hash)
+    if names is None:
+        raise KeyError(f"unknown feature plan hash: {plan_hash!r}")
+    encoding = str(context.get("feature_encoding") or ("f32b64" if isinstance(vector, str) else "dense"))
+    return FeatureVectorView(names, vector, encoding)
@@ -0,0 +1,244 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+from common.infra.config import env_float, env_int, env_str
+
+LOGGER = logging.getLogger(__name__)
+
+COMMIT_MODES = ("async", "sync")
+
+
+@dataclass(frozen=True)
+class KafkaBatchSettings:
+    max_records: int = 500
+    poll_timeout_ms: int = 1000
+    commit_interval_sec: float = 1.0
+    commit_every_records: int = 5000
+    commit_mode: str = "async"
+    send_timeout_sec: float = 30.0
+    max_idle_polls: int = 0
+
+    @classmethod
+    def from_env(cls) -> "KafkaBatchSettings":
+        commit_mode = env_str("KAFKA_COMMIT_MODE", cls.commit_mode).lower()
+        if commit_mode not in COMMIT_MODES:
+            LOGGER.warning("invalid KAFKA_COMMIT_MODE=%s, fallback to %s", commit_mode, cls.commit_mode)
+            commit_mode = cls.commit_mode
+        return cls(
+            max_records=max(1, env_int("KAFKA_BATCH_MAX_RECORDS", cls.max_records)),
+            poll_timeout_ms=max(0, env_int("KAFKA_POLL_TIMEOUT_MS", cls.poll_timeout_ms)),
+            commit_interval_sec=max(0.0, env_float("KAFKA_COMMIT_INTERVAL_SEC", cls.commit_interval_sec)),
+            commit_every_records=max(0, env_int("KAFKA_COMMIT_EVERY_RECORDS", cls.commit_every_records)),
+            commit_mode=commit_mode,
+            send_timeout_sec=max(0.1, env_float("KAFKA_SEND_TIMEOUT_SEC", cls.send_timeout_sec)),
+            max_idle_polls=max(0, env_int("KAFKA_MAX_IDLE_POLLS", cls.max_idle_polls)),
+        )
+
+
+class OffsetTracker:
+    """Highest fully processed offset per (topic, partition), and what is left to commit.
+
+    Records of one partition are handled in offset order, so acknowledging an
+    offset means every earlier record of that partition is finished as well.
+    """
+
+    def __init__(self) -> None:
+        self._acked: dict[tuple[str, int], int] = {}
+        self._committed: dict[tuple[str, int], int] = {}
+
+    def ack(self, topic: str, partition: int, offset: int) -> None:
+        key = (topic, partition)
+        if offset > self._acked.get(key, -1):
+            self._acked[key] = offset
+
+    def pending(self) -> dict[tuple[str, int], int]:
+        """Next offset to commit for every partition that moved since the last commit."""
+        return {
+            key: offset + 1
+            for key, offset in self._acked.items()
+            if offset + 1 > self._committed.get(key, -1)
+        }
+
+    def mark_committed(self, offsets: dict[tuple[str, int], int]) -> None:
+        for key, offset in offsets.items():
+            if offset > self._committed.get(key, -1):
+                self._committed[key] = offset
+
+    def committed(self) -> dict[tuple[str, int], int]:
+        """Next offset last committed per partition by this member."""
+        return dict(self._committed)
+
+    def forget(self, partitions: Any) -> None:
+        for item in partitions:
+            key = (item.topic, item.partition)
+            self._acked.pop(key, None)
+            self._committed.pop(key, None)
+
+
+class BatchConsumer:
+    """Poll records in batches and commit processed offsets periodically.
+
+    Callers ``ack`` each record once it is fully handled (including its
+    produced records) and call ``maybe_commit`` after each batch. Commits are
+    sent when ``commit_interval_sec`` has passed or ``commit_every_records``
+    acks have accumulated; ``close`` does a final synchronous commit.
+    """
+
+    def __init__(self, consumer: Any, settings: KafkaBatchSettings, stats: dict[str, int]) -> None:
+        self.consumer = consumer
+        self.settings = settings
+        self.stats = stats
+        self.tracker = OffsetTracker()
+        self._acks_since_commit = 0
+        self._last_commit = time.monotonic()
+        stats.setdefault("commit_error", 0)
+        stats.setdefault("commits", 0)
+        stats.setdefault("batches", 0)
+
+    def batches(self) -> Iterator[list[Any]]:
+        idle_polls = 0
+        while True:
+            records = self.consumer.poll(
+                timeout_ms=self.settings.poll_timeout_ms,
+                max_records=self.settings.max_records,
+            )
+            batch = [msg for partition_records in records.values() for msg in partition_records]
+            if not batch:
+                idle_polls += 1
+                self.maybe_commit()
+                if self.settings.max_idle_polls and idle_polls >= self.settings.max_idle_polls:
+                    return
+                continue
+            idle_polls = 0
+            self.stats["batches"] += 1
+            yield batch
+
+    def ack(self, msg: Any) -> None:
+        self.tracker.ack(msg.topic, msg.partition, msg.offset)
+        self._acks_since_commit += 1
+
+    def maybe_commit(self) -> None:
+        due_by_count = self.settings.commit_every_records and self._acks_since_commit >= self.settings.commit_every_records
+        due_by_time = time.monotonic() - self._last_commit >= self.settings.commit_interval_sec
+        if due_by_count or due_by_time:
+            self.commit(asynchronous=self.settings.commit_mode == "async")
+
+    def commit(self, asynchronous: bool = False) -> None:
+        self._last_commit = time.monotonic()
+        pending = self.tracker.pending()
+        if not pending:
+            return
+        self._acks_since_commit = 0
+        offsets = _commit_offsets(pending)
+        if asynchronous:
+            try:
+                self.consumer.commit_async(offsets=offsets, callback=self._on_async_commit(pending))
+            except Exception:
+                self.stats["commit_error"] += 1
+                LOGGER.exception("async offset commit failed")
+            return
+        try:
+            self.consumer.commit(offsets=offsets)
+        except Exception:
+            self.stats["commit_error"] += 1
+            LOGGER.exception("offset commit failed")
+            return
+        self.stats["commits"] += 1
+        self.tracker.mark_committed(pending)
+
+    def close(self) -> None:
+        self.commit(asynchronous=False)
+
+    def release(self, partitions: Any) -> None:
+        """Commit what was processed before ``partitions`` move to another member."""
+        self.commit(asynchronous=False)
+        self.tracker.forget(partitions)
+
+    def _on_async_commit(self, pending: dict[tuple[str, int], int]) -> Any:
+        def _callback(_offsets: Any, response: Any) -> None:
+            if isinstance(response, Exception):
+                self.stats["commit_error"] += 1
+                LOGGER.warning("async offset commit failed: %s", response)
+                return
+            self.stats["commits"] += 1
+            self.tracker.mark_committed(pending)
+
+        return _callback
+
+
+class PipelinedSender:
+    """Send without waiting per record; ``gather`` waits for the whole batch.
+
+    Each send carries a caller ``token``. ``gather`` returns ``(token, error)``
+    pairs in send order, with ``error`` set to the exception for failed sends.
+    """
+
+    def __init__(self, producer: Any, timeout_sec: float = 30.0) -> None:
+        self.producer = producer
+        self.timeout_sec = timeout_sec
+        self._pending: list[tuple[Any, Any, Exception | None]] = []
+
+    def send(self, topic: str, key: bytes, value: str, token: Any = None) -> None:
+        try:
+            future = self.producer.send(topic, key=key, value=value)
+        except Exception as exc:
+            self._pending.append((token, None, exc))
+            return
+        self._pending.append((token, future, None))
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def gather(self) -> list[tuple[Any, Exception | None]]:
+        pending, self._pending = self._pending, []
+        results: list[tuple[Any, Exception | None]] = []
+        for token, future, error in pending:
+            if future is not None:
+                try:
+                    future.get(timeout=self.timeout_sec)
+                except Exception as exc:
+                    error = exc
+            results.append((token, error))
+        return results
+
+
+def rebalance_listener(
+    batches: BatchConsumer,
+    on_assigned: Callable[[list[Any]], None] | None = None,
+    on_revoked: Callable[[list[Any]], None] | None = None,
+) -> Any:
+    """Listener for ``consumer.subscribe`` that keeps per-partition state in step with assignment.
+
+    On revoke, processed offsets are committed before ``on_revoked`` drops the
+    partitions' state, and the tracker forgets them only after it, so
+    ``on_revoked`` still sees their committed offsets. Both callbacks run
+    inside ``poll``, between batches.
+    """
+    from kafka import ConsumerRebalanceListener
+
+    class _Listener(ConsumerRebalanceListener):
+        def on_partitions_revoked(self, revoked: Any) -> None:
+            revoked = list(revoked)
+            batches.commit(asynchronous=False)
+            try:
+                if on_revoked is not None:
+                    on_revoked(revoked)
+            finally:
+                batches.release(revoked)
+
+        def on_partitions_assigned(self, assigned: Any) -> None:
+            if on_assigned is not None:
+                on_assigned(list(assigned))
+
+    return _Listener()
+
+
+def _commit_offsets(pending: dict[tuple[str, int], int]) -> dict[Any, Any]:
+    from kafka.structs import OffsetAndMetadata, TopicPartition
+
+    return {
+        TopicPartition(topic, partition): OffsetAndMetadata(offset, None)
+        for (topic, partition), offset in pending.items()
+    }
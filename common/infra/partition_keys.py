@@ -0,0 +1,38 @@
+import hashlib
+import zlib
+from typing import Any, Mapping
+
+KEY_MODES = ("device", "event_id")
+
+
+def device_key(payload: Mapping[str, Any]) -> str:
+    """Entity the correlator keeps window state for: ``src_device_key``, else ``srcip``."""
+    for field in ("src_device_key", "srcip"):
+        value = payload.get(field)
+        if value is not None:
+            text = str(value).strip()
+            if text:
+                return text
+    return ""
+
+
+def record_key(payload: Mapping[str, Any], raw_line: str, mode: str = "device") -> bytes:
+    """Kafka key for a fact. ``device`` keeps each device's facts on one partition.
+
+    Facts without a device fall back to ``event_id`` and then to a hash of the line.
+    """
+    if mode == "device":
+        key = device_key(payload)
+        if key:
+            return key.encode("utf-8")
+    event_id = payload.get("event_id")
+    if isinstance(event_id, str) and event_id:
+        return event_id.encode("utf-8")
+    return hashlib.md5(raw_line.encode("utf-8"), usedforsecurity=False).hexdigest().encode("utf-8")
+
+
+def key_shard(key: str, count: int) -> int:
+    """Stable shard for ``key``; the same in every process and Python run."""
+    if count <= 1:
+        return 0
+    return zlib.crc32(key.encode("utf-8")) % count
@@ -3,6 +3,8 @@ import logging
 from datetime import datetime, timezone
 from typing import Any
 
+from common.alerts import AlertDecoder
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender
 from core.aiops_agent.app_config import AgentConfig
 from core.aiops_agent.cluster_aggregator import AlertClusterAggregator
 from core.aiops_agent.context_lookup import build_alert_history_context, recent_similar_count
@@ -18,25 +20,23 @@ from core.aiops_agent.suggestion_engine import build_alert_pipeline_suggestion,
 LOGGER = logging.getLogger(__name__)
 
 
-def commit_if_needed(consumer: Any, should_commit: bool, stats: dict[str, int]) -> None:
-    if not should_commit:
-        return
-    try:
-        consumer.commit()
-    except Exception:
-        stats["commit_error"] += 1
-        LOGGER.exception("offset commit failed")
-
-
-def run_agent_loop(config: AgentConfig, consumer: Any, producer: Any, clickhouse_client: Any) -> None:
+def run_agent_loop(
+    config: AgentConfig,
+    consumer: Any,
+    producer: Any,
+    clickhouse_client: Any,
+    batch_settings: KafkaBatchSettings | None = None,
+) -> None:
     stats = {
         "ingested": 0,
         "suggestions_emitted": 0,
         "alert_suggestions_emitted": 0,
         "cluster_suggestions_emitted": 0,
         "skipped_by_severity": 0,
+        "skipped_storm_summary": 0,
         "cluster_triggers": 0,
         "json_error": 0,
+        "context_unresolved": 0,
         "inference_requests": 0,
         "inference_completed": 0,
         "inference_error": 0,
@@ -53,6 +53,10 @@ def run_agent_loop(config: AgentConfig, consumer: Any, producer: Any, clickhouse
     provider = build_provider(config)
     queue = InMemoryInferenceQueue()
     worker = InferenceWorker(provider)
+    decoder = AlertDecoder()
+    batch_settings = batch_settings or KafkaBatchSettings.from_env()
+    batches = BatchConsumer(consumer, batch_settings, stats)
+    sender = PipelinedSender(producer, batch_settings.send_timeout_sec)
 
     LOGGER.info(
         (
@@ -69,104 +73,152 @@ def run_agent_loop(config: AgentConfig, consumer: Any, producer: Any, clickhouse
         provider.name,
     )
 
-    for msg in consumer:
-        stats["ingested"] += 1
-        should_commit = False
-        try:
+    try:
+        for batch in batches.batches():
             try:
-                alert = json.loads(msg.value)
-            except json.JSONDecodeError:
-                stats["json_error"] += 1
-                should_commit = True
-                commit_if_needed(consumer, should_commit, stats)
-                continue
-
-            severity = str(alert.get("severity") or "unknown").lower()
-            if not config.should_process_severity(severity):
-                stats["skipped_by_severity"] += 1
-                should_commit = True
-                commit_if_needed(consumer, should_commit, stats)
-                continue
-
-            excerpt = alert.get("event_excerpt") or {}
-            service = str(excerpt.get("service") or "unknown")
-            rule_id = str(alert.get("rule_id") or "unknown")
-            recent_similar_1h = recent_similar_count(
-                clickhouse_client,
-                config.clickhouse_db,
-                config.clickhouse_alerts_table,
-                rule_id,
-                service,
-            )
-            history_support = build_alert_history_context(
-                clickhouse_client,
-                config.clickhouse_db,
-                config.clickhouse_alerts_table,
+                for msg in batch:
+                    _handle_alert_message(
+                        msg,
+                        config=config,
+                        clickhouse_client=clickhouse_client,
+                        aggregator=aggregator,
+                        provider_name=provider.name,
+                        queue=queue,
+                        worker=worker,
+                        sender=sender,
+                        batches=batches,
+                        stats=stats,
+                        decoder=decoder,
+                    )
+                _finish_batch(config.output_dir, sender, batches, stats)
+                batches.maybe_commit()
+            finally:
+                tick = _log_stats_if_due(config.log_interval_sec, stats, tick)
+    finally:
+        batches.close()
+
+
+def _handle_alert_message(
+    msg: Any,
+    config: AgentConfig,
+    clickhouse_client: Any,
+    aggregator: AlertClusterAggregator,
+    provider_name: str,
+    queue: InMemoryInferenceQueue,
+    worker: InferenceWorker,
+    sender: PipelinedSender,
+    batches: BatchConsumer,
+    stats: dict[str, int],
+    decoder: AlertDecoder,
+) -> None:
+    stats["ingested"] += 1
+    try:
+        alert = json.loads(msg.value)
+    except json.JSONDecodeError:
+        stats["json_error"] += 1
+        batches.ack(msg)
+        return
+    alert = decoder.decode(alert)
+    stats["context_unresolved"] = decoder.unresolved
+
+    if alert.get("alert_kind") == "storm_summary":
+        # Counts repeats of an alert that was already reasoned about (``parent_alert_id``).
+        stats["skipped_storm_summary"] += 1
+        batches.ack(msg)
+        return
+
+    severity = str(alert.get("severity") or "unknown").lower()
+    if not config.should_process_severity(severity):
+        stats["skipped_by_severity"] += 1
+        batches.ack(msg)
+        return
+
+    excerpt = alert.get("event_excerpt") or {}
+    service = str(excerpt.get("service") or "unknown")
+    rule_id = str(alert.get("rule_id") or "unknown")
+    recent_similar_1h = recent_similar_count(
+        clickhouse_client,
+        config.clickhouse_db,
+        config.clickhouse_alerts_table,
+        rule_id,
+        service,
+    )
+    history_support = build_alert_history_context(
+        clickhouse_client,
+        config.clickhouse_db,
+        config.clickhouse_alerts_table,
+        alert,
+    )
+
+    alert_evidence = build_alert_evidence_bundle(alert, recent_similar_1h, history_support)
+    alert_request = build_alert_inference_request(alert, alert_evidence, provider_name)
+    _run_inference_and_emit(
+        config=config,
+        queue=queue,
+        worker=worker,
+        sender=sender,
+        topic=config.topic_suggestions,
+        inference_request=alert_request,
+        build_suggestion_fn=lambda result: build_alert_pipeline_suggestion(
+            alert,
+            alert_evidence,
+            alert_request,
+            result,
+        ),
+        msg=msg,
+        stats=stats,
+    )
+
+    trigger = aggregator.observe(alert)
+    if trigger is not None:
+        stats["cluster_triggers"] += 1
+        cluster_evidence = build_cluster_evidence_bundle(
+            alert,
+            trigger,
+            recent_similar_1h,
+            history_support,
+        )
+        cluster_request = build_cluster_inference_request(alert, trigger, cluster_evidence, provider_name)
+        _run_inference_and_emit(
+            config=config,
+            queue=queue,
+            worker=worker,
+            sender=sender,
+            topic=config.topic_suggestions,
+            inference_request=cluster_request,
+            build_suggestion_fn=lambda result: build_pipeline_suggestion(
                 alert,
-            )
-
-            alert_evidence = build_alert_evidence_bundle(alert, recent_similar_1h, history_support)
-            alert_request = build_alert_inference_request(alert, alert_evidence, provider.name)
-            should_commit = _run_inference_and_emit(
-                config=config,
-                queue=queue,
-                worker=worker,
-                producer=producer,
-                topic=config.topic_suggestions,
-                output_dir=config.output_dir,
-                inference_request=alert_request,
-                build_suggestion_fn=lambda result: build_alert_pipeline_suggestion(
-                    alert,
-                    alert_evidence,
-                    alert_request,
-                    result,
-                ),
-                stats=stats,
-            )
-
-            trigger = aggregator.observe(alert)
-            if trigger is not None:
-                stats["cluster_triggers"] += 1
-                cluster_evidence = build_cluster_evidence_bundle(
-                    alert,
-                    trigger,
-                    recent_similar_1h,
-                    history_support,
-                )
-                cluster_request = build_cluster_inference_request(alert, trigger, cluster_evidence, provider.name)
-                cluster_ok = _run_inference_and_emit(
-                    config=config,
-                    queue=queue,
-                    worker=worker,
-                    producer=producer,
-                    topic=config.topic_suggestions,
-                    output_dir=config.output_dir,
-                    inference_request=cluster_request,
-                    build_suggestion_fn=lambda result: build_pipeline_suggestion(
-                        alert,
-                        trigger,
-                        cluster_evidence,
-                        cluster_request,
-                        result,
-                    ),
-                    stats=stats,
-                )
-                should_commit = should_commit or cluster_ok
-
-            commit_if_needed(consumer, should_commit, stats)
-        finally:
-            tick = _log_stats_if_due(config.log_interval_sec, stats, tick)
+                trigger,
+                cluster_evidence,
+                cluster_request,
+                result,
+            ),
+            msg=msg,
+            stats=stats,
+        )
+
+
+def _finish_batch(output_dir: str, sender: PipelinedSender, batches: BatchConsumer, stats: dict[str, int]) -> None:
+    # A suggestion is written to JSONL only after its publish is acknowledged, and
+    # the alert is acked once any of its suggestions made it through both steps.
+    for (msg, payload, suggestion_scope), error in sender.gather():
+        if error is not None:
+            stats["publish_error"] += 1
+            LOGGER.error("failed to publish aiops suggestion: %s", error)
+            continue
+        if _sink_suggestion(output_dir, payload, stats, suggestion_scope):
+            batches.ack(msg)
 
 
 def _run_inference_and_emit(
     config: AgentConfig,
     queue: InMemoryInferenceQueue,
     worker: InferenceWorker,
-    producer: Any,
+    sender: PipelinedSender,
     topic: str,
-    output_dir: str,
     inference_request: Any,
     build_suggestion_fn: Any,
+    msg: Any,
     stats: dict[str, int],
 ) -> bool:
     queue.enqueue(inference_request)
@@ -191,20 +243,14 @@ def _run_inference_and_emit(
         suggestion_payload=suggestion,
     )
     payload = json.dumps(suggestion, ensure_ascii=True, separators=(",", ":"))
-
-    if not _publish_suggestion(producer, topic, payload, suggestion["suggestion_id"], stats):
-        return False
-    return _sink_suggestion(output_dir, payload, stats, str(suggestion.get("suggestion_scope") or "unknown"))
-
-
-def _publish_suggestion(producer: Any, topic: str, payload: str, suggestion_id: str, stats: dict[str, int]) -> bool:
-    try:
-        producer.send(topic, key=suggestion_id.encode("utf-8"), value=payload).get(timeout=30)
-        return True
-    except Exception:
-        stats["publish_error"] += 1
-        LOGGER.exception("failed to publish aiops suggestion")
-        return False
+    suggestion_scope = str(suggestion.get("suggestion_scope") or "unknown")
+    sender.send(
+        topic,
+        key=str(suggestion["suggestion_id"]).encode("utf-8"),
+        value=payload,
+        token=(msg, payload, suggestion_scope),
+    )
+    return True
 
 
 def _sink_suggestion(output_dir: str, payload: str, stats: dict[str, int], suggestion_scope: str) -> bool:
@@ -6,7 +6,9 @@ from typing import Any
 
 from kafka import KafkaConsumer, KafkaProducer
 
+from common.alerts import AlertDecoder
 from common.infra.config import env_int, env_str
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender
 from common.infra.logging_utils import configure_logging
 
 LOGGER = logging.getLogger(__name__)
@@ -49,10 +51,15 @@ def _hourly_file(base_dir: str, alert_ts: str | None) -> str:
 
 
 def _append_jsonl(path: str, payload: str) -> None:
+    _append_jsonl_lines(path, [payload])
+
+
+def _append_jsonl_lines(path: str, payloads: list[str]) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "a", encoding="utf-8") as fp:
-        fp.write(payload)
-        fp.write("\n")
+        for payload in payloads:
+            fp.write(payload)
+            fp.write("\n")
 
 
 def main() -> None:
@@ -69,6 +76,7 @@ def main() -> None:
 
     output_dir = env_str("ALERTS_OUTPUT_DIR", "/data/netops-runtime/alerts")
     log_interval_sec = env_int("ALERTS_SINK_LOG_INTERVAL_SEC", 30)
+    batch_settings = KafkaBatchSettings.from_env()
 
     consumer = _build_consumer(bootstrap_servers, topic_alerts, consumer_group, auto_offset_reset)
     producer = _build_producer(bootstrap_servers)
@@ -83,47 +91,80 @@ def main() -> None:
         output_dir,
     )
 
-    for msg in consumer:
+    batches = BatchConsumer(consumer, batch_settings, stats)
+    sender = PipelinedSender(producer, batch_settings.send_timeout_sec)
+    decoder = AlertDecoder()
+    try:
+        for batch in batches.batches():
+            _process_batch(batch, output_dir, sender, batches, topic_dlq, stats, decoder)
+            batches.maybe_commit()
+            now = datetime.now(timezone.utc)
+            if (now - last_log_ts).total_seconds() >= log_interval_sec:
+                stats["context_unresolved"] = decoder.unresolved
+                LOGGER.info("alerts-sink stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
+                last_log_ts = now
+    finally:
+        batches.close()
+
+
+def _process_batch(
+    batch: list[Any],
+    output_dir: str,
+    sender: PipelinedSender,
+    batches: BatchConsumer,
+    topic_dlq: str,
+    stats: dict[str, int],
+    decoder: AlertDecoder,
+) -> None:
+    # Lines are grouped per hourly file so each file is opened once per batch.
+    # Compact alerts are written back in schema 1, so archived files keep one format.
+    by_path: dict[str, list[tuple[Any, str, str]]] = {}
+    for msg in batch:
         stats["ingested"] += 1
-        should_commit = False
         raw = msg.value
-
         try:
             alert = json.loads(raw)
         except json.JSONDecodeError:
             stats["json_error"] += 1
-            if _send_dlq(producer, topic_dlq, msg, "invalid_alert_json", raw):
-                stats["dlq_emitted"] += 1
-                should_commit = True
-            _commit_if_needed(consumer, should_commit, stats)
+            _send_dlq(sender, topic_dlq, msg, "invalid_alert_json", raw)
             continue
-
         try:
+            alert = decoder.decode(alert)
             path = _hourly_file(output_dir, alert.get("alert_ts"))
-            _append_jsonl(path, json.dumps(alert, separators=(",", ":"), ensure_ascii=True))
-            stats["written"] += 1
-            should_commit = True
+            line = json.dumps(alert, separators=(",", ":"), ensure_ascii=True)
         except Exception as exc:
             LOGGER.exception("failed to persist alert partition=%s offset=%s err=%s", msg.partition, msg.offset, exc)
-            if _send_dlq(producer, topic_dlq, msg, "alerts_sink_write_error", raw):
-                stats["dlq_emitted"] += 1
-                should_commit = True
+            _send_dlq(sender, topic_dlq, msg, "alerts_sink_write_error", raw)
+            continue
+        by_path.setdefault(path, []).append((msg, raw, line))
 
-        _commit_if_needed(consumer, should_commit, stats)
+    for path, entries in by_path.items():
+        try:
+            _append_jsonl_lines(path, [line for _, _, line in entries])
+        except Exception as exc:
+            LOGGER.exception("failed to persist %d alerts path=%s err=%s", len(entries), path, exc)
+            for msg, raw, _ in entries:
+                _send_dlq(sender, topic_dlq, msg, "alerts_sink_write_error", raw)
+            continue
+        stats["written"] += len(entries)
+        for msg, _, _ in entries:
+            batches.ack(msg)
 
-        now = datetime.now(timezone.utc)
-        if (now - last_log_ts).total_seconds() >= log_interval_sec:
-            LOGGER.info("alerts-sink stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
-            last_log_ts = now
+    for msg, error in sender.gather():
+        if error is not None:
+            LOGGER.error("failed to publish dlq message partition=%s offset=%s err=%s", msg.partition, msg.offset, error)
+            continue
+        stats["dlq_emitted"] += 1
+        batches.ack(msg)
 
 
 def _send_dlq(
-    producer: KafkaProducer,
+    sender: PipelinedSender,
     topic_dlq: str,
     msg: Any,
     reason: str,
     raw: str,
-) -> bool:
+) -> None:
     payload = {
         "schema_version": 1,
         "reason": reason,
@@ -133,27 +174,13 @@ def _send_dlq(
         "ingest_ts": datetime.now(timezone.utc).isoformat(),
         "raw": raw,
     }
-    try:
-        key = f"{msg.topic}:{msg.partition}:{msg.offset}".encode("utf-8")
-        producer.send(
-            topic_dlq,
-            key=key,
-            value=json.dumps(payload, separators=(",", ":"), ensure_ascii=True),
-        ).get(timeout=30)
-        return True
-    except Exception:
-        LOGGER.exception("failed to publish dlq message partition=%s offset=%s", msg.partition, msg.offset)
-        return False
-
-
-def _commit_if_needed(consumer: KafkaConsumer, should_commit: bool, stats: dict[str, int]) -> None:
-    if not should_commit:
-        return
-    try:
-        consumer.commit()
-    except Exception:
-        stats["commit_error"] += 1
-        LOGGER.exception("offset commit failed")
+    key = f"{msg.topic}:{msg.partition}:{msg.offset}".encode("utf-8")
+    sender.send(
+        topic_dlq,
+        key=key,
+        value=json.dumps(payload, separators=(",", ":"), ensure_ascii=True),
+        token=msg,
+    )
 
 
 if __name__ == "__main__":
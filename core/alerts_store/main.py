@@ -6,11 +6,33 @@ from typing import Any
 import clickhouse_connect
 from kafka import KafkaConsumer
 
+from common.alerts import AlertDecoder
 from common.infra.config import env_int, env_str
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings
 from common.infra.logging_utils import configure_logging
 
 LOGGER = logging.getLogger(__name__)
 
+ALERT_COLUMNS = [
+    "emit_ts",
+    "alert_ts",
+    "alert_id",
+    "rule_id",
+    "severity",
+    "source_event_id",
+    "service",
+    "src_device_key",
+    "srcip",
+    "dstip",
+    "metrics_json",
+    "dimensions_json",
+    "event_excerpt_json",
+    "topology_context_json",
+    "device_profile_json",
+    "change_context_json",
+    "ingest_ts",
+]
+
 
 def _build_consumer(bootstrap_servers: str, topic: str, group_id: str, auto_offset_reset: str) -> KafkaConsumer:
     return KafkaConsumer(
@@ -74,6 +96,9 @@ def _parse_dt(raw: Any) -> datetime:
 
 def _to_row(alert: dict[str, Any]) -> list[Any]:
     excerpt = alert.get("event_excerpt") or {}
+    dimensions = alert.get("dimensions") or {}
+    # Storm summaries carry no excerpt; their dimensions still name the device.
+    entity = excerpt or dimensions
     return [
         datetime.now(timezone.utc),
         _parse_dt(alert.get("alert_ts")),
@@ -82,11 +107,11 @@ def _to_row(alert: dict[str, Any]) -> list[Any]:
         str(alert.get("severity") or "unknown"),
         str(alert.get("source_event_id") or ""),
         str(excerpt.get("service") or "unknown"),
-        str(excerpt.get("src_device_key") or ""),
-        str(excerpt.get("srcip") or ""),
+        str(entity.get("src_device_key") or ""),
+        str(entity.get("srcip") or ""),
         str(excerpt.get("dstip") or ""),
         json.dumps(alert.get("metrics") or {}, ensure_ascii=True, separators=(",", ":")),
-        json.dumps(alert.get("dimensions") or {}, ensure_ascii=True, separators=(",", ":")),
+        json.dumps(dimensions, ensure_ascii=True, separators=(",", ":")),
         json.dumps(excerpt, ensure_ascii=True, separators=(",", ":")),
         json.dumps(alert.get("topology_context") or {}, ensure_ascii=True, separators=(",", ":")),
         json.dumps(alert.get("device_profile") or {}, ensure_ascii=True, separators=(",", ":")),
@@ -112,6 +137,7 @@ def main() -> None:
     ch_db = env_str("CLICKHOUSE_DB", "netops")
     ch_table = env_str("CLICKHOUSE_ALERTS_TABLE", "alerts")
     log_interval_sec = env_int("ALERTS_STORE_LOG_INTERVAL_SEC", 30)
+    batch_settings = KafkaBatchSettings.from_env()
 
     client = clickhouse_connect.get_client(host=ch_host, port=ch_port, username=ch_user, password=ch_pass)
     _ensure_schema(client, ch_db, ch_table)
@@ -122,63 +148,64 @@ def main() -> None:
     tick = datetime.now(timezone.utc)
     LOGGER.info("alerts-store started: topic=%s group=%s clickhouse=%s:%d table=%s", topic_alerts, consumer_group, ch_host, ch_port, target_table)
 
-    for msg in consumer:
+    batches = BatchConsumer(consumer, batch_settings, stats)
+    decoder = AlertDecoder()
+    try:
+        for batch in batches.batches():
+            _process_batch(batch, client, target_table, batches, stats, decoder)
+            batches.maybe_commit()
+            now = datetime.now(timezone.utc)
+            if (now - tick).total_seconds() >= log_interval_sec:
+                stats["context_unresolved"] = decoder.unresolved
+                LOGGER.info("alerts-store stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
+                tick = now
+    finally:
+        batches.close()
+
+
+def _process_batch(
+    batch: list[Any],
+    client: Any,
+    target_table: str,
+    batches: BatchConsumer,
+    stats: dict[str, int],
+    decoder: AlertDecoder,
+) -> None:
+    msgs: list[Any] = []
+    rows: list[list[Any]] = []
+    for msg in batch:
         stats["ingested"] += 1
-        should_commit = False
         try:
             alert = json.loads(msg.value)
         except json.JSONDecodeError:
             stats["json_error"] += 1
-            should_commit = True
-            _commit_if_needed(consumer, should_commit, stats)
+            batches.ack(msg)
             continue
+        msgs.append(msg)
+        rows.append(_to_row(decoder.decode(alert)))
+    if not rows:
+        return
+
+    try:
+        client.insert(target_table, rows, column_names=ALERT_COLUMNS)
+    except Exception as exc:
+        # One bad row fails the whole insert; retry row by row so the rest are stored.
+        LOGGER.warning("batch insert of %d alerts failed, retrying per row: %s", len(rows), exc)
+    else:
+        stats["stored"] += len(rows)
+        for msg in msgs:
+            batches.ack(msg)
+        return
 
-        row = _to_row(alert)
+    for msg, row in zip(msgs, rows):
         try:
-            client.insert(
-                target_table,
-                [row],
-                column_names=[
-                    "emit_ts",
-                    "alert_ts",
-                    "alert_id",
-                    "rule_id",
-                    "severity",
-                    "source_event_id",
-                    "service",
-                    "src_device_key",
-                    "srcip",
-                    "dstip",
-                    "metrics_json",
-                    "dimensions_json",
-                    "event_excerpt_json",
-                    "topology_context_json",
-                    "device_profile_json",
-                    "change_context_json",
-                    "ingest_ts",
-                ],
-            )
-            stats["stored"] += 1
-            should_commit = True
+            client.insert(target_table, [row], column_names=ALERT_COLUMNS)
         except Exception as exc:
             LOGGER.exception("failed to store alert offset=%s err=%s", msg.offset, exc)
             stats["store_error"] += 1
-
-        _commit_if_needed(consumer, should_commit, stats)
-        now = datetime.now(timezone.utc)
-        if (now - tick).total_seconds() >= log_interval_sec:
-            LOGGER.info("alerts-store stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
-            tick = now
-
-
-def _commit_if_needed(consumer: KafkaConsumer, should_commit: bool, stats: dict[str, int]) -> None:
-    if not should_commit:
-        return
-    try:
-        consumer.commit()
-    except Exception:
-        stats["commit_error"] += 1
-        LOGGER.exception("offset commit failed")
+            continue
+        stats["stored"] += 1
+        batches.ack(msg)
 
 
 if __name__ == "__main__":
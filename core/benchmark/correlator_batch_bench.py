@@ -0,0 +1,89 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from core.correlator import rules
+from core.correlator.rules import RuleConfig, RuleEngine
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Replay a synthetic firewall stream through RuleEngine.process and RuleEngine.process_batch."
+    )
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--events-per-sec", type=float, default=50_000.0, help="Event-time rate of the replayed stream.")
+    parser.add_argument("--devices", type=int, action="append", help="Distinct device keys (repeatable; default 20 and 300).")
+    parser.add_argument("--batch-size", type=int, default=500, help="Records per process_batch call (KAFKA batch_max_records).")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def _stream(count: int, events_per_sec: float, devices: int, seed: int) -> list[dict[str, Any]]:
+    # Second-resolution timestamps, like the edge's normalized FortiGate events.
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 9, tzinfo=timezone.utc)
+    events = []
+    for index in range(count):
+        device = rng.randrange(devices)
+        events.append(
+            {
+                "event_id": f"e{index}",
+                "event_ts": (start + timedelta(seconds=int(index / events_per_sec))).isoformat(),
+                "type": "traffic",
+                "subtype": "forward",
+                "action": rng.choice(["deny", "accept", "accept", "close"]),
+                "src_device_key": f"dev-{device}",
+                "srcip": f"10.0.{device // 200}.{device % 200}",
+                "bytes_total": rng.randrange(100, 100_000),
+            }
+        )
+    return events
+
+
+def _per_event(events: list[dict[str, Any]]) -> tuple[float, list[list[dict[str, Any]]]]:
+    engine = RuleEngine(RuleConfig())
+    started = time.perf_counter()
+    results = [engine.process(event) for event in events]
+    return time.perf_counter() - started, results
+
+
+def _batched(events: list[dict[str, Any]], batch_size: int) -> tuple[float, list[list[dict[str, Any]]]]:
+    engine = RuleEngine(RuleConfig())
+    results: list[list[dict[str, Any]]] = []
+    started = time.perf_counter()
+    for offset in range(0, len(events), batch_size):
+        results.extend(engine.process_batch(events[offset : offset + batch_size]))
+    return time.perf_counter() - started, results
+
+
+def _run(args: argparse.Namespace, devices: int) -> dict[str, Any]:
+    events = _stream(args.events, args.events_per_sec, devices, args.seed)
+    per_event_sec, expected = _per_event(events)
+    batch_sec, actual = _batched(events, args.batch_size)
+    return {
+        "devices": devices,
+        "alerts": sum(len(alerts) for alerts in expected),
+        "alerts_match": actual == expected,
+        "per_event_events_per_sec": int(len(events) / max(per_event_sec, 1e-9)),
+        "batch_events_per_sec": int(len(events) / max(batch_sec, 1e-9)),
+        "speedup": round(per_event_sec / max(batch_sec, 1e-9), 2),
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    summary = {
+        "events": args.events,
+        "events_per_sec": args.events_per_sec,
+        "batch_size": args.batch_size,
+        "numpy": rules.np is not None,
+        "runs": [_run(args, devices) for devices in args.devices or [20, 300]],
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
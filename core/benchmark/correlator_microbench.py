@@ -0,0 +1,131 @@
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from core.correlator.windows import RingCounter
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Per-event cost and per-key memory of the correlator's sliding windows: per-event deques vs RingCounter."
+    )
+    parser.add_argument("--events", type=int, action="append", help="Events per key (repeatable; default 10k, 100k, 1M).")
+    parser.add_argument("--events-per-sec", type=float, default=100.0, help="Event rate of the single benchmarked key.")
+    parser.add_argument("--deny-window-sec", type=int, default=60)
+    parser.add_argument("--bytes-window-sec", type=int, default=300)
+    parser.add_argument(
+        "--baseline-max-events",
+        type=int,
+        default=20000,
+        help="Skip the deque baseline above this many events; its bytes sum is quadratic in the window size.",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def _events(count: int, events_per_sec: float, seed: int) -> list[tuple[datetime, int]]:
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 9, tzinfo=timezone.utc)
+    step = 1.0 / max(events_per_sec, 1e-9)
+    return [(start + timedelta(seconds=index * step), rng.randint(64, 1500)) for index in range(count)]
+
+
+def _deque_deny(events: list[tuple[datetime, int]], window_sec: int) -> tuple[int, Any]:
+    # The pre-RingCounter deny rule: one datetime per event.
+    bucket: deque[datetime] = deque()
+    window = timedelta(seconds=window_sec)
+    last = 0
+    for now, _ in events:
+        cutoff = now - window
+        while bucket and bucket[0] < cutoff:
+            bucket.popleft()
+        bucket.append(now)
+        last = len(bucket)
+    return last, bucket
+
+
+def _deque_bytes(events: list[tuple[datetime, int]], window_sec: int) -> tuple[int, Any]:
+    # The pre-RingCounter bytes rule: one (datetime, bytes) per event, summed on every event.
+    bucket: deque[tuple[datetime, int]] = deque()
+    window = timedelta(seconds=window_sec)
+    last = 0
+    for now, value in events:
+        cutoff = now - window
+        while bucket and bucket[0][0] < cutoff:
+            bucket.popleft()
+        bucket.append((now, value))
+        last = sum(x[1] for x in bucket)
+    return last, bucket
+
+
+def _ring_deny(events: list[tuple[datetime, int]], window_sec: int) -> tuple[int, Any]:
+    ring = RingCounter((window_sec,))
+    last = 0
+    for now, _ in events:
+        ring.add(now.timestamp())
+        last = ring.count(window_sec)
+    return last, ring
+
+
+def _ring_bytes(events: list[tuple[datetime, int]], window_sec: int) -> tuple[int, Any]:
+    ring = RingCounter((window_sec,))
+    last = 0
+    for now, value in events:
+        ring.add(now.timestamp(), value)
+        last = ring.total(window_sec)
+    return last, ring
+
+
+def _measure(run: Callable[[list[tuple[datetime, int]], int], tuple[int, Any]], events: list, window_sec: int) -> dict[str, Any]:
+    started = time.perf_counter()
+    result, _ = run(events, window_sec)
+    elapsed = time.perf_counter() - started
+    # Memory is measured in a second pass so tracing does not skew the timing.
+    tracemalloc.start()
+    _, structure = run(events, window_sec)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del structure
+    return {
+        "result": result,
+        "ns_per_event": round(elapsed * 1e9 / max(len(events), 1), 1),
+        "key_state_bytes": size,
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    sizes = args.events or [10_000, 100_000, 1_000_000]
+    rules = {
+        "deny_count": (_deque_deny, _ring_deny, args.deny_window_sec),
+        "bytes_sum": (_deque_bytes, _ring_bytes, args.bytes_window_sec),
+    }
+    results: dict[str, Any] = {}
+    for count in sizes:
+        events = _events(count, args.events_per_sec, args.seed)
+        row: dict[str, Any] = {}
+        for name, (before_run, after_run, window_sec) in rules.items():
+            after = _measure(after_run, events, window_sec)
+            entry: dict[str, Any] = {"after": after}
+            if count <= args.baseline_max_events:
+                before = _measure(before_run, events, window_sec)
+                entry["before"] = before
+                entry["speedup"] = round(before["ns_per_event"] / max(after["ns_per_event"], 1e-9), 2)
+            row[name] = entry
+        results[str(count)] = row
+    summary = {
+        "events_per_sec": args.events_per_sec,
+        "deny_window_sec": args.deny_window_sec,
+        "bytes_window_sec": args.bytes_window_sec,
+        "events_per_key": results,
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import gzip
+import json
+import os
+import resource
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+from common.alerts import ALERT_SCHEMAS, AlertEncoder
+from common.infra.partition_keys import key_shard, record_key
+from core.correlator import rules
+from core.correlator.dedup import DEDUP_BACKENDS
+from core.correlator.partition_state import STATE_SCOPES, CorrelatorState, PartitionStates, scoped_rule_config
+from core.correlator.quality_gate import QualityGate
+from core.correlator.rule_profile import load_rule_config
+from core.correlator.rules import RuleEngine
+
+_STAGES = ("read", "gate", "rules", "emit")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay JSONL fact captures through QualityGate + RuleEngine in-process, as the correlator "
+            "evaluates a Kafka batch, and report throughput, per-stage CPU time and state size."
+        )
+    )
+    parser.add_argument("--input", action="append", required=True, help="JSONL(.gz) file or directory of them (repeatable).")
+    parser.add_argument("--output-jsonl", default="", help="Write emitted alerts here, one per line.")
+    parser.add_argument("--report-json", default="", help="Also write the report here.")
+    parser.add_argument("--profile", default="", help="CORRELATOR_RULE_PROFILE (name under core/correlator/profiles).")
+    parser.add_argument("--profile-path", default="", help="CORRELATOR_RULE_PROFILE_PATH; RULE_* env overrides apply as in the pod.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Records per batch (KAFKA batch_max_records).")
+    parser.add_argument("--partitions", type=int, default=1, help="Input partitions the facts are spread over by device key.")
+    parser.add_argument("--state-scope", choices=STATE_SCOPES, default="partition")
+    parser.add_argument("--dedup-cache-size", type=int, default=200_000)
+    parser.add_argument("--dedup-backend", choices=DEDUP_BACKENDS, default="exact")
+    parser.add_argument("--alert-schema", type=int, choices=ALERT_SCHEMAS, default=1)
+    parser.add_argument("--sample-every", type=int, default=100_000, help="Events between state size samples.")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many input lines (0 = all).")
+    return parser.parse_args()
+
+
+def _input_files(inputs: list[str]) -> list[Path]:
+    files: list[Path] = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            files.extend(sorted(child for child in path.iterdir() if child.name.endswith((".jsonl", ".jsonl.gz"))))
+        elif path.exists():
+            files.append(path)
+        else:
+            raise SystemExit(f"input not found: {path}")
+    return files
+
+
+def _open(path: Path) -> TextIO:
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _batches(files: list[Path], batch_size: int, limit: int) -> Iterator[list[str]]:
+    batch: list[str] = []
+    count = 0
+    for path in files:
+        with _open(path) as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                batch.append(line)
+                count += 1
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+                if limit and count >= limit:
+                    if batch:
+                        yield batch
+                    return
+    if batch:
+        yield batch
+
+
+def _build_states(args: argparse.Namespace) -> PartitionStates:
+    if args.profile:
+        os.environ["CORRELATOR_RULE_PROFILE"] = args.profile
+    if args.profile_path:
+        os.environ["CORRELATOR_RULE_PROFILE_PATH"] = args.profile_path
+    config = scoped_rule_config(load_rule_config(), args.state_scope, args.partitions)
+    return PartitionStates(
+        lambda: CorrelatorState(
+            QualityGate(dedup_cache_size=args.dedup_cache_size, dedup_backend=args.dedup_backend),
+            RuleEngine(config),
+        ),
+        scope=args.state_scope,
+    )
+
+
+def _sample(states: PartitionStates, events: int, started: float) -> dict[str, Any]:
+    gauges = states.state_stats()
+    elapsed = time.perf_counter() - started
+    return {
+        "events": events,
+        "elapsed_sec": round(elapsed, 3),
+        "events_per_sec": int(events / max(elapsed, 1e-9)),
+        "rule_state_bytes_approx": int(gauges.get("rule_state_bytes_approx", 0)),
+        "dedup_bytes_approx": int(gauges.get("dedup_bytes_approx", 0)),
+        "state_keys": int(sum(value for key, value in gauges.items() if key.endswith("_keys"))),
+        "dedup_ids": int(gauges.get("dedup_ids", 0)),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def replay(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the replay and return its report."""
+    states = _build_states(args)
+    encoder = AlertEncoder() if args.alert_schema == 2 else None
+    output = open(args.output_jsonl, "w", encoding="utf-8") if args.output_jsonl else None
+    cpu = dict.fromkeys(_STAGES, 0.0)
+    counts: Counter[str] = Counter()
+    alerts_by_rule: Counter[str] = Counter()
+    timeline: list[dict[str, Any]] = []
+    events = 0
+    alert_bytes = 0
+    next_sample = max(args.sample_every, 1)
+    started = time.perf_counter()
+    clock = time.process_time()
+    try:
+        for lines in _batches(_input_files(args.input), max(args.batch_size, 1), args.limit):
+            # Stages as in ``core.correlator.main._process_batch``: parse, gate, one
+            # ``process_batch`` per partition state in arrival order, then publish.
+            parsed: list[tuple[str, dict[str, Any]]] = []
+            for line in lines:
+                try:
+                    parsed.append((line, json.loads(line)))
+                except json.JSONDecodeError:
+                    counts["json_error"] += 1
+            clock = _charge(cpu, "read", clock)
+
+            accepted: dict[int, tuple[CorrelatorState, list[dict[str, Any]]]] = {}
+            for line, event in parsed:
+                partition = key_shard(record_key(event, line).decode("utf-8"), args.partitions) if args.partitions > 1 else 0
+                state = states.get("raw", partition)
+                ok, reason = state.gate.evaluate(event)
+                if not ok:
+                    counts[f"drop_{reason}"] += 1
+                    continue
+                counts["accepted"] += 1
+                accepted.setdefault(id(state), (state, []))[1].append(event)
+            clock = _charge(cpu, "gate", clock)
+
+            results = [state.engine.process_batch(batch) for state, batch in accepted.values()]
+            clock = _charge(cpu, "rules", clock)
+
+            payloads = []
+            for batch_alerts in results:
+                for alerts in batch_alerts:
+                    for alert in alerts:
+                        alerts_by_rule[str(alert.get("rule_id"))] += 1
+                        if encoder is not None:
+                            alert = encoder.encode(alert)
+                            encoder.delivered(alert)
+                        payloads.append(json.dumps(alert, separators=(",", ":"), ensure_ascii=True))
+            if output is not None and payloads:
+                output.write("\n".join(payloads))
+                output.write("\n")
+            alert_bytes += sum(map(len, payloads))
+            clock = _charge(cpu, "emit", clock)
+
+            events += len(lines)
+            if events >= next_sample:
+                timeline.append(_sample(states, events, started))
+                next_sample = events + max(args.sample_every, 1)
+                # Sampling walks every state map; keep it out of the stage times.
+                clock = time.process_time()
+    finally:
+        if output is not None:
+            output.close()
+    wall = time.perf_counter() - started
+    if not timeline or timeline[-1]["events"] != events:
+        timeline.append(_sample(states, events, started))
+
+    alerts = sum(alerts_by_rule.values())
+    total_cpu = sum(cpu.values())
+    return {
+        "events": events,
+        "accepted": counts.pop("accepted", 0),
+        "drops": dict(sorted(counts.items())),
+        "alerts": alerts,
+        "alerts_by_rule": dict(sorted(alerts_by_rule.items())),
+        "alert_bytes": alert_bytes,
+        "wall_sec": round(wall, 3),
+        "events_per_sec": int(events / max(wall, 1e-9)),
+        "alerts_per_sec": round(alerts / max(wall, 1e-9), 1),
+        "stage_cpu_sec": {stage: round(cpu[stage], 3) for stage in _STAGES},
+        "stage_cpu_pct": {stage: round(100.0 * cpu[stage] / max(total_cpu, 1e-9), 1) for stage in _STAGES},
+        "state_timeline": timeline,
+        "state_stats": states.state_stats(),
+        "batch_size": args.batch_size,
+        "partitions": args.partitions,
+        "alert_schema": args.alert_schema,
+        "numpy": rules.np is not None,
+    }
+
+
+def _charge(cpu: dict[str, float], stage: str, since: float) -> float:
+    now = time.process_time()
+    cpu[stage] += now - since
+    return now
+
+
+def main() -> None:
+    args = _parse_args()
+    report = replay(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.report_json:
+        Path(args.report_json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report_json).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
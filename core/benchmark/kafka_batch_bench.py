@@ -0,0 +1,224 @@
+import argparse
+import json
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from common.alerts import AlertDecoder
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender
+from core.aiops_agent.app_config import load_config
+from core.aiops_agent.service import run_agent_loop
+from core.alerts_sink import main as alerts_sink
+from core.alerts_store import main as alerts_store
+from core.correlator import main as correlator
+from core.correlator.partition_state import CorrelatorState, PartitionStates
+from core.correlator.quality_gate import QualityGate
+from core.correlator.rules import RuleConfig, RuleEngine
+
+# Before = the old per-record pattern: one record per poll, every send awaited
+# before the next record, and a synchronous commit after each record.
+_PER_RECORD = KafkaBatchSettings(max_records=1, poll_timeout_ms=0, commit_every_records=1, commit_mode="sync", max_idle_polls=1)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare per-record and batched consume/commit loops of the core services on an in-memory broker."
+    )
+    parser.add_argument("--records", type=int, default=3000, help="Records per service (aiops-agent uses --agent-records).")
+    parser.add_argument("--agent-records", type=int, default=300)
+    parser.add_argument("--partitions", type=int, default=3)
+    parser.add_argument("--max-records", type=int, default=500, help="Batch size for the batched run.")
+    parser.add_argument("--commit-latency-ms", type=float, default=3.0, help="Round trip of a synchronous commit.")
+    parser.add_argument("--ack-latency-ms", type=float, default=2.0, help="Time from send to broker ack.")
+    parser.add_argument("--insert-latency-ms", type=float, default=3.0, help="Round trip of one ClickHouse insert.")
+    parser.add_argument("--service", action="append", choices=["correlator", "alerts_sink", "alerts_store", "aiops_agent"])
+    return parser.parse_args()
+
+
+class _AckFuture:
+    def __init__(self, ready_at: float) -> None:
+        self._ready_at = ready_at
+
+    def get(self, timeout: float = 30) -> None:
+        delay = self._ready_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _MemoryProducer:
+    """Sends complete ``ack_latency`` after they are issued, independently of each other."""
+
+    def __init__(self, ack_latency_sec: float) -> None:
+        self.ack_latency_sec = ack_latency_sec
+        self.sent = 0
+
+    def send(self, topic: str, key: bytes, value: str) -> _AckFuture:
+        self.sent += 1
+        return _AckFuture(time.perf_counter() + self.ack_latency_sec)
+
+
+class _MemoryConsumer:
+    def __init__(self, topic: str, values: list[str], partitions: int, commit_latency_sec: float) -> None:
+        self.commit_latency_sec = commit_latency_sec
+        self.commits = 0
+        self._queues: list[list[Any]] = [[] for _ in range(partitions)]
+        for index, value in enumerate(values):
+            partition = index % partitions
+            queue = self._queues[partition]
+            queue.append(SimpleNamespace(topic=topic, partition=partition, offset=len(queue), value=value))
+
+    def poll(self, timeout_ms: int = 0, max_records: int = 500) -> dict[Any, list[Any]]:
+        records: dict[Any, list[Any]] = {}
+        budget = max_records
+        for partition, queue in enumerate(self._queues):
+            if budget <= 0:
+                break
+            if queue:
+                taken, self._queues[partition] = queue[:budget], queue[budget:]
+                records[(queue[0].topic, partition)] = taken
+                budget -= len(taken)
+        return records
+
+    def commit(self, offsets: Any = None) -> None:
+        self.commits += 1
+        time.sleep(self.commit_latency_sec)
+
+    def commit_async(self, offsets: Any, callback: Callable[[Any, Any], None]) -> None:
+        self.commits += 1
+        callback(offsets, offsets)
+
+
+class _MemoryClickHouse:
+    def __init__(self, insert_latency_sec: float) -> None:
+        self.insert_latency_sec = insert_latency_sec
+        self.inserts = 0
+
+    def insert(self, table: str, rows: list[Any], column_names: list[str]) -> None:
+        self.inserts += 1
+        time.sleep(self.insert_latency_sec)
+
+
+def _fact_events(count: int) -> list[str]:
+    base = datetime(2026, 3, 9, tzinfo=timezone.utc)
+    events = []
+    for index in range(count):
+        events.append(
+            json.dumps(
+                {
+                    "event_id": f"bench-{index}",
+                    "event_ts": (base + timedelta(milliseconds=index * 50)).isoformat(),
+                    "type": "traffic",
+                    "subtype": "forward",
+                    "action": "deny" if index % 2 else "accept",
+                    "srcip": f"10.0.{index % 7}.1",
+                    "src_device_key": f"dev-{index % 7}",
+                    "service": "udp/3702",
+                    "bytes_total": 4096,
+                },
+                separators=(",", ":"),
+            )
+        )
+    return events
+
+
+def _alerts(count: int) -> list[str]:
+    base = datetime(2026, 3, 9, tzinfo=timezone.utc)
+    return [
+        json.dumps(
+            {
+                "alert_id": f"a-{index}",
+                "rule_id": "deny_burst_v1",
+                "severity": "warning",
+                "alert_ts": (base + timedelta(seconds=index)).isoformat(),
+                "source_event_id": f"bench-{index}",
+                "event_excerpt": {"service": "udp/3702", "src_device_key": f"dev-{index % 7}", "srcip": "10.0.0.1"},
+                "metrics": {"deny_count": 30},
+                "dimensions": {"src_device_key": f"dev-{index % 7}"},
+            },
+            separators=(",", ":"),
+        )
+        for index in range(count)
+    ]
+
+
+def _drive(consumer: Any, settings: KafkaBatchSettings, handle_batch: Callable[[list[Any], BatchConsumer, dict[str, int]], None]) -> dict[str, int]:
+    stats: dict[str, int] = defaultdict(int)
+    batches = BatchConsumer(consumer, settings, stats)
+    for batch in batches.batches():
+        handle_batch(batch, batches, stats)
+        batches.maybe_commit()
+    batches.close()
+    return stats
+
+
+def _run_service(name: str, args: argparse.Namespace, settings: KafkaBatchSettings, workdir: str) -> dict[str, Any]:
+    commit_latency = args.commit_latency_ms / 1000
+    producer = _MemoryProducer(args.ack_latency_ms / 1000)
+    sender = PipelinedSender(producer)
+    if name == "correlator":
+        values = _fact_events(args.records)
+        states = PartitionStates(lambda: CorrelatorState(QualityGate(), RuleEngine(RuleConfig(deny_threshold=5, cooldown_sec=1))))
+        handler = lambda batch, batches, stats: correlator._process_batch(
+            batch, states, sender, batches, "alerts", "dlq", stats
+        )
+    elif name == "alerts_sink":
+        values = _alerts(args.records)
+        decoder = AlertDecoder()
+        handler = lambda batch, batches, stats: alerts_sink._process_batch(batch, workdir, sender, batches, "dlq", stats, decoder)
+    elif name == "alerts_store":
+        values = _alerts(args.records)
+        client = _MemoryClickHouse(args.insert_latency_ms / 1000)
+        decoder = AlertDecoder()
+        handler = lambda batch, batches, stats: alerts_store._process_batch(batch, client, "netops.alerts", batches, stats, decoder)
+    else:
+        values = _alerts(args.agent_records)
+        handler = None
+
+    consumer = _MemoryConsumer("input", values, args.partitions, commit_latency)
+    started = time.perf_counter()
+    if handler is None:
+        config = replace(load_config(), clickhouse_enabled=False, output_dir=workdir, log_interval_sec=3600)
+        run_agent_loop(config, consumer, producer, clickhouse_client=None, batch_settings=settings)
+    else:
+        _drive(consumer, settings, handler)
+    elapsed = time.perf_counter() - started
+    return {
+        "records": len(values),
+        "elapsed_sec": round(elapsed, 3),
+        "records_per_sec": round(len(values) / max(elapsed, 1e-9), 1),
+        "commits": consumer.commits,
+        "produced": producer.sent,
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    services = args.service or ["correlator", "alerts_sink", "alerts_store", "aiops_agent"]
+    batched = KafkaBatchSettings(max_records=max(args.max_records, 1), poll_timeout_ms=0, max_idle_polls=1)
+    results: dict[str, Any] = {}
+    for name in services:
+        with tempfile.TemporaryDirectory(prefix="kafka-batch-bench-") as workdir:
+            before = _run_service(name, args, _PER_RECORD, workdir)
+        with tempfile.TemporaryDirectory(prefix="kafka-batch-bench-") as workdir:
+            after = _run_service(name, args, batched, workdir)
+        results[name] = {
+            "before": before,
+            "after": after,
+            "speedup": round(after["records_per_sec"] / max(before["records_per_sec"], 1e-9), 2),
+        }
+    summary = {
+        "commit_latency_ms": args.commit_latency_ms,
+        "ack_latency_ms": args.ack_latency_ms,
+        "insert_latency_ms": args.insert_latency_ms,
+        "batch_max_records": batched.max_records,
+        "services": results,
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
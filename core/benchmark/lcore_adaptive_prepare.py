@@ -2,11 +2,24 @@ from __future__ import annotations
 
 import argparse
 import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from itertools import islice
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Iterable, Iterator
 
-from common.data_features import LCORE_D_SOURCE_URL, AdaptiveFeatureExtractor, iter_records_from_paths
+from common.data_features import (
+    FEATURE_ENCODINGS,
+    LCORE_D_SOURCE_URL,
+    AdaptiveFeatureExtractor,
+    FeaturePlan,
+    iter_records_from_paths,
+    row_to_canonical_event,
+)
+
+_WORKER_PLAN: FeaturePlan | None = None
+_WORKER_RUN_ID = ""
 
 
 def _parse_args() -> argparse.Namespace:
@@ -23,12 +36,156 @@ def _parse_args() -> argparse.Namespace:
     parser.add_argument("--run-id", default="", help="Optional replay/run identifier included in dataset_context and event_id.")
     parser.add_argument("--source-uri", default=LCORE_D_SOURCE_URL)
     parser.add_argument("--sample-rows", type=int, default=5000)
+    parser.add_argument("--profile-checkpoint-rows", type=int, default=500, help="Re-rank field roles every N profiled rows.")
+    parser.add_argument(
+        "--profile-stable-checkpoints",
+        type=int,
+        default=3,
+        help="Stop profiling once roles are unchanged for this many checkpoints. 0 always profiles --sample-rows rows.",
+    )
     parser.add_argument("--max-records", type=int, default=0, help="0 means no conversion limit.")
+    parser.add_argument(
+        "--feature-encoding",
+        choices=FEATURE_ENCODINGS,
+        default="map",
+        help="map: metric names in every event. dense/f32b64: value array referenced by the plan hash in dataset_context.",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Canonicalization processes. 1 keeps the single-process path.")
+    parser.add_argument(
+        "--read-ahead",
+        type=int,
+        default=8,
+        help="Row batches read and decoded ahead on a background thread. 0 reads on the main thread.",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=2000, help="Rows per ordered work unit sent to a worker process.")
+    parser.add_argument(
+        "--shard-rows",
+        type=int,
+        default=0,
+        help="Split the output into JSONL shards of this many events plus a manifest. 0 writes a single file.",
+    )
     return parser.parse_args()
 
 
-def _records(inputs: list[str]) -> Iterable[dict]:
-    return iter_records_from_paths(inputs)
+def _records(inputs: list[str], read_ahead: int = 0) -> Iterable[dict]:
+    return iter_records_from_paths(inputs, read_ahead=read_ahead)
+
+
+def _dump_event(event: dict[str, Any]) -> str:
+    return json.dumps(event, ensure_ascii=True, separators=(",", ":"))
+
+
+def _init_worker(plan_payload: dict[str, Any], run_id: str) -> None:
+    global _WORKER_PLAN, _WORKER_RUN_ID
+    _WORKER_PLAN = FeaturePlan(**plan_payload)
+    _WORKER_RUN_ID = run_id
+
+
+def _canonicalize_chunk(chunk: tuple[int, list[Any]]) -> list[str]:
+    start_index, rows = chunk
+    assert _WORKER_PLAN is not None
+    return [
+        _dump_event(row_to_canonical_event(row, _WORKER_PLAN, row_index, run_id=_WORKER_RUN_ID))
+        for row_index, row in enumerate(rows, start=start_index)
+    ]
+
+
+def _chunks(rows: Iterable[Any], chunk_rows: int) -> Iterator[tuple[int, list[Any]]]:
+    iterator = iter(rows)
+    start_index = 0
+    while True:
+        chunk = list(islice(iterator, chunk_rows))
+        if not chunk:
+            return
+        yield start_index, chunk
+        start_index += len(chunk)
+
+
+def _iter_serial_lines(
+    extractor: AdaptiveFeatureExtractor,
+    rows: Iterable[Any],
+    plan: FeaturePlan,
+    run_id: str,
+) -> Iterator[str]:
+    for event in extractor.transform(rows, plan, run_id=run_id):
+        yield _dump_event(event)
+
+
+def _iter_parallel_lines(
+    rows: Iterable[Any],
+    plan: FeaturePlan,
+    run_id: str,
+    workers: int,
+    chunk_rows: int,
+) -> Iterator[str]:
+    # Chunks carry their global start index, so event_id and row_index match the
+    # serial path. Results are drained strictly in submission order and the
+    # in-flight window is bounded to keep memory flat on full-dataset runs.
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(plan.to_dict(), run_id),
+    ) as pool:
+        pending: deque[Any] = deque()
+        for chunk in _chunks(rows, chunk_rows):
+            pending.append(pool.submit(_canonicalize_chunk, chunk))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class _ShardedJsonlWriter:
+    def __init__(self, output_path: Path, shard_rows: int) -> None:
+        self.output_path = output_path
+        self.shard_rows = shard_rows
+        self.shards: list[dict[str, Any]] = []
+        self.written = 0
+        self._fp: Any = None
+        self._shard_written = 0
+
+    def write(self, line: str) -> None:
+        if self._fp is None or (self.shard_rows > 0 and self._shard_written >= self.shard_rows):
+            self._open_next()
+        self._fp.write(line + "\n")
+        self._shard_written += 1
+        self.written += 1
+
+    def close(self) -> None:
+        if not self.shards and self.shard_rows == 0:
+            self.output_path.write_text("", encoding="utf-8")
+        self._close_current()
+
+    def manifest(self) -> dict[str, Any]:
+        return {
+            "schema_version": 1,
+            "events_written": self.written,
+            "shard_rows": self.shard_rows,
+            "shards": self.shards,
+        }
+
+    def _open_next(self) -> None:
+        self._close_current()
+        if self.shard_rows > 0:
+            path = self.output_path.with_name(f"{self.output_path.stem}-{len(self.shards):05d}{self.output_path.suffix}")
+        else:
+            path = self.output_path
+        self._fp = path.open("w", encoding="utf-8")
+        self._shard_written = 0
+        self.shards.append({"path": str(path), "first_row_index": self.written, "rows": 0})
+
+    def _close_current(self) -> None:
+        if self._fp is None:
+            return
+        self._fp.close()
+        self.shards[-1]["rows"] = self._shard_written
+        self.shards[-1]["bytes"] = Path(self.shards[-1]["path"]).stat().st_size
+        self._fp = None
+
+
+def _manifest_path(output_path: Path) -> Path:
+    return output_path.with_name(f"{output_path.stem}.manifest.json")
 
 
 def main() -> None:
@@ -37,38 +194,65 @@ def main() -> None:
         dataset_id=args.dataset_id,
         source_uri=args.source_uri,
         max_sample_rows=args.sample_rows,
+        feature_encoding=args.feature_encoding,
+        checkpoint_rows=args.profile_checkpoint_rows,
+        stable_checkpoints=args.profile_stable_checkpoints,
     )
 
     plan = extractor.build_plan(_records(args.input))
     plan_path = Path(args.plan_json)
     plan_path.parent.mkdir(parents=True, exist_ok=True)
-    plan_path.write_text(json.dumps(plan.to_dict(), ensure_ascii=True, indent=2, sort_keys=True) + "\n")
+    plan_path.write_text(json.dumps(plan.to_document(), ensure_ascii=True, indent=2, sort_keys=True) + "\n")
 
     output_path = Path(args.output_jsonl)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    row_iter = _records(args.input)
+    row_iter = _records(args.input, max(args.read_ahead, 0))
     if args.max_records > 0:
         row_iter = islice(row_iter, args.max_records)
 
-    written = 0
-    with output_path.open("w", encoding="utf-8") as fp:
-        for event in extractor.transform(row_iter, plan, run_id=args.run_id):
-            fp.write(json.dumps(event, ensure_ascii=True, separators=(",", ":")) + "\n")
-            written += 1
+    workers = max(args.workers, 1)
+    if workers > 1:
+        lines = _iter_parallel_lines(row_iter, plan, args.run_id, workers, max(args.chunk_rows, 1))
+    else:
+        lines = _iter_serial_lines(extractor, row_iter, plan, args.run_id)
+
+    started = time.monotonic()
+    writer = _ShardedJsonlWriter(output_path, max(args.shard_rows, 0))
+    try:
+        for line in lines:
+            writer.write(line)
+    finally:
+        writer.close()
+    elapsed = max(time.monotonic() - started, 1e-6)
+
+    manifest_path = None
+    if args.shard_rows > 0:
+        manifest = writer.manifest()
+        manifest.update({"dataset_id": args.dataset_id, "run_id": args.run_id, "plan_json": str(plan_path)})
+        manifest_path = _manifest_path(output_path)
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=True, indent=2, sort_keys=True) + "\n")
 
     summary = {
         "dataset_id": args.dataset_id,
         "run_id": args.run_id,
         "source_uri": args.source_uri,
         "observed_rows_for_plan": plan.observed_rows,
+        "plan_stable_after_rows": plan.stable_after_rows,
+        "profile_stop_reason": plan.profile_stop_reason,
         "total_columns": plan.total_columns,
         "metric_fields": len(plan.metric_fields),
+        "feature_encoding": plan.feature_encoding,
+        "plan_hash": plan.plan_hash(),
         "label_fields": plan.label_fields,
         "entity_fields": plan.entity_fields,
         "topology_fields": plan.topology_fields,
         "scenario_values": plan.scenario_values,
-        "events_written": written,
-        "output_jsonl": str(output_path),
+        "events_written": writer.written,
+        "workers": workers,
+        "elapsed_sec": round(elapsed, 3),
+        "events_per_sec": round(writer.written / elapsed, 2),
+        "output_jsonl": str(output_path) if manifest_path is None else [shard["path"] for shard in writer.shards],
+        "manifest_json": str(manifest_path) if manifest_path else "",
         "plan_json": str(plan_path),
     }
     print(json.dumps(summary, ensure_ascii=False, indent=2, sort_keys=True))
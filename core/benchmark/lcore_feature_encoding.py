@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import replace
+from itertools import islice
+from typing import Any
+
+from common.data_features import (
+    FEATURE_ENCODINGS,
+    LCORE_D_SOURCE_URL,
+    AdaptiveFeatureExtractor,
+    FeaturePlanRegistry,
+    feature_vector_view,
+    iter_records_from_paths,
+    row_to_canonical_event,
+)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare canonical LCORE fact size and parse time across feature_vector encodings."
+    )
+    parser.add_argument("--input", action="append", required=True, help="Input file, zip, or directory.")
+    parser.add_argument("--dataset-id", default="lcore-d")
+    parser.add_argument("--source-uri", default=LCORE_D_SOURCE_URL)
+    parser.add_argument("--sample-rows", type=int, default=5000)
+    parser.add_argument("--max-records", type=int, default=20000, help="Rows to encode per variant.")
+    return parser.parse_args()
+
+
+def _measure(lines: list[str], registry: FeaturePlanRegistry) -> dict[str, Any]:
+    total_bytes = sum(len(line) + 1 for line in lines)
+    vector_bytes = 0
+
+    started = time.perf_counter()
+    events = [json.loads(line) for line in lines]
+    parse_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    metric_reads = 0
+    for event in events:
+        vector = feature_vector_view(event, registry)
+        metric_reads += len(vector)
+    decode_sec = time.perf_counter() - started
+
+    for event in events:
+        vector_bytes += len(json.dumps(event.get("feature_vector"), ensure_ascii=True, separators=(",", ":")))
+
+    count = max(len(lines), 1)
+    return {
+        "events": len(lines),
+        "avg_event_bytes": round(total_bytes / count, 1),
+        "avg_feature_vector_bytes": round(vector_bytes / count, 1),
+        "parse_us_per_event": round(parse_sec / count * 1e6, 2),
+        "decode_us_per_event": round(decode_sec / count * 1e6, 2),
+        "metric_values_read": metric_reads,
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    extractor = AdaptiveFeatureExtractor(
+        dataset_id=args.dataset_id,
+        source_uri=args.source_uri,
+        max_sample_rows=args.sample_rows,
+    )
+    base_plan = extractor.build_plan(iter_records_from_paths(args.input))
+    rows = list(islice(iter_records_from_paths(args.input), max(args.max_records, 1)))
+
+    results: dict[str, Any] = {}
+    for encoding in FEATURE_ENCODINGS:
+        plan = replace(base_plan, feature_encoding=encoding)
+        registry = FeaturePlanRegistry()
+        registry.register(plan.to_document())
+        lines = [
+            json.dumps(row_to_canonical_event(row, plan, index), ensure_ascii=True, separators=(",", ":"))
+            for index, row in enumerate(rows)
+        ]
+        results[encoding] = _measure(lines, registry)
+
+    baseline = results["map"]
+    for encoding, result in results.items():
+        result["size_vs_map"] = round(result["avg_event_bytes"] / max(baseline["avg_event_bytes"], 1e-9), 3)
+        result["parse_vs_map"] = round(result["parse_us_per_event"] / max(baseline["parse_us_per_event"], 1e-9), 3)
+
+    summary = {
+        "dataset_id": args.dataset_id,
+        "metric_fields": len(base_plan.metric_fields),
+        "rows": len(rows),
+        "encodings": results,
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
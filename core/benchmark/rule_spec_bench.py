@@ -0,0 +1,64 @@
+import argparse
+import dataclasses
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from core.benchmark.correlator_batch_bench import _stream
+from core.correlator.rule_specs import parse_rule_specs
+from core.correlator.rules import RuleConfig, RuleEngine
+
+_PROFILE = Path(__file__).resolve().parents[1] / "correlator" / "profiles" / "declarative_20260308.json"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Throughput of the builtin deny/bytes rules vs the same rules as declarative specs."
+    )
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--events-per-sec", type=float, default=5_000.0)
+    parser.add_argument("--devices", type=int, default=300)
+    parser.add_argument("--profile", default=str(_PROFILE), help="Profile whose rules replace the builtins.")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def _config(profile: dict[str, Any]) -> RuleConfig:
+    values = {field.name: profile[field.name] for field in dataclasses.fields(RuleConfig) if field.name in profile}
+    return RuleConfig(**values)
+
+
+def _replay(config: RuleConfig, events: list[dict[str, Any]]) -> tuple[float, list[list[dict[str, Any]]]]:
+    engine = RuleEngine(config)
+    started = time.perf_counter()
+    results = [engine.process(event) for event in events]
+    return time.perf_counter() - started, results
+
+
+def main() -> None:
+    args = _parse_args()
+    with open(args.profile, "r", encoding="utf-8") as fp:
+        profile = json.load(fp)
+    builtin = _config(profile)
+    declarative = dataclasses.replace(builtin, rule_specs=parse_rule_specs(profile.get("rules") or []))
+    events = _stream(args.events, args.events_per_sec, args.devices, args.seed)
+
+    builtin_sec, expected = _replay(builtin, events)
+    spec_sec, actual = _replay(declarative, events)
+    summary = {
+        "events": args.events,
+        "devices": args.devices,
+        "profile": args.profile,
+        "rules": [spec.rule_id for spec in declarative.rule_specs],
+        "alerts": sum(len(alerts) for alerts in expected),
+        "alerts_match": actual == expected,
+        "builtin_events_per_sec": int(len(events) / max(builtin_sec, 1e-9)),
+        "spec_events_per_sec": int(len(events) / max(spec_sec, 1e-9)),
+        "spec_relative_throughput": round(builtin_sec / max(spec_sec, 1e-9), 2),
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
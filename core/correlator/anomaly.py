@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import base64
+import logging
+import math
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+from common.data_features.vectors import FeaturePlanRegistry
+from core.correlator.state_map import ExpiringMap
+
+LOGGER = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # optional; without it each fact is scored metric by metric
+    np = None
+
+# A metric's standard deviation is floored at this fraction of its mean, so a
+# metric that has been constant does not turn every small change into a huge z.
+_RELATIVE_STD_FLOOR = 0.01
+_MIN_STD = 1e-9
+_TOP_METRICS = 5
+# Distinct ``map`` baseline layouts indexed before the cache starts over.
+_MAX_MAP_LAYOUTS = 1024
+
+
+@dataclass(frozen=True)
+class AnomalySpec:
+    """Per-device EWMA baseline of ``feature_vector`` and its z-score alert.
+
+    ``alpha`` is the EWMA weight of each new fact. A metric is scored once it
+    has ``warmup`` observations; a fact alerts when at least ``min_metrics``
+    metrics are ``z_threshold`` standard deviations from their mean.
+    ``plan_paths`` are feature plan JSON files, needed to read ``dense`` and
+    ``f32b64`` vectors.
+    """
+
+    rule_id: str = "feature_zscore_v1"
+    severity: str = "warning"
+    alpha: float = 0.05
+    z_threshold: float = 4.0
+    min_metrics: int = 3
+    warmup: int = 30
+    state_ttl_sec: int = 3600
+    plan_paths: tuple[str, ...] = ()
+
+
+def parse_anomaly_spec(item: Any) -> AnomalySpec | None:
+    """Validate the ``feature_anomaly`` object of a rule profile (None when absent or disabled)."""
+    if item is None:
+        return None
+    if not isinstance(item, dict):
+        raise ValueError(f"invalid feature_anomaly (dict expected): {item!r}")
+    if not item.get("enabled", True):
+        return None
+    defaults = AnomalySpec()
+    spec = AnomalySpec(
+        rule_id=str(item.get("rule_id") or defaults.rule_id),
+        severity=str(item.get("severity") or defaults.severity),
+        alpha=float(item.get("alpha", defaults.alpha)),
+        z_threshold=float(item.get("z_threshold", defaults.z_threshold)),
+        min_metrics=int(item.get("min_metrics", defaults.min_metrics)),
+        warmup=int(item.get("warmup", defaults.warmup)),
+        state_ttl_sec=int(item.get("state_ttl_sec", defaults.state_ttl_sec)),
+        plan_paths=tuple(str(path) for path in item.get("plan_paths") or []),
+    )
+    if not 0.0 < spec.alpha <= 1.0:
+        raise ValueError(f"feature_anomaly alpha must be in (0, 1]: {spec.alpha}")
+    if spec.z_threshold <= 0 or spec.min_metrics < 1 or spec.warmup < 1:
+        raise ValueError("feature_anomaly z_threshold, min_metrics and warmup must be positive")
+    return spec
+
+
+class FeatureBaseline:
+    """EWMA mean and variance, and observation counts, per metric of one device."""
+
+    __slots__ = ("layout", "names", "mean", "var", "count")
+
+    def __init__(self, layout: str, names: tuple[str, ...]) -> None:
+        self.layout = layout
+        self.names = names
+        self.mean = _zeros(len(names))
+        self.var = _zeros(len(names))
+        self.count = _zeros(len(names))
+
+    def grow(self, names: tuple[str, ...]) -> None:
+        """Append metrics first seen in a later ``map`` vector."""
+        extra = len(names) - len(self.names)
+        self.names = names
+        self.mean, self.var, self.count = (_extend(values, extra) for values in (self.mean, self.var, self.count))
+
+    @property
+    def size_bytes(self) -> int:
+        return 3 * 8 * len(self.names)
+
+    def export_state(self) -> dict[str, Any]:
+        return {
+            "layout": self.layout,
+            "names": list(self.names) if not self.layout else [],
+            "mean": _encode(self.mean),
+            "var": _encode(self.var),
+            "count": _encode(self.count),
+        }
+
+    @classmethod
+    def load(cls, state: Mapping[str, Any], names: tuple[str, ...]) -> FeatureBaseline | None:
+        baseline = cls(str(state.get("layout") or ""), names)
+        arrays = [_decode(str(state.get(name) or "")) for name in ("mean", "var", "count")]
+        if any(len(values) != len(names) for values in arrays):
+            return None
+        baseline.mean, baseline.var, baseline.count = arrays
+        return baseline
+
+
+class FeatureZScoreRule:
+    """Scores each fact's ``feature_vector`` against its device baseline, then updates it.
+
+    Baselines are contiguous float64 arrays in the feature plan's metric
+    order. With numpy, a fact is decoded and scored in a few vector
+    operations; a ``map`` vector's values are scattered into that order
+    through a name -> position index cached per baseline layout.
+    """
+
+    def __init__(self, spec: AnomalySpec, max_keys: int = 0) -> None:
+        self.spec = spec
+        self.registry = FeaturePlanRegistry()
+        for path in spec.plan_paths:
+            try:
+                self.registry.load(path)
+            except (OSError, ValueError, TypeError) as exc:
+                LOGGER.warning("feature plan not loaded path=%s error=%s", path, exc)
+        self.baselines = ExpiringMap(spec.state_ttl_sec, max_keys)
+        self._unknown_plans: set[str] = set()
+        # Baseline metric names of ``map`` vectors -> position of each name
+        self._map_layouts: dict[tuple[str, ...], dict[str, int]] = {}
+
+    def evaluate(self, key: str, event: dict[str, Any], ts: float) -> dict[str, Any] | None:
+        """Metrics of an alert for ``event``'s fact, or None; the baseline is updated either way."""
+        vector = event.get("feature_vector")
+        if not vector:
+            return None
+        baseline = self.baselines.get(key)
+        try:
+            read = self._read(vector, event, baseline)
+        except (TypeError, ValueError):
+            return None
+        if read is None:
+            return None
+        layout, names, values = read
+        if baseline is None or baseline.layout != layout:
+            baseline = FeatureBaseline(layout, names)
+        elif len(names) > len(baseline.names):
+            baseline.grow(names)
+        self.baselines.set(key, baseline, ts)
+
+        spec = self.spec
+        score = _score_numpy if np is not None else _score_python
+        hits = score(baseline, values, spec.alpha, spec.z_threshold, spec.warmup)
+        if len(hits) < spec.min_metrics:
+            return None
+        top = sorted(hits, key=lambda hit: -abs(hit[1]))
+        return {
+            "anomalous_metrics": len(hits),
+            "metric_count": len(names),
+            "max_abs_z": round(abs(top[0][1]), 2),
+            "z_threshold": spec.z_threshold,
+            "min_metrics": spec.min_metrics,
+            "top_metrics": {baseline.names[index]: round(z, 2) for index, z in top[:_TOP_METRICS]},
+        }
+
+    def export_state(self) -> dict[str, Any]:
+        baselines = self.baselines
+        return {key: {**baseline.export_state(), "seen_at": baselines.touched(key)} for key, baseline in baselines.items()}
+
+    def import_state(self, state: dict[str, Any], default_seen_at: float) -> None:
+        self.baselines.clear()
+        saved_items = sorted(state.items(), key=lambda item: float(item[1].get("seen_at") or default_seen_at))
+        for key, saved in saved_items:
+            layout = str(saved.get("layout") or "")
+            names = self.registry.metric_fields(layout) if layout else tuple(saved.get("names") or [])
+            baseline = FeatureBaseline.load(saved, names) if names else None
+            if baseline is not None:
+                self.baselines.set(key, baseline, float(saved.get("seen_at") or default_seen_at))
+
+    def _read(self, vector: Any, event: dict[str, Any], baseline: FeatureBaseline | None) -> tuple[str, tuple[str, ...], Any] | None:
+        if isinstance(vector, Mapping):
+            names = baseline.names if baseline is not None and not baseline.layout else ()
+            if np is not None:
+                values = self._read_map(vector, names)
+                if values is not None:
+                    return "", values[0], values[1]
+            known = set(names)
+            if not vector.keys() <= known:
+                names = names + tuple(name for name in vector if name not in known)
+            return "", names, _vector([_float(vector.get(name)) for name in names])
+
+        context = event.get("dataset_context") or {}
+        plan_hash = str(context.get("feature_plan_hash") or "")
+        names = self.registry.metric_fields(plan_hash)
+        if names is None:
+            if plan_hash not in self._unknown_plans:
+                self._unknown_plans.add(plan_hash)
+                LOGGER.warning("feature vectors of unknown plan skipped plan_hash=%s", plan_hash or "-")
+            return None
+        encoding = str(context.get("feature_encoding") or ("f32b64" if isinstance(vector, str) else "dense"))
+        values = _decode_f32(vector) if encoding == "f32b64" else _dense(vector)
+        if len(values) != len(names):
+            return None
+        return plan_hash, names, values
+
+
+    def _read_map(self, vector: Mapping[str, Any], names: tuple[str, ...]) -> tuple[tuple[str, ...], Any] | None:
+        """``map`` vector as an array in baseline order, or None when a value is not numeric."""
+        index = self._name_index(names)
+        try:
+            positions = np.fromiter(map(index.__getitem__, vector), dtype=np.intp, count=len(vector))
+        except KeyError:
+            # Metrics first seen in this vector are appended to the layout.
+            names = names + tuple(name for name in vector if name not in index)
+            index = self._name_index(names)
+            positions = np.fromiter(map(index.__getitem__, vector), dtype=np.intp, count=len(vector))
+        try:
+            present = np.array(list(vector.values()), dtype=np.float64)
+        except (TypeError, ValueError):
+            return None
+        if present.shape != positions.shape:
+            return None
+        values = np.full(len(names), np.nan)
+        values[positions] = present
+        return names, values
+
+    def _name_index(self, names: tuple[str, ...]) -> dict[str, int]:
+        index = self._map_layouts.get(names)
+        if index is None:
+            if len(self._map_layouts) >= _MAX_MAP_LAYOUTS:
+                self._map_layouts.clear()
+            index = self._map_layouts[names] = {name: position for position, name in enumerate(names)}
+        return index
+
+
+def _score_numpy(baseline: FeatureBaseline, values: Any, alpha: float, threshold: float, warmup: int) -> list[tuple[int, float]]:
+    mean, var, count = baseline.mean, baseline.var, baseline.count
+    valid = ~np.isnan(values)
+    std = np.sqrt(var) + _RELATIVE_STD_FLOOR * np.abs(mean) + _MIN_STD
+    delta = np.where(valid, values - mean, 0.0)
+    z = np.where(valid & (count >= warmup), delta / std, 0.0)
+    hits = np.flatnonzero(np.abs(z) >= threshold)
+
+    first = valid & (count == 0)
+    baseline.mean = np.where(first, values, mean + alpha * delta)
+    baseline.var = np.where(first, 0.0, np.where(valid, (1.0 - alpha) * (var + alpha * delta * delta), var))
+    baseline.count = count + valid
+    return [(int(index), float(z[index])) for index in hits]
+
+
+def _score_python(baseline: FeatureBaseline, values: Any, alpha: float, threshold: float, warmup: int) -> list[tuple[int, float]]:
+    mean, var, count = baseline.mean, baseline.var, baseline.count
+    hits = []
+    for index, value in enumerate(values):
+        if math.isnan(value):
+            continue
+        if not count[index]:
+            mean[index], var[index], count[index] = value, 0.0, 1.0
+            continue
+        delta = value - mean[index]
+        if count[index] >= warmup:
+            z = delta / (math.sqrt(var[index]) + _RELATIVE_STD_FLOOR * abs(mean[index]) + _MIN_STD)
+            if abs(z) >= threshold:
+                hits.append((index, z))
+        mean[index] += alpha * delta
+        var[index] = (1.0 - alpha) * (var[index] + alpha * delta * delta)
+        count[index] += 1.0
+    return hits
+
+
+def _zeros(size: int) -> Any:
+    return np.zeros(size) if np is not None else array("d", bytes(8 * size))
+
+
+def _extend(values: Any, extra: int) -> Any:
+    if np is not None:
+        return np.concatenate([values, np.zeros(extra)])
+    return values + array("d", bytes(8 * extra))
+
+
+def _vector(values: list[float]) -> Any:
+    return np.array(values, dtype=np.float64) if np is not None else array("d", values)
+
+
+def _dense(vector: list[Any]) -> Any:
+    if np is not None:
+        try:
+            # None becomes NaN; anything non-numeric falls back to a per-value read.
+            return np.array(vector, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    return _vector([_float(value) for value in vector])
+
+
+def _decode_f32(payload: Any) -> Any:
+    raw = base64.b64decode(payload)
+    if np is not None:
+        return np.frombuffer(raw, dtype="<f4").astype(np.float64)
+    values = array("f")
+    values.frombytes(raw)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return array("d", values)
+
+
+def _encode(values: Any) -> str:
+    packed = array("d", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+def _decode(payload: str) -> Any:
+    values = array("d")
+    values.frombytes(base64.b64decode(payload))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return np.array(values, dtype=np.float64) if np is not None else values
+
+
+def _float(value: Any) -> float:
+    if value is None or isinstance(value, bool):
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
@@ -0,0 +1,224 @@
+import base64
+import hashlib
+import logging
+import math
+import random
+import time
+from array import array
+from collections import deque
+from typing import Any, Callable
+
+LOGGER = logging.getLogger(__name__)
+
+DEDUP_BACKENDS = ("exact", "cuckoo")
+
+# Rough size of one remembered event_id (set entry + deque slot + string).
+_DEDUP_ID_BYTES = 140
+
+_BUCKET_SLOTS = 4
+_MAX_LOAD = 0.9
+_MAX_KICKS = 500
+_TYPECODES = {8: "B", 16: "H", 32: "I"}
+
+
+class ExactDedup:
+    """The last ``capacity`` event_ids, exactly."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._seen: set[str] = set()
+        self._order: deque[str] = deque()
+
+    def check_and_add(self, event_id: str) -> bool:
+        if event_id in self._seen:
+            return True
+
+        self._seen.add(event_id)
+        self._order.append(event_id)
+
+        while len(self._order) > self.capacity:
+            old = self._order.popleft()
+            self._seen.discard(old)
+
+        return False
+
+    def state_stats(self) -> dict[str, int]:
+        return {"dedup_ids": len(self._order), "dedup_bytes_approx": len(self._order) * _DEDUP_ID_BYTES}
+
+    def export_state(self) -> dict[str, Any]:
+        return {"seen_order": list(self._order)}
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        if "cuckoo" in state and "seen_order" not in state:
+            LOGGER.warning("exact dedup cannot restore a cuckoo dedup snapshot; starting empty")
+        order = [str(item) for item in state.get("seen_order") or []][-self.capacity :]
+        self._order = deque(order)
+        self._seen = set(order)
+
+
+class CuckooFilter:
+    """Cuckoo filter: fingerprints in buckets of 4, each with two candidate buckets.
+
+    The fingerprint width (8, 16 or 32 bits) is the smallest whose false-positive
+    rate, about ``8 * load / 2**bits`` per lookup, stays under ``fp_rate``.
+    Buckets are sized so ``capacity`` items fill them to about 90%.
+    """
+
+    __slots__ = ("buckets", "bits", "count", "_mask", "_table", "_rng")
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        self.buckets = max(1, int(math.ceil(max(capacity, 1) / (_BUCKET_SLOTS * _MAX_LOAD))))
+        self.bits = next((bits for bits in (8, 16, 32) if 8 / 2**bits <= fp_rate), 32)
+        self.count = 0
+        self._mask = 2**self.bits - 1
+        self._table = array(_TYPECODES[self.bits], bytes(self.buckets * _BUCKET_SLOTS * self.bits // 8))
+        self._rng = random.Random(self.buckets)
+
+    def locate(self, fingerprint: int) -> tuple[int, int, int]:
+        """(tag, first bucket offset, second bucket offset); equal for filters of one geometry."""
+        tag = (fingerprint >> 32) & self._mask or 1
+        first = (fingerprint & 0xFFFFFFFF) % self.buckets
+        return tag, first * _BUCKET_SLOTS, self._alternate(tag, first) * _BUCKET_SLOTS
+
+    def _alternate(self, tag: int, bucket: int) -> int:
+        # (h - i) mod n is its own inverse, so either bucket leads to the other.
+        return (((tag * 0x5BD1E995) & 0xFFFFFFFF) - bucket) % self.buckets
+
+    def contains(self, tag: int, first: int, second: int) -> bool:
+        table = self._table
+        return tag in table[first : first + _BUCKET_SLOTS] or tag in table[second : second + _BUCKET_SLOTS]
+
+    def add(self, tag: int, first: int, second: int) -> bool:
+        """Insert; False when the filter is full (one fingerprint is then lost)."""
+        table = self._table
+        for base in (first, second):
+            bucket = table[base : base + _BUCKET_SLOTS]
+            if 0 in bucket:
+                table[base + bucket.index(0)] = tag
+                self.count += 1
+                return True
+        base = self._rng.choice((first, second))
+        for _ in range(_MAX_KICKS):
+            slot = base + self._rng.randrange(_BUCKET_SLOTS)
+            tag, table[slot] = table[slot], tag
+            base = self._alternate(tag, base // _BUCKET_SLOTS) * _BUCKET_SLOTS
+            bucket = table[base : base + _BUCKET_SLOTS]
+            if 0 in bucket:
+                table[base + bucket.index(0)] = tag
+                self.count += 1
+                return True
+        return False
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._table) * self._table.itemsize
+
+    def export_state(self) -> dict[str, Any]:
+        return {"count": self.count, "table": base64.b64encode(self._table.tobytes()).decode("ascii")}
+
+    def import_state(self, state: dict[str, Any]) -> bool:
+        raw = base64.b64decode(state.get("table") or "")
+        if len(raw) != self.size_bytes:
+            return False
+        table = array(self._table.typecode)
+        table.frombytes(raw)
+        self._table = table
+        self.count = int(state.get("count") or 0)
+        return True
+
+
+class CuckooDedup:
+    """Two rotating cuckoo filters: lookups check both, inserts go to the current one.
+
+    The current generation rotates into the previous one after ``capacity``
+    inserts, or after ``generation_sec`` seconds when that is set, so an id is
+    remembered for one to two generations. Each id costs 1 to 4 bytes per
+    generation instead of a full string; a lookup can report an unseen id as a
+    duplicate with about ``2 * fp_rate`` probability.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        fp_rate: float = 0.001,
+        generation_sec: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.generation_sec = generation_sec
+        self._clock = clock
+        self._current = CuckooFilter(capacity, fp_rate)
+        self._previous = CuckooFilter(capacity, fp_rate)
+        self._started = clock()
+        self.rotations = 0
+        self.overflows = 0
+
+    def check_and_add(self, event_id: str) -> bool:
+        location = self._current.locate(_fingerprint(event_id))
+        if self._current.contains(*location) or self._previous.contains(*location):
+            return True
+        if self._current.count >= self.capacity or (
+            self.generation_sec > 0 and self._clock() - self._started >= self.generation_sec
+        ):
+            self._rotate()
+        if not self._current.add(*location):
+            self.overflows += 1
+            self._rotate()
+            self._current.add(*location)
+        return False
+
+    def _rotate(self) -> None:
+        self._previous = self._current
+        self._current = CuckooFilter(self.capacity, self.fp_rate)
+        self._started = self._clock()
+        self.rotations += 1
+
+    def state_stats(self) -> dict[str, int]:
+        return {
+            "dedup_ids": self._current.count + self._previous.count,
+            "dedup_bytes_approx": self._current.size_bytes + self._previous.size_bytes,
+            "dedup_rotations": self.rotations,
+            "dedup_overflows": self.overflows,
+        }
+
+    def export_state(self) -> dict[str, Any]:
+        return {
+            "cuckoo": {
+                "buckets": self._current.buckets,
+                "bits": self._current.bits,
+                "current": self._current.export_state(),
+                "previous": self._previous.export_state(),
+            }
+        }
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        cuckoo = state.get("cuckoo")
+        current = CuckooFilter(self.capacity, self.fp_rate)
+        previous = CuckooFilter(self.capacity, self.fp_rate)
+        self._started = self._clock()
+        if isinstance(cuckoo, dict):
+            if (
+                int(cuckoo.get("buckets") or 0) == current.buckets
+                and int(cuckoo.get("bits") or 0) == current.bits
+                and current.import_state(cuckoo.get("current") or {})
+                and previous.import_state(cuckoo.get("previous") or {})
+            ):
+                self._current, self._previous = current, previous
+                return
+            LOGGER.warning("cuckoo dedup snapshot does not match the configured capacity/fp_rate; starting empty")
+        # Ids from an exact-dedup snapshot fill the current generation.
+        for event_id in [str(item) for item in state.get("seen_order") or []][-self.capacity :]:
+            current.add(*current.locate(_fingerprint(event_id)))
+        self._current, self._previous = current, previous
+
+
+def build_dedup(backend: str, capacity: int, fp_rate: float = 0.001, generation_sec: float = 0.0) -> ExactDedup | CuckooDedup:
+    if backend == "cuckoo":
+        return CuckooDedup(capacity, fp_rate=fp_rate, generation_sec=generation_sec)
+    return ExactDedup(capacity)
+
+
+def _fingerprint(event_id: str) -> int:
+    # Unlike hash(), stable across processes, so restored filters still match.
+    return int.from_bytes(hashlib.blake2b(event_id.encode("utf-8"), digest_size=8).digest(), "little")
@@ -6,23 +6,26 @@ from typing import Any
 
 from kafka import KafkaConsumer, KafkaProducer
 
-from common.infra.config import env_int, env_str
+from common.alerts import ALERT_SCHEMAS, AlertEncoder, alert_owner
+from common.infra.config import env_float, env_int, env_str
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender, rebalance_listener
 from common.infra.logging_utils import configure_logging
+from core.correlator.dedup import DEDUP_BACKENDS
+from core.correlator.partition_state import STATE_SCOPES, CorrelatorState, PartitionStates, per_state_capacity, scoped_rule_config
 from core.correlator.quality_gate import QualityGate
 from core.correlator.rule_profile import load_rule_config
 from core.correlator.rules import RuleEngine
+from core.correlator.snapshot import SnapshotStore, StateSnapshotter, read_changelog
 
 LOGGER = logging.getLogger(__name__)
 
 
 def _build_consumer(
     bootstrap_servers: str,
-    topic: str,
     group_id: str,
     auto_offset_reset: str,
 ) -> KafkaConsumer:
     return KafkaConsumer(
-        topic,
         bootstrap_servers=[x.strip() for x in bootstrap_servers.split(",") if x.strip()],
         group_id=group_id,
         enable_auto_commit=False,
@@ -54,14 +57,49 @@ def main() -> None:
         LOGGER.warning("invalid KAFKA_AUTO_OFFSET_RESET=%s, fallback to latest", auto_offset_reset)
         auto_offset_reset = "latest"
     dedup_cache_size = env_int("CORRELATOR_DEDUP_CACHE_SIZE", 200_000)
+    dedup_backend = env_str("CORRELATOR_DEDUP_BACKEND", "exact").lower()
+    if dedup_backend not in DEDUP_BACKENDS:
+        LOGGER.warning("invalid CORRELATOR_DEDUP_BACKEND=%s, fallback to exact", dedup_backend)
+        dedup_backend = "exact"
+    dedup_fp_rate = env_float("CORRELATOR_DEDUP_FP_RATE", 0.001)
+    if not 0 < dedup_fp_rate < 1:
+        LOGGER.warning("invalid CORRELATOR_DEDUP_FP_RATE=%s, fallback to 0.001", dedup_fp_rate)
+        dedup_fp_rate = 0.001
+    dedup_generation_sec = env_float("CORRELATOR_DEDUP_GENERATION_SEC", 0.0)
+    state_scope = env_str("CORRELATOR_STATE_SCOPE", "partition").lower()
+    if state_scope not in STATE_SCOPES:
+        LOGGER.warning("invalid CORRELATOR_STATE_SCOPE=%s, fallback to partition", state_scope)
+        state_scope = "partition"
     log_interval_sec = env_int("CORRELATOR_LOG_INTERVAL_SEC", 30)
+    batch_settings = KafkaBatchSettings.from_env()
+    snapshot_dir = env_str("CORRELATOR_SNAPSHOT_DIR", "")
+    snapshot_interval_sec = env_float("CORRELATOR_SNAPSHOT_INTERVAL_SEC", 60.0)
+    changelog_topic = env_str("CORRELATOR_CHANGELOG_TOPIC", "")
+    alert_schema = env_int("ALERT_SCHEMA_VERSION", 1)
+    if alert_schema not in ALERT_SCHEMAS:
+        LOGGER.warning("invalid ALERT_SCHEMA_VERSION=%s, fallback to 1", alert_schema)
+        alert_schema = 1
+    encoder = AlertEncoder(env_float("ALERT_CONTEXT_REFRESH_SEC", 600.0)) if alert_schema == 2 else None
 
     rules = load_rule_config()
 
-    gate = QualityGate(dedup_cache_size=dedup_cache_size)
-    engine = RuleEngine(rules)
-    consumer = _build_consumer(bootstrap_servers, topic_raw, consumer_group, auto_offset_reset)
+    consumer = _build_consumer(bootstrap_servers, consumer_group, auto_offset_reset)
     producer = _build_producer(bootstrap_servers)
+    topic_partitions = len(consumer.partitions_for_topic(topic_raw) or ())
+    state_dedup_cache_size = per_state_capacity(dedup_cache_size, state_scope, topic_partitions)
+    rules = scoped_rule_config(rules, state_scope, topic_partitions)
+    states = PartitionStates(
+        lambda: CorrelatorState(
+            QualityGate(
+                dedup_cache_size=state_dedup_cache_size,
+                dedup_backend=dedup_backend,
+                dedup_fp_rate=dedup_fp_rate,
+                dedup_generation_sec=dedup_generation_sec,
+            ),
+            RuleEngine(rules),
+        ),
+        scope=state_scope,
+    )
     stats = {
         "ingested": 0,
         "accepted": 0,
@@ -81,102 +119,179 @@ def main() -> None:
     LOGGER.info(
         (
             "correlator started: topic_raw=%s topic_alerts=%s group=%s offset_reset=%s "
-            "dedup_cache_size=%d"
+            "dedup_cache_size=%d state_dedup_cache_size=%d dedup_backend=%s state_scope=%s "
+            "topic_partitions=%d batch_max_records=%d commit_mode=%s "
+            "alert_schema=%d"
         ),
         topic_raw,
         topic_alerts,
         consumer_group,
         auto_offset_reset,
         dedup_cache_size,
+        state_dedup_cache_size,
+        dedup_backend,
+        state_scope,
+        topic_partitions,
+        batch_settings.max_records,
+        batch_settings.commit_mode,
+        alert_schema,
     )
 
-    for msg in consumer:
+    changelog: dict[str, bytes] = {}
+    if changelog_topic:
+        started = time.monotonic()
+        changelog = read_changelog(bootstrap_servers, changelog_topic, consumer_group)
+        LOGGER.info(
+            "correlator changelog loaded: topic=%s snapshots=%d elapsed_sec=%.2f",
+            changelog_topic,
+            len(changelog),
+            time.monotonic() - started,
+        )
+    store = SnapshotStore(snapshot_dir, producer, changelog_topic, consumer_group, changelog)
+
+    batches = BatchConsumer(consumer, batch_settings, stats)
+    snapshots = StateSnapshotter(states, batches, store, snapshot_interval_sec, stats)
+    consumer.subscribe([topic_raw], listener=rebalance_listener(batches, snapshots.on_assigned, snapshots.on_revoked))
+    sender = PipelinedSender(producer, batch_settings.send_timeout_sec)
+    try:
+        for batch in batches.batches():
+            _process_batch(batch, states, sender, batches, topic_alerts, topic_dlq, stats, encoder)
+            batches.maybe_commit()
+            snapshots.maybe_save()
+            now = time.time()
+            if now - stats_tick >= log_interval_sec:
+                stats.update(states.state_stats())
+                LOGGER.info("correlator stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
+                stats_tick = now
+    finally:
+        batches.close()
+        snapshots.save()
+
+
+def _process_batch(
+    batch: list[Any],
+    states: PartitionStates,
+    sender: PipelinedSender,
+    batches: BatchConsumer,
+    topic_alerts: str,
+    topic_dlq: str,
+    stats: dict[str, int],
+    encoder: AlertEncoder | None = None,
+) -> None:
+    # Alerts of the whole batch are sent back to back and awaited once; a record
+    # is acked when all of its alerts (or its DLQ copy) are acknowledged.
+    raws: dict[int, str] = {}
+    failed: dict[int, Any] = {}
+    compacts: dict[int, dict[str, Any]] = {}
+    # Accepted events are evaluated together per partition state, in arrival order.
+    accepted: dict[int, tuple[Any, list[tuple[Any, str, dict[str, Any]]]]] = {}
+    for msg in batch:
         stats["ingested"] += 1
-        should_commit = False
         raw = msg.value
         try:
             event = json.loads(raw)
         except json.JSONDecodeError:
             stats["json_error"] += 1
             LOGGER.warning("skip invalid json message partition=%s offset=%s", msg.partition, msg.offset)
-            if _send_dlq(producer, topic_dlq, msg, "invalid_json", raw):
-                stats["dlq_emitted"] += 1
-                should_commit = True
-            _commit_if_needed(consumer, should_commit, stats)
+            _send_dlq(sender, topic_dlq, msg, "invalid_json", raw)
             continue
 
-        accepted, reason = gate.evaluate(event)
-        if not accepted:
+        state = states.get(msg.topic, msg.partition)
+        ok, reason = state.gate.evaluate(event)
+        if not ok:
             key = f"drop_{reason}"
             stats[key] = stats.get(key, 0) + 1
-            should_commit = True
-            _commit_if_needed(consumer, should_commit, stats)
+            batches.ack(msg)
             continue
         stats["accepted"] += 1
+        accepted.setdefault(id(state), (state, []))[1].append((msg, raw, event))
 
+    for state, records in accepted.values():
         try:
-            alerts = engine.process(event)
+            results = state.engine.process_batch([event for _, _, event in records])
         except Exception as exc:
-            LOGGER.exception("rule processing failed partition=%s offset=%s err=%s", msg.partition, msg.offset, exc)
-            if _send_dlq(producer, topic_dlq, msg, "rule_processing_error", raw):
-                stats["dlq_emitted"] += 1
-                should_commit = True
-            _commit_if_needed(consumer, should_commit, stats)
+            first = records[0][0]
+            LOGGER.exception(
+                "rule processing failed partition=%s offsets=%s-%s err=%s",
+                first.partition,
+                first.offset,
+                records[-1][0].offset,
+                exc,
+            )
+            for msg, raw, _ in records:
+                _send_dlq(sender, topic_dlq, msg, "rule_processing_error", raw)
             continue
 
-        if not alerts:
-            should_commit = True
-            _commit_if_needed(consumer, should_commit, stats)
-            now = time.time()
-            if now - stats_tick >= log_interval_sec:
-                LOGGER.info("correlator stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
-                stats_tick = now
-            continue
+        for (msg, raw, _), alerts in zip(records, results):
+            if not alerts:
+                batches.ack(msg)
+                continue
 
-        send_ok = True
-        for alert in alerts:
-            payload = json.dumps(alert, separators=(",", ":"), ensure_ascii=True)
-            alert_key = str(alert.get("alert_id", "unknown")).encode("utf-8")
-            try:
-                producer.send(topic_alerts, key=alert_key, value=payload).get(timeout=30)
-            except Exception as exc:
-                LOGGER.exception(
-                    "failed to publish alert partition=%s offset=%s err=%s",
-                    msg.partition,
-                    msg.offset,
-                    exc,
-                )
-                send_ok = False
-                break
-            stats["alerts_emitted"] += 1
-            LOGGER.info(
-                "alert emitted rule=%s severity=%s source_event_id=%s",
-                alert.get("rule_id"),
-                alert.get("severity"),
-                alert.get("source_event_id"),
+            raws[id(msg)] = raw
+            for alert in alerts:
+                if encoder is None:
+                    payload = json.dumps(alert, separators=(",", ":"), ensure_ascii=True)
+                    alert_key = str(alert.get("alert_id", "unknown")).encode("utf-8")
+                else:
+                    # Compact alerts reference contexts sent earlier, so each device's alerts share a partition.
+                    compact = compacts[id(alert)] = encoder.encode(alert)
+                    payload = json.dumps(compact, separators=(",", ":"), ensure_ascii=True)
+                    alert_key = alert_owner(alert).encode("utf-8")
+                sender.send(topic_alerts, key=alert_key, value=payload, token=(msg, alert))
+
+    for (msg, alert), error in sender.gather():
+        if alert is None:
+            _on_dlq_result(batches, msg, error, stats)
+            continue
+        if error is None and encoder is not None:
+            # Contexts count as sent only once an alert carrying them is acked.
+            encoder.delivered(compacts[id(alert)])
+        if id(msg) in failed:
+            continue
+        if error is not None:
+            LOGGER.error(
+                "failed to publish alert partition=%s offset=%s err=%s",
+                msg.partition,
+                msg.offset,
+                error,
             )
+            failed[id(msg)] = msg
+            continue
+        stats["alerts_emitted"] += 1
+        LOGGER.info(
+            "alert emitted rule=%s severity=%s source_event_id=%s",
+            alert.get("rule_id"),
+            alert.get("severity"),
+            alert.get("source_event_id"),
+        )
+
+    for msg in batch:
+        if id(msg) in raws and id(msg) not in failed:
+            batches.ack(msg)
+
+    if not failed:
+        return
+    for msg in failed.values():
+        _send_dlq(sender, topic_dlq, msg, "alert_publish_error", raws[id(msg)])
+    for (msg, _), error in sender.gather():
+        _on_dlq_result(batches, msg, error, stats)
 
-        if send_ok:
-            should_commit = True
-        else:
-            if _send_dlq(producer, topic_dlq, msg, "alert_publish_error", raw):
-                stats["dlq_emitted"] += 1
-                should_commit = True
 
-        _commit_if_needed(consumer, should_commit, stats)
-        now = time.time()
-        if now - stats_tick >= log_interval_sec:
-            LOGGER.info("correlator stats: %s", json.dumps(stats, ensure_ascii=True, sort_keys=True))
-            stats_tick = now
+def _on_dlq_result(batches: BatchConsumer, msg: Any, error: Exception | None, stats: dict[str, int]) -> None:
+    if error is not None:
+        LOGGER.error("failed to publish dlq message partition=%s offset=%s err=%s", msg.partition, msg.offset, error)
+        return
+    stats["dlq_emitted"] += 1
+    batches.ack(msg)
 
 
 def _send_dlq(
-    producer: KafkaProducer,
+    sender: PipelinedSender,
     topic_dlq: str,
     msg: Any,
     reason: str,
     raw: str,
-) -> bool:
+) -> None:
     payload = {
         "schema_version": 1,
         "reason": reason,
@@ -186,27 +301,13 @@ def _send_dlq(
         "ingest_ts": datetime.now(timezone.utc).isoformat(),
         "raw": raw,
     }
-    try:
-        key = f"{msg.topic}:{msg.partition}:{msg.offset}".encode("utf-8")
-        producer.send(
-            topic_dlq,
-            key=key,
-            value=json.dumps(payload, separators=(",", ":"), ensure_ascii=True),
-        ).get(timeout=30)
-        return True
-    except Exception:
-        LOGGER.exception("failed to publish dlq message partition=%s offset=%s", msg.partition, msg.offset)
-        return False
-
-
-def _commit_if_needed(consumer: KafkaConsumer, should_commit: bool, stats: dict[str, int]) -> None:
-    if not should_commit:
-        return
-    try:
-        consumer.commit()
-    except Exception:
-        stats["commit_error"] += 1
-        LOGGER.exception("offset commit failed")
+    key = f"{msg.topic}:{msg.partition}:{msg.offset}".encode("utf-8")
+    sender.send(
+        topic_dlq,
+        key=key,
+        value=json.dumps(payload, separators=(",", ":"), ensure_ascii=True),
+        token=(msg, None),
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Callable
+
+from core.correlator.quality_gate import QualityGate
+from core.correlator.rules import RuleConfig, RuleEngine
+
+LOGGER = logging.getLogger(__name__)
+
+STATE_SCOPES = ("partition", "global")
+
+
+@dataclass
+class CorrelatorState:
+    gate: QualityGate
+    engine: RuleEngine
+
+
+class PartitionStates:
+    """``QualityGate`` + ``RuleEngine`` per assigned input partition.
+
+    With device-keyed input every device lives on one partition, so its windows,
+    cooldowns and dedup entries only ever need that partition's state. State is
+    created on first use or assignment and dropped when the partition is revoked,
+    which lets correlator replicas split the topic between them. The ``global``
+    scope keeps one shared state for event_id-keyed input.
+    """
+
+    def __init__(self, factory: Callable[[], CorrelatorState], scope: str = "partition") -> None:
+        self._factory = factory
+        self.scope = scope
+        self._states: dict[tuple[str, int], CorrelatorState] = {}
+
+    def key_for(self, topic: str, partition: int) -> tuple[str, int]:
+        return ("", -1) if self.scope == "global" else (topic, partition)
+
+    def get(self, topic: str, partition: int) -> CorrelatorState:
+        key = self.key_for(topic, partition)
+        state = self._states.get(key)
+        if state is None:
+            state = self._factory()
+            self._states[key] = state
+        return state
+
+    def assign(self, partitions: list[Any]) -> None:
+        if self.scope == "global":
+            return
+        for item in partitions:
+            self.get(item.topic, item.partition)
+        LOGGER.info("correlator partitions assigned: %s", _describe(partitions))
+
+    def revoke(self, partitions: list[Any]) -> None:
+        if self.scope == "global":
+            return
+        for item in partitions:
+            self._states.pop((item.topic, item.partition), None)
+        LOGGER.info("correlator partitions revoked: %s", _describe(partitions))
+
+    def partitions(self) -> list[tuple[str, int]]:
+        return sorted(self._states)
+
+    def items(self) -> list[tuple[tuple[str, int], CorrelatorState]]:
+        return sorted(self._states.items(), key=lambda item: item[0])
+
+    def state_stats(self) -> dict[str, float]:
+        """Gate and rule-engine gauges summed over all partitions."""
+        totals: dict[str, float] = {"state_partitions": len(self._states)}
+        for state in self._states.values():
+            for stats in (state.gate.state_stats(), state.engine.state_stats()):
+                for key, value in stats.items():
+                    totals[key] = totals.get(key, 0) + value
+        skipped = totals.get("prefilter_skipped", 0)
+        totals["prefilter_skipped_pct"] = round(100.0 * skipped / max(totals.get("rule_events", 0), 1), 1)
+        return totals
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+def per_state_capacity(total: int, scope: str, topic_partitions: int) -> int:
+    """Share of a replica-wide capacity for one state.
+
+    In ``partition`` scope the capacity is split over the input topic's
+    partitions, so a replica assigned every partition holds ``total`` entries
+    and one assigned fewer holds less.
+    """
+    if scope == "global":
+        return total
+    return max(total // max(topic_partitions, 1), 1)
+
+
+def scoped_rule_config(config: RuleConfig, scope: str, topic_partitions: int) -> RuleConfig:
+    """``config`` without the rules that need every device's facts in one state.
+
+    Topology fan-in joins neighboring devices, which device keys spread over
+    partitions, so in ``partition`` scope it would only see part of each
+    cluster. It is disabled there unless the input has a single partition.
+    """
+    if config.topology_fanin is None or scope == "global" or topic_partitions <= 1:
+        return config
+    LOGGER.warning(
+        "topology_fanin disabled: it needs CORRELATOR_STATE_SCOPE=global with %d input partitions", topic_partitions
+    )
+    return replace(config, topology_fanin=None)
+
+
+def _describe(partitions: list[Any]) -> str:
+    return ",".join(f"{item.topic}:{item.partition}" for item in partitions) or "-"
@@ -1,14 +1,20 @@
-from collections import deque
 from typing import Any
 
+from core.correlator.dedup import build_dedup
+
 
 class QualityGate:
     """Drop invalid and duplicated events before rule processing."""
 
-    def __init__(self, dedup_cache_size: int = 200_000):
+    def __init__(
+        self,
+        dedup_cache_size: int = 200_000,
+        dedup_backend: str = "exact",
+        dedup_fp_rate: float = 0.001,
+        dedup_generation_sec: float = 0.0,
+    ):
         self._dedup_cache_size = max(dedup_cache_size, 10_000)
-        self._seen = set()
-        self._order = deque()
+        self._dedup = build_dedup(dedup_backend, self._dedup_cache_size, dedup_fp_rate, dedup_generation_sec)
 
     def evaluate(self, event: dict[str, Any]) -> tuple[bool, str]:
         parse_status = str(event.get("parse_status") or "ok").lower()
@@ -22,20 +28,16 @@ class QualityGate:
                 return False, f"missing_{key}"
 
         event_id = str(event.get("event_id"))
-        if self._is_duplicate(event_id):
+        if self._dedup.check_and_add(event_id):
             return False, "duplicate_event_id"
 
         return True, "accepted"
 
-    def _is_duplicate(self, event_id: str) -> bool:
-        if event_id in self._seen:
-            return True
-
-        self._seen.add(event_id)
-        self._order.append(event_id)
+    def state_stats(self) -> dict[str, int]:
+        return self._dedup.state_stats()
 
-        while len(self._order) > self._dedup_cache_size:
-            old = self._order.popleft()
-            self._seen.discard(old)
+    def export_state(self) -> dict[str, Any]:
+        return self._dedup.export_state()
 
-        return False
+    def import_state(self, state: dict[str, Any]) -> None:
+        self._dedup.import_state(state)
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import dataclasses
 import json
 import logging
 import os
 from pathlib import Path
 from typing import Any
 
+from core.correlator.anomaly import AnomalySpec, parse_anomaly_spec
+from core.correlator.rule_specs import RuleSpec, parse_rule_specs
 from core.correlator.rules import RuleConfig
+from core.correlator.storms import STORM_MODES
+from core.correlator.topology import parse_fanin_spec
 from common.infra.config import env_int, env_str
 
 LOGGER = logging.getLogger(__name__)
@@ -17,7 +22,15 @@ _PROFILE_ENV_MAP = {
     "RULE_BYTES_WINDOW_SEC": "bytes_window_sec",
     "RULE_BYTES_THRESHOLD": "bytes_threshold",
     "RULE_ALERT_COOLDOWN_SEC": "cooldown_sec",
+    "RULE_FAULT_STATE_TTL_SEC": "fault_state_ttl_sec",
+    "RULE_MAX_STATE_KEYS": "max_state_keys",
+    "RULE_DENY_SKETCH_WIDTH": "deny_sketch_width",
+    "RULE_DENY_SKETCH_DEPTH": "deny_sketch_depth",
+    "RULE_DENY_TOP_K": "deny_top_k",
+    "RULE_STORM_WINDOW_SEC": "storm_window_sec",
+    "RULE_STORM_SUMMARY_INTERVAL_SEC": "storm_summary_interval_sec",
 }
+DENY_MODES = ("exact", "heavy_hitter")
 
 
 def load_rule_config() -> RuleConfig:
@@ -26,18 +39,50 @@ def load_rule_config() -> RuleConfig:
     profile_path = env_str("CORRELATOR_RULE_PROFILE_PATH", "")
 
     source = "env_defaults"
+    profile: dict[str, Any] = {}
     if profile_path:
-        values.update(_load_profile_file(Path(profile_path)))
+        profile = _load_profile_file(Path(profile_path))
         source = f"path:{profile_path}"
     elif profile_name:
         filename = profile_name if profile_name.endswith(".json") else f"{profile_name}.json"
         local_path = Path(__file__).resolve().parent / "profiles" / filename
-        values.update(_load_profile_file(local_path))
+        profile = _load_profile_file(local_path)
         source = f"profile:{filename}"
 
+    for key in _PROFILE_ENV_MAP.values():
+        if key in profile:
+            values[key] = int(profile[key])
+    specs = _load_rule_specs(profile, source)
+    anomaly = _load_anomaly_spec(profile)
+    fanin = parse_fanin_spec(profile.get("topology_fanin"))
+
     _apply_env_overrides(values)
-    cfg = RuleConfig(**values)
-    LOGGER.info("rule profile loaded source=%s values=%s", source, json.dumps(values, sort_keys=True))
+    deny_mode = env_str("RULE_DENY_MODE", str(profile.get("deny_mode") or "exact")).lower()
+    if deny_mode not in DENY_MODES:
+        LOGGER.warning("invalid RULE_DENY_MODE=%s, fallback to exact", deny_mode)
+        deny_mode = "exact"
+    storm_mode = env_str("RULE_STORM_MODE", str(profile.get("storm_mode") or "off")).lower()
+    if storm_mode not in STORM_MODES:
+        LOGGER.warning("invalid RULE_STORM_MODE=%s, fallback to off", storm_mode)
+        storm_mode = "off"
+    cfg = RuleConfig(
+        **values,
+        deny_mode=deny_mode,
+        storm_mode=storm_mode,
+        rule_specs=specs,
+        feature_anomaly=anomaly,
+        topology_fanin=fanin,
+    )
+    LOGGER.info(
+        "rule profile loaded source=%s values=%s deny_mode=%s storm_mode=%s rules=%s feature_anomaly=%s topology_fanin=%s",
+        source,
+        json.dumps(values, sort_keys=True),
+        deny_mode,
+        storm_mode,
+        ",".join(spec.rule_id for spec in specs) or "-",
+        anomaly or "-",
+        fanin or "-",
+    )
     return cfg
 
 
@@ -48,10 +93,17 @@ def _defaults_from_env() -> dict[str, int]:
         "bytes_window_sec": env_int("RULE_BYTES_WINDOW_SEC", 300),
         "bytes_threshold": env_int("RULE_BYTES_THRESHOLD", 20_000_000),
         "cooldown_sec": env_int("RULE_ALERT_COOLDOWN_SEC", 60),
+        "fault_state_ttl_sec": env_int("RULE_FAULT_STATE_TTL_SEC", 3600),
+        "max_state_keys": env_int("RULE_MAX_STATE_KEYS", 100_000),
+        "deny_sketch_width": env_int("RULE_DENY_SKETCH_WIDTH", 1024),
+        "deny_sketch_depth": env_int("RULE_DENY_SKETCH_DEPTH", 4),
+        "deny_top_k": env_int("RULE_DENY_TOP_K", 32),
+        "storm_window_sec": env_int("RULE_STORM_WINDOW_SEC", 900),
+        "storm_summary_interval_sec": env_int("RULE_STORM_SUMMARY_INTERVAL_SEC", 300),
     }
 
 
-def _load_profile_file(path: Path) -> dict[str, int]:
+def _load_profile_file(path: Path) -> dict[str, Any]:
     if not path.exists():
         raise FileNotFoundError(f"rule profile not found: {path}")
     data: Any
@@ -59,12 +111,23 @@ def _load_profile_file(path: Path) -> dict[str, int]:
         data = json.load(fp)
     if not isinstance(data, dict):
         raise ValueError(f"invalid rule profile content (dict expected): {path}")
+    return data
+
+
+def _load_rule_specs(profile: dict[str, Any], source: str) -> tuple[RuleSpec, ...]:
+    rules = profile.get("rules") or []
+    if not isinstance(rules, list):
+        raise ValueError(f"invalid rule profile rules (list expected): {source}")
+    return parse_rule_specs(rules)
+
 
-    values: dict[str, int] = {}
-    for key in ("deny_window_sec", "deny_threshold", "bytes_window_sec", "bytes_threshold", "cooldown_sec"):
-        if key in data:
-            values[key] = int(data[key])
-    return values
+def _load_anomaly_spec(profile: dict[str, Any]) -> AnomalySpec | None:
+    anomaly = parse_anomaly_spec(profile.get("feature_anomaly"))
+    # Plan files live on the runtime volume, so their paths usually come from the deployment.
+    plan_paths = [path.strip() for path in env_str("CORRELATOR_FEATURE_PLAN_PATHS", "").split(",") if path.strip()]
+    if anomaly is not None and plan_paths:
+        anomaly = dataclasses.replace(anomaly, plan_paths=tuple(plan_paths))
+    return anomaly
 
 
 def _apply_env_overrides(values: dict[str, int]) -> None:
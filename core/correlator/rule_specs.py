@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable
+
+from core.correlator.sketches import WindowedHyperLogLog
+from core.correlator.state_map import ExpiringMap
+from core.correlator.windows import RingCounter
+
+WINDOW_TYPES = ("sliding",)
+AGGREGATES = ("count", "sum", "distinct")
+
+# Fields every spec can be indexed on; an event only runs the specs whose
+# pins on these fields admit its values.
+_INDEX_FIELDS = ("type", "subtype", "action")
+_NUMERIC_OPS = {
+    "gt": lambda value, bound: value > bound,
+    "gte": lambda value, bound: value >= bound,
+    "lt": lambda value, bound: value < bound,
+    "lte": lambda value, bound: value <= bound,
+}
+_MAX_INDEX_ENTRIES = 4096
+
+
+@dataclass(frozen=True)
+class RuleSpec:
+    """One declarative rule: alert when a windowed aggregate per group reaches ``threshold``.
+
+    ``match`` maps event fields to a string (case-insensitive equality), a
+    list of strings (membership) or an operator dict (``gt``/``gte``/``lt``/
+    ``lte`` on numbers, ``exists``). Each ``group_by`` entry is a field, or a
+    list of fields where the first non-empty one is used; the entries' first
+    fields name the alert dimensions. ``sum`` adds ``field`` as an integer;
+    ``distinct`` estimates the distinct values of ``field`` with a
+    ``WindowedHyperLogLog`` of ``precision`` bits over ``window_buckets``.
+    """
+
+    rule_id: str
+    severity: str
+    match: dict[str, Any]
+    group_by: tuple[tuple[str, ...], ...]
+    window_type: str
+    window_sec: int
+    aggregate: str
+    threshold: int
+    cooldown_sec: int
+    field: str = ""
+    metric: str = ""
+    precision: int = 8
+    window_buckets: int = 6
+
+
+def parse_rule_specs(items: Iterable[Any]) -> tuple[RuleSpec, ...]:
+    """Validate the ``rules`` list of a rule profile."""
+    specs = []
+    for item in items:
+        spec = parse_rule_spec(item)
+        if any(spec.rule_id == other.rule_id for other in specs):
+            raise ValueError(f"duplicate rule_id in rule specs: {spec.rule_id}")
+        specs.append(spec)
+    return tuple(specs)
+
+
+def parse_rule_spec(item: Any) -> RuleSpec:
+    if not isinstance(item, dict):
+        raise ValueError(f"invalid rule spec (dict expected): {item!r}")
+    rule_id = str(item.get("rule_id") or "").strip()
+    if not rule_id:
+        raise ValueError(f"rule spec without rule_id: {item!r}")
+
+    match = item.get("match") or {}
+    if not isinstance(match, dict):
+        raise ValueError(f"rule {rule_id}: match must be an object")
+    for field_name, predicate in match.items():
+        if isinstance(predicate, dict) and not set(predicate) <= {*_NUMERIC_OPS, "exists"}:
+            raise ValueError(f"rule {rule_id}: unknown operator for {field_name}: {sorted(predicate)}")
+
+    group_by = tuple(
+        tuple(str(name) for name in entry) if isinstance(entry, list) else (str(entry),)
+        for entry in item.get("group_by") or []
+    )
+    if not group_by or not all(group_by):
+        raise ValueError(f"rule {rule_id}: group_by needs at least one field")
+
+    window = item.get("window") or {}
+    window_type = str(window.get("type") or "sliding")
+    if window_type not in WINDOW_TYPES:
+        raise ValueError(f"rule {rule_id}: unknown window type {window_type}")
+
+    aggregate = item.get("aggregate") or {}
+    op = str(aggregate.get("op") or "count")
+    if op not in AGGREGATES:
+        raise ValueError(f"rule {rule_id}: unknown aggregate {op}")
+    field_name = str(aggregate.get("field") or "")
+    if op in ("sum", "distinct") and not field_name:
+        raise ValueError(f"rule {rule_id}: {op} needs a field")
+    precision = int(aggregate.get("precision", 8))
+    if not 4 <= precision <= 16:
+        raise ValueError(f"rule {rule_id}: precision must be between 4 and 16")
+    buckets = int(window.get("buckets", 6))
+    if buckets < 1:
+        raise ValueError(f"rule {rule_id}: window buckets must be positive")
+
+    return RuleSpec(
+        rule_id=rule_id,
+        severity=str(item.get("severity") or "warning"),
+        match=dict(match),
+        group_by=group_by,
+        window_type=window_type,
+        window_sec=int(window.get("sec", 60)),
+        aggregate=op,
+        threshold=int(item["threshold"]),
+        cooldown_sec=int(item.get("cooldown_sec") or 0),
+        field=field_name,
+        metric=str(aggregate.get("metric") or _default_metric(op, field_name)),
+        precision=precision,
+        window_buckets=buckets,
+    )
+
+
+def _default_metric(op: str, field_name: str) -> str:
+    if op == "sum":
+        return f"{field_name}_sum"
+    if op == "distinct":
+        return f"distinct_{field_name}"
+    return "count"
+
+
+class SpecRule:
+    """A compiled ``RuleSpec`` with its window and cooldown state."""
+
+    def __init__(self, spec: RuleSpec, max_keys: int = 0) -> None:
+        self.spec = spec
+        self.pins = {name: _pin(spec.match.get(name)) for name in _INDEX_FIELDS}
+        # Pinned index fields are already checked by ``RuleSet``'s index.
+        self.predicates = [
+            _predicate(name, value)
+            for name, value in spec.match.items()
+            if not (name in _INDEX_FIELDS and self.pins[name] is not None)
+        ]
+        self._value = _int_field(spec.field) if spec.aggregate == "sum" else None
+        self.distinct = spec.aggregate == "distinct"
+        # A distinct window's oldest bucket can outlive ``window_sec`` by one bucket.
+        ttl = self.new_window().span_sec if self.distinct else spec.window_sec
+        self.windows = ExpiringMap(ttl, max_keys)
+        self.cooldowns = ExpiringMap(spec.cooldown_sec, max_keys)
+
+    def matches(self, event: dict[str, Any]) -> bool:
+        """Whether ``event`` passes the predicates the index does not cover."""
+        for predicate in self.predicates:
+            if not predicate(event):
+                return False
+        return True
+
+    def new_window(self) -> RingCounter | WindowedHyperLogLog:
+        spec = self.spec
+        if self.distinct:
+            return WindowedHyperLogLog(spec.window_sec, spec.window_buckets, spec.precision)
+        return RingCounter((spec.window_sec,))
+
+    def evaluate(self, event: dict[str, Any], now: datetime) -> tuple[dict[str, str], dict[str, Any]] | None:
+        """(dimensions, metrics) of an alert for a matching event, or None."""
+        spec = self.spec
+        if self.distinct:
+            value = str(event.get(spec.field) or "")
+            if not value:
+                return None
+        key, dimensions = self._group(event)
+        ts = now.timestamp()
+        window = self.windows.get(key)
+        if window is None:
+            window = self.new_window()
+        self.windows.set(key, window, ts)
+        extra = {}
+        if self.distinct:
+            window.add(value, ts)
+            aggregate = window.estimate()
+            extra = {"estimate_error_bound": window.error_bound()}
+        elif self._value is None:
+            window.add(ts)
+            aggregate = window.count(spec.window_sec)
+        else:
+            window.add(ts, self._value(event))
+            aggregate = window.total(spec.window_sec)
+        if aggregate < spec.threshold:
+            return None
+
+        last = self.cooldowns.get(key)
+        if last is not None and (now - last).total_seconds() < spec.cooldown_sec:
+            return None
+        self.cooldowns.set(key, now, ts)
+        return dimensions, {spec.metric: aggregate, "window_sec": spec.window_sec, "threshold": spec.threshold, **extra}
+
+    def _group(self, event: dict[str, Any]) -> tuple[str, dict[str, str]]:
+        group_by = self.spec.group_by
+        if len(group_by) == 1 and len(group_by[0]) == 1:
+            value = str(event.get(group_by[0][0]) or "unknown")
+            return value, {group_by[0][0]: value}
+        dimensions = {}
+        for fields in self.spec.group_by:
+            value = "unknown"
+            for name in fields:
+                text = str(event.get(name) or "")
+                if text:
+                    value = text
+                    break
+            dimensions[fields[0]] = value
+        return "|".join(dimensions.values()), dimensions
+
+
+class RuleSet:
+    """Compiled specs, indexed by the (type, subtype, action) values they admit."""
+
+    def __init__(self, specs: Iterable[RuleSpec], max_keys: int = 0) -> None:
+        self.rules = [SpecRule(spec, max_keys) for spec in specs]
+        self.rule_ids = frozenset(rule.spec.rule_id for rule in self.rules)
+        self._index_fields = tuple(name for name in _INDEX_FIELDS if any(rule.pins[name] is not None for rule in self.rules))
+        self._index: dict[tuple[str, ...], list[SpecRule]] = {}
+
+    def matching(self, event: dict[str, Any]) -> list[SpecRule]:
+        """Rules whose match admits ``event``, in profile order."""
+        if not self.rules:
+            return []
+        get = event.get
+        signature = tuple([str(get(name) or "").lower() for name in self._index_fields])
+        candidates = self._index.get(signature)
+        if candidates is None:
+            if len(self._index) >= _MAX_INDEX_ENTRIES:
+                self._index.clear()
+            candidates = [rule for rule in self.rules if _admits(rule.pins, self._index_fields, signature)]
+            self._index[signature] = candidates
+        return [rule for rule in candidates if not rule.predicates or rule.matches(event)]
+
+    def expire(self, watermark: float) -> int:
+        return sum(states.expire(watermark) for states in self.maps())
+
+    def maps(self) -> list[ExpiringMap]:
+        return [states for rule in self.rules for states in (rule.windows, rule.cooldowns)]
+
+    def export_state(self) -> dict[str, Any]:
+        return {
+            rule.spec.rule_id: {
+                "windows": {key: [list(slot) for slot in ring.slots()] for key, ring in rule.windows.items() if ring},
+                "cooldowns": {key: ts.timestamp() for key, ts in rule.cooldowns.items()},
+            }
+            for rule in self.rules
+        }
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        for rule in self.rules:
+            saved = state.get(rule.spec.rule_id) or {}
+            rule.windows.clear()
+            windows = (saved.get("windows") or {}).items()
+            # Oldest windows first, so the maps keep their last-touch order.
+            for key, slots in sorted(windows, key=lambda item: max((slot[0] for slot in item[1]), default=0)):
+                window = rule.new_window()
+                window.load(slots)
+                touched = window.last_sec if rule.distinct else float(window.head or 0)
+                rule.windows.set(key, window, touched)
+            rule.cooldowns.clear()
+            for key, ts in sorted((saved.get("cooldowns") or {}).items(), key=lambda item: item[1]):
+                rule.cooldowns.set(key, datetime.fromtimestamp(float(ts), tz=timezone.utc), float(ts))
+
+
+def _pin(predicate: Any) -> frozenset[str] | None:
+    if isinstance(predicate, str):
+        return frozenset([predicate.lower()])
+    if isinstance(predicate, list):
+        return frozenset(str(item).lower() for item in predicate)
+    return None
+
+
+def _admits(pins: dict[str, frozenset[str] | None], fields: tuple[str, ...], signature: tuple[str, ...]) -> bool:
+    return all(pins[name] is None or value in pins[name] for name, value in zip(fields, signature))
+
+
+def _predicate(name: str, expected: Any) -> Callable[[dict[str, Any]], bool]:
+    if isinstance(expected, dict):
+        checks = [(_NUMERIC_OPS[op], bound) for op, bound in expected.items() if op in _NUMERIC_OPS]
+        exists = expected.get("exists")
+
+        def check(event: dict[str, Any]) -> bool:
+            value = event.get(name)
+            if exists is not None and (value not in (None, "")) != bool(exists):
+                return False
+            if not checks:
+                return True
+            number = _number(value)
+            return number is not None and all(compare(number, bound) for compare, bound in checks)
+
+        return check
+    allowed = _pin(expected) if isinstance(expected, (str, list)) else frozenset([str(expected).lower()])
+    return lambda event: str(event.get(name) or "").lower() in allowed
+
+
+def _int_field(name: str) -> Callable[[dict[str, Any]], int]:
+    def value(event: dict[str, Any]) -> int:
+        try:
+            return int(event.get(name) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    return value
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value.strip():
+        try:
+            return float(value.strip())
+        except ValueError:
+            return None
+    return None
@@ -1,12 +1,47 @@
 from __future__ import annotations
 
 import hashlib
+import logging
 import re
-from collections import defaultdict, deque
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from typing import Any
 
+from core.correlator.anomaly import AnomalySpec, FeatureZScoreRule
+from core.correlator.rule_specs import RuleSet, RuleSpec, SpecRule
+from core.correlator.sketches import WindowedCountMin
+from core.correlator.state_map import ExpiringMap
+from core.correlator.storms import AlertStorm
+from core.correlator.topology import FanInSpec, TopologyFanIn, topology_neighbors
+from core.correlator.windows import RingCounter
+
+LOGGER = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # optional; only used for large key groups in ``process_batch``
+    np = None
+
+# Groups shorter than this are summed in Python; numpy's call overhead only pays off above it.
+_NUMPY_MIN_RUN = 256
+
+_FAULT_LABEL_FIELDS = ("fault_label", "fault_type", "scenario", "label", "class", "status", "state")
+
+# Event fields each rule reads to decide whether it applies. An event without
+# any of them cannot change rule state, so the prefilter drops it on sight.
+_RULE_FIELDS = {
+    "annotated_fault_v1": ("fault_context", *_FAULT_LABEL_FIELDS),
+    "deny_burst_v1": ("action",),
+    "bytes_spike_v1": ("bytes_total",),
+    "feature_zscore_v1": ("feature_vector",),
+}
+_PREFILTER_FIELDS = tuple(dict.fromkeys(field for fields in _RULE_FIELDS.values() for field in fields))
+
+# Rough per-entry sizes (CPython 3.11, tracemalloc) behind ``state_stats``.
+_KEY_BYTES = 170
+_RING_BYTES = 210
+_SLOT_BYTES = 90
+
 
 @dataclass
 class RuleConfig:
@@ -15,59 +50,242 @@ class RuleConfig:
     bytes_window_sec: int = 300
     bytes_threshold: int = 20_000_000
     cooldown_sec: int = 60
+    fault_state_ttl_sec: int = 3600
+    max_state_keys: int = 100_000
+    # "exact" keeps a window per deny key; "heavy_hitter" counts all keys in one
+    # count-min sketch of fixed size and only alerts for its top-K keys.
+    deny_mode: str = "exact"
+    deny_sketch_width: int = 1024
+    deny_sketch_depth: int = 4
+    deny_top_k: int = 32
+    rule_specs: tuple[RuleSpec, ...] = ()
+    feature_anomaly: AnomalySpec | None = None
+    topology_fanin: FanInSpec | None = None
+    # "summary" keeps a storm per alert key after its alert: repeats are counted
+    # and reported every ``storm_summary_interval_sec`` as "ongoing" summaries
+    # instead of a new full alert after each cooldown, until the key has been
+    # quiet for ``storm_window_sec``.
+    storm_mode: str = "off"
+    storm_window_sec: int = 900
+    storm_summary_interval_sec: int = 300
 
 
 class RuleEngine:
     def __init__(self, config: RuleConfig):
         self.config = config
-        self._deny_windows: dict[str, deque[datetime]] = defaultdict(deque)
-        self._bytes_windows: dict[str, deque[tuple[datetime, int]]] = defaultdict(deque)
-        self._last_alert_at: dict[str, datetime] = {}
-        self._annotated_fault_states: dict[str, str] = {}
+        # Windows and cooldowns expire once they can no longer change a result;
+        # annotated-fault states are kept for ``fault_state_ttl_sec`` of event time.
+        max_keys = config.max_state_keys
+        self._deny_windows = ExpiringMap(config.deny_window_sec, max_keys)
+        self._bytes_windows = ExpiringMap(config.bytes_window_sec, max_keys)
+        self._last_alert_at = ExpiringMap(config.cooldown_sec, max_keys)
+        self._annotated_fault_states = ExpiringMap(config.fault_state_ttl_sec, max_keys)
+        # Declarative rules from the profile; one with a builtin's rule_id replaces it.
+        self._rules = RuleSet(config.rule_specs, max_keys)
+        self._fault_rule = "annotated_fault_v1" not in self._rules.rule_ids
+        self._deny_rule = "deny_burst_v1" not in self._rules.rule_ids
+        self._bytes_rule = "bytes_spike_v1" not in self._rules.rule_ids
+        self._deny_sketch = (
+            WindowedCountMin(config.deny_window_sec, config.deny_sketch_width, config.deny_sketch_depth, config.deny_top_k)
+            if config.deny_mode == "heavy_hitter"
+            else None
+        )
+        self._anomaly = FeatureZScoreRule(config.feature_anomaly, max_keys) if config.feature_anomaly is not None else None
+        self._topology = TopologyFanIn(config.topology_fanin, max_keys) if config.topology_fanin is not None else None
+        self._storms = (
+            ExpiringMap(max(config.storm_window_sec, config.cooldown_sec), max_keys, on_evict=self._storm_ended)
+            if config.storm_mode == "summary"
+            else None
+        )
+        # Final summaries of storms that ended; emitted ahead of the next event's alerts.
+        self._ended_storms: list[dict[str, Any]] = []
+        self._watermark = 0.0
+        self._swept_sec = 0
+        self.rule_events = 0
+        self.prefilter_skipped = 0
+        # Set while ``process_batch`` evaluates a segment: cooldowns are read and
+        # written here and replayed into ``_last_alert_at`` in event order.
+        self._pending_cooldowns: dict[str, datetime] | None = None
+        self._cooldown_log: list[tuple[tuple[int, int], str, datetime]] = []
+        self._pending_storms: dict[str, AlertStorm] | None = None
+        self._storm_log: list[tuple[tuple[int, int], str, AlertStorm, float]] = []
+        self._batch_position = (0, 0)
 
     def process(self, event: dict[str, Any]) -> list[dict[str, Any]]:
         event_ts = _parse_event_ts(event)
         if event_ts is None:
             return []
+        epoch = event_ts.timestamp()
+        if epoch > self._watermark:
+            self._watermark = epoch
+            if int(epoch) > self._swept_sec:
+                self._swept_sec = int(epoch)
+                self.expire(epoch)
+        return self._with_ended_storms(self._evaluate(event, event_ts))
+
+    def process_batch(self, events: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+        """Alerts per event, exactly as calling ``process`` on each event in turn.
+
+        Timestamps are parsed once per distinct string. Between two state sweeps
+        (one per new event-time second), deny and bytes events are grouped by
+        rule key; a key whose events all fall in the current second updates its
+        window once, and alerts are only checked from the event where it reaches
+        the threshold. Map touches and cooldowns are replayed in event order, so
+        state and eviction are unchanged; a segment that could overflow
+        ``max_state_keys`` falls back to per-event evaluation.
+        """
+        results: list[list[dict[str, Any]]] = [[] for _ in events]
+        nows: list[datetime | None] = [None] * len(events)
+        epochs = [0.0] * len(events)
+        parsed_ts: dict[Any, tuple[datetime, float] | None] = {}
+        segment: list[int] = []
+        for index, event in enumerate(events):
+            raw_ts = event.get("event_ts")
+            try:
+                parsed = parsed_ts[raw_ts]
+            except KeyError:
+                event_ts = _parse_event_ts(event)
+                parsed = (event_ts, event_ts.timestamp()) if event_ts is not None else None
+                parsed_ts[raw_ts] = parsed
+            except TypeError:
+                continue
+            if parsed is None:
+                continue
+            nows[index], epoch = parsed
+            epochs[index] = epoch
+            if epoch > self._watermark:
+                self._watermark = epoch
+                if int(epoch) > self._swept_sec:
+                    if segment:
+                        self._process_segment(events, segment, nows, epochs, results)
+                        segment = []
+                    self._swept_sec = int(epoch)
+                    self.expire(epoch)
+            segment.append(index)
+        if segment:
+            self._process_segment(events, segment, nows, epochs, results)
+        return results
+
+    def _evaluate(self, event: dict[str, Any], event_ts: datetime) -> list[dict[str, Any]]:
+        self.rule_events += 1
+        spec_rules = self._rules.matching(event)
+        if not spec_rules and not self._applicable(event):
+            self.prefilter_skipped += 1
+            return []
 
-        alerts = []
+        alerts = self._fault_alerts(event, event_ts)
+
+        if self._anomaly is not None:
+            anomaly_alert = self._rule_feature_anomaly(event, event_ts)
+            if anomaly_alert:
+                alerts.append(anomaly_alert)
 
-        annotated_fault_alert = self._rule_annotated_fault(event, event_ts)
-        if annotated_fault_alert:
-            alerts.append(annotated_fault_alert)
+        if self._deny_rule:
+            deny_alert = self._rule_deny_burst(event, event_ts)
+            if deny_alert:
+                alerts.append(deny_alert)
 
-        deny_alert = self._rule_deny_burst(event, event_ts)
-        if deny_alert:
-            alerts.append(deny_alert)
+        if self._bytes_rule:
+            bytes_alert = self._rule_bytes_spike(event, event_ts)
+            if bytes_alert:
+                alerts.append(bytes_alert)
 
-        bytes_alert = self._rule_bytes_spike(event, event_ts)
-        if bytes_alert:
-            alerts.append(bytes_alert)
+        for rule in spec_rules:
+            spec_alert = self._rule_spec(rule, event, event_ts)
+            if spec_alert:
+                alerts.append(spec_alert)
 
         return alerts
 
-    def _rule_annotated_fault(self, event: dict[str, Any], now: datetime) -> dict[str, Any] | None:
-        annotation = _fault_annotation(event)
-        if annotation is None:
+    def _applicable(self, event: dict[str, Any]) -> bool:
+        """False when no rule can act on ``event``, so evaluating it would change nothing."""
+        if not any(field in event for field in _PREFILTER_FIELDS):
+            return False
+        if (self._deny_rule and _is_deny(event)) or (self._bytes_rule and _bytes_total(event) > 0):
+            return True
+        if self._anomaly is not None and event.get("feature_vector"):
+            return True
+        return self._annotation_applies(event)
+
+    def _annotation_applies(self, event: dict[str, Any]) -> bool:
+        # A healthy annotation only matters when it clears a tracked fault.
+        if not self._fault_rule and self._topology is None:
+            return False
+        if (self._fault_rule and self._annotated_fault_states) or (self._topology is not None and self._topology.faulting):
+            return _has_annotation(event)
+        return _annotates_fault(event)
+
+    def _fault_alerts(self, event: dict[str, Any], now: datetime) -> list[dict[str, Any]]:
+        cluster_alerts: list[dict[str, Any]] = []
+        member = False
+        if self._topology is not None:
+            cluster_alerts, member = self._rule_topology_fanin(event, now)
+        alerts = []
+        if self._fault_rule:
+            annotated_fault_alert = self._rule_annotated_fault(event, now, member)
+            if annotated_fault_alert:
+                alerts.append(annotated_fault_alert)
+        return alerts + cluster_alerts
+
+    def _rule_topology_fanin(self, event: dict[str, Any], now: datetime) -> tuple[list[dict[str, Any]], bool]:
+        """Cluster alerts for ``event``, and whether its device's own fault alert is suppressed."""
+        fanin = self._topology
+        if not _annotates_fault(event):
+            if fanin.faulting and _has_annotation(event):
+                fanin.recover(_event_entity_key(event) or "unknown")
+            return [], False
+
+        device = _event_entity_key(event) or "unknown"
+        cluster = fanin.observe_fault(device, topology_neighbors(event.get("topology_context"), device), now.timestamp())
+        spec = fanin.spec
+        if len(cluster.members) < spec.min_devices:
+            return [], False
+        # The cluster alert stands in for its members' own fault alerts.
+        member = spec.suppress_member_alerts
+        alert_key = f"{spec.rule_id}::{cluster.cluster_id}"
+        if cluster.alerted or not self._cooldown_ok(alert_key, now):
+            summary = self._suppressed(alert_key, event, now, len(cluster.members))
+            return ([summary] if summary else []), member
+        cluster.alerted = True
+
+        alert = _make_alert(
+            rule_id=spec.rule_id,
+            severity=spec.severity,
+            event=event,
+            event_ts=now,
+            dimensions={"topology_cluster": cluster.cluster_id, "src_device_key": device},
+            metrics={
+                "member_count": len(cluster.members),
+                "member_devices": sorted(cluster.members),
+                "window_sec": spec.window_sec,
+                "min_devices": spec.min_devices,
+            },
+        )
+        return [self._opened(alert_key, "member_count", alert, now)], member
+
+    def _rule_annotated_fault(self, event: dict[str, Any], now: datetime, member: bool = False) -> dict[str, Any] | None:
+        states = self._annotated_fault_states
+        if not _annotates_fault(event):
+            # Healthy entities keep no state; a missing entry alerts like a healthy one.
+            if states and _has_annotation(event):
+                states.pop(_event_entity_key(event) or "unknown")
             return None
 
+        annotation = _fault_annotation(event)
         entity_key = _event_entity_key(event)
         scenario = annotation["scenario"]
         state_key = entity_key or "unknown"
 
-        if not annotation["is_fault"]:
-            self._annotated_fault_states[state_key] = "healthy"
-            return None
-
-        if self._annotated_fault_states.get(state_key) == scenario:
+        previous = states.get(state_key)
+        states.set(state_key, scenario, now.timestamp())
+        if member:
+            # Decided before any cooldown or storm is taken; the cluster's storm counts the hit.
             return None
-        self._annotated_fault_states[state_key] = scenario
-
         alert_key = f"annotated_fault::{state_key}::{scenario}"
-        if not self._cooldown_ok(alert_key, now):
-            return None
+        if previous == scenario or not self._cooldown_ok(alert_key, now):
+            return self._suppressed(alert_key, event, now, annotation["confidence"])
 
-        return _make_alert(
+        alert = _make_alert(
             rule_id="annotated_fault_v1",
             severity=_fault_severity(scenario),
             event=event,
@@ -82,66 +300,108 @@ class RuleEngine:
                 "label_value": annotation["label_value"],
             },
         )
+        return self._opened(alert_key, "annotation_confidence", alert, now)
+
+    def _rule_feature_anomaly(self, event: dict[str, Any], now: datetime) -> dict[str, Any] | None:
+        rule = self._anomaly
+        entity_key = _event_entity_key(event) or "unknown"
+        metrics = rule.evaluate(entity_key, event, now.timestamp())
+        if metrics is None:
+            return None
+
+        alert_key = f"{rule.spec.rule_id}::{entity_key}"
+        if not self._cooldown_ok(alert_key, now):
+            return self._suppressed(alert_key, event, now, metrics["max_abs_z"])
+
+        alert = _make_alert(
+            rule_id=rule.spec.rule_id,
+            severity=rule.spec.severity,
+            event=event,
+            event_ts=now,
+            dimensions={"src_device_key": entity_key},
+            metrics=metrics,
+        )
+        return self._opened(alert_key, "max_abs_z", alert, now)
 
     def _rule_deny_burst(self, event: dict[str, Any], now: datetime) -> dict[str, Any] | None:
-        action = str(event.get("action") or "").lower()
-        if action != "deny":
+        if not _is_deny(event):
             return None
 
         key = str(event.get("src_device_key") or event.get("srcip") or "unknown")
-        bucket = self._deny_windows[key]
-        cutoff = now - timedelta(seconds=self.config.deny_window_sec)
-
-        while bucket and bucket[0] < cutoff:
-            bucket.popleft()
-        bucket.append(now)
+        ts = now.timestamp()
+        if self._deny_sketch is not None:
+            return self._deny_heavy_hitter(event, now, key, ts)
+        window = _ring(self._deny_windows, key, self.config.deny_window_sec, ts)
+        window.add(ts)
+        return self._deny_alert(event, now, key, window.count(self.config.deny_window_sec))
+
+    def _deny_heavy_hitter(self, event: dict[str, Any], now: datetime, key: str, ts: float) -> dict[str, Any] | None:
+        sketch = self._deny_sketch
+        estimate = sketch.add(key, ts)
+        # Only a key still over the threshold after subtracting the sketch's
+        # error bound alerts, so a flood of spoofed sources raises the noise
+        # floor instead of raising alerts.
+        bound = sketch.error_bound()
+        if estimate - bound < self.config.deny_threshold or not sketch.in_top(key):
+            return None
+        return self._deny_alert(
+            event,
+            now,
+            key,
+            estimate,
+            {"estimate_error_bound": bound, "window_deny_total": sketch.total},
+        )
 
-        if len(bucket) < self.config.deny_threshold:
+    def _deny_alert(
+        self,
+        event: dict[str, Any],
+        now: datetime,
+        key: str,
+        deny_count: int,
+        estimate: dict[str, Any] | None = None,
+    ) -> dict[str, Any] | None:
+        if deny_count < self.config.deny_threshold:
             return None
 
         alert_key = f"deny_burst::{key}"
         if not self._cooldown_ok(alert_key, now):
-            return None
+            return self._suppressed(alert_key, event, now, deny_count)
 
-        return _make_alert(
+        alert = _make_alert(
             rule_id="deny_burst_v1",
             severity="warning",
             event=event,
             event_ts=now,
             dimensions={"src_device_key": key},
             metrics={
-                "deny_count": len(bucket),
+                "deny_count": deny_count,
                 "window_sec": self.config.deny_window_sec,
                 "threshold": self.config.deny_threshold,
+                **(estimate or {}),
             },
         )
+        return self._opened(alert_key, "deny_count", alert, now)
 
     def _rule_bytes_spike(self, event: dict[str, Any], now: datetime) -> dict[str, Any] | None:
         srcip = str(event.get("srcip") or "unknown")
-        try:
-            bytes_total = int(event.get("bytes_total") or 0)
-        except (TypeError, ValueError):
-            bytes_total = 0
-
+        bytes_total = _bytes_total(event)
         if bytes_total <= 0:
             return None
 
-        bucket = self._bytes_windows[srcip]
-        cutoff = now - timedelta(seconds=self.config.bytes_window_sec)
-
-        while bucket and bucket[0][0] < cutoff:
-            bucket.popleft()
-        bucket.append((now, bytes_total))
+        ts = now.timestamp()
+        window = _ring(self._bytes_windows, srcip, self.config.bytes_window_sec, ts)
+        window.add(ts, bytes_total)
+        return self._bytes_alert(event, now, srcip, window.total(self.config.bytes_window_sec))
 
-        aggregate = sum(x[1] for x in bucket)
+    def _bytes_alert(self, event: dict[str, Any], now: datetime, srcip: str, aggregate: int) -> dict[str, Any] | None:
         if aggregate < self.config.bytes_threshold:
             return None
 
         alert_key = f"bytes_spike::{srcip}"
         if not self._cooldown_ok(alert_key, now):
-            return None
+            return self._suppressed(alert_key, event, now, aggregate)
 
-        return _make_alert(
+        alert = _make_alert(
             rule_id="bytes_spike_v1",
             severity="critical",
             event=event,
@@ -153,14 +413,477 @@ class RuleEngine:
                 "threshold": self.config.bytes_threshold,
             },
         )
+        return self._opened(alert_key, "bytes_sum", alert, now)
+
+    def _rule_spec(self, rule: SpecRule, event: dict[str, Any], now: datetime) -> dict[str, Any] | None:
+        result = rule.evaluate(event, now)
+        if result is None:
+            return None
+        dimensions, metrics = result
+        return _make_alert(
+            rule_id=rule.spec.rule_id,
+            severity=rule.spec.severity,
+            event=event,
+            event_ts=now,
+            dimensions=dimensions,
+            metrics=metrics,
+        )
+
+    def _process_segment(
+        self,
+        events: list[dict[str, Any]],
+        segment: list[int],
+        nows: list[Any],
+        epochs: list[float],
+        results: list[list],
+    ) -> None:
+        if not self._segment_fits(len(segment)):
+            for index in segment:
+                results[index] = self._with_ended_storms(self._evaluate(events[index], nows[index]))
+            return
+        if self._ended_storms:
+            results[segment[0]].extend(self._with_ended_storms([]))
+
+        # Every event of a segment is at or before the swept second; keys with
+        # an earlier event are ``mixed`` and take their events one at a time.
+        current = float(self._swept_sec)
+        deny_groups: dict[str, list[int]] = {}
+        bytes_groups: dict[str, tuple[list[int], list[int]]] = {}
+        mixed: set[str] = set()
+        # Spec alerts come after the builtin ones, as in ``_evaluate``.
+        spec_alerts: list[tuple[int, list[dict[str, Any]]]] = []
+        self._pending_cooldowns = {}
+        self._cooldown_log = []
+        self._pending_storms = {} if self._storms is not None else None
+        self._storm_log = []
+        try:
+            for index in segment:
+                event = events[index]
+                self.rule_events += 1
+                spec_rules = self._rules.matching(event)
+                deny = self._deny_rule and _is_deny(event)
+                bytes_total = _bytes_total(event) if self._bytes_rule else 0
+                anomaly = self._anomaly is not None and bool(event.get("feature_vector"))
+                if not spec_rules and not deny and bytes_total <= 0 and not anomaly and not self._annotation_applies(event):
+                    self.prefilter_skipped += 1
+                    continue
+                if self._fault_rule or self._topology is not None:
+                    self._batch_position = (index, 0)
+                    results[index].extend(self._fault_alerts(event, nows[index]))
+                if anomaly:
+                    # Baselines are per device and order-sensitive, so facts are scored in event order.
+                    self._batch_position = (index, 0)
+                    _append(results, index, self._rule_feature_anomaly(event, nows[index]))
+                if deny and self._deny_sketch is not None:
+                    # The sketch is shared by all keys, so it is fed in event order.
+                    self._batch_position = (index, 1)
+                    _append(results, index, self._rule_deny_burst(event, nows[index]))
+                    deny = False
+                if spec_rules:
+                    alerts = [self._rule_spec(rule, event, nows[index]) for rule in spec_rules]
+                    spec_alerts.append((index, [alert for alert in alerts if alert]))
+                late = epochs[index] < current
+                if deny:
+                    key = str(event.get("src_device_key") or event.get("srcip") or "unknown")
+                    deny_groups.setdefault(key, []).append(index)
+                    if late:
+                        mixed.add(key)
+                if bytes_total > 0:
+                    srcip = str(event.get("srcip") or "unknown")
+                    group = bytes_groups.get(srcip)
+                    if group is None:
+                        group = bytes_groups[srcip] = ([], [])
+                    group[0].append(index)
+                    group[1].append(bytes_total)
+                    if late:
+                        mixed.add("\0" + srcip)
+            # Keys are finished in order of their last event, which leaves the
+            # maps in the same last-touch order as per-event evaluation.
+            for key, indexes in sorted(deny_groups.items(), key=lambda group: group[1][-1]):
+                self._deny_group(key, indexes, key in mixed, events, nows, epochs, results)
+            for srcip, (indexes, values) in sorted(bytes_groups.items(), key=lambda group: group[1][0][-1]):
+                self._bytes_group(srcip, indexes, values, "\0" + srcip in mixed, events, nows, epochs, results)
+            for index, alerts in spec_alerts:
+                results[index].extend(alerts)
+        finally:
+            cooldown_log = sorted(self._cooldown_log, key=lambda entry: entry[0])
+            self._pending_cooldowns = None
+            self._cooldown_log = []
+            storm_log = sorted(self._storm_log, key=lambda entry: entry[0])
+            self._pending_storms = None
+            self._storm_log = []
+        for _, alert_key, now in cooldown_log:
+            self._last_alert_at.set(alert_key, now, now.timestamp())
+        for _, alert_key, storm, ts in storm_log:
+            self._storms.set(alert_key, storm, ts)
+
+    def _segment_fits(self, size: int) -> bool:
+        # Grouping reorders map touches within the segment; that is only
+        # invisible when no map can reach its key cap (no LRU spill). A segment
+        # adds at most one window key and five cooldown and storm keys per event.
+        cap = self.config.max_state_keys
+        if cap <= 0:
+            return True
+        return (
+            len(self._deny_windows) + size <= cap
+            and len(self._bytes_windows) + size <= cap
+            and len(self._last_alert_at) + 5 * size <= cap
+            and (self._storms is None or len(self._storms) + 5 * size <= cap)
+        )
+
+    def _cooling_down(self, alert_key: str) -> bool:
+        """True when ``alert_key`` is in cooldown for all of the swept second and has no storm to count."""
+        if self._storms is not None and self._storm(alert_key) is not None:
+            return False
+        last = self._pending_cooldowns.get(alert_key) or self._last_alert_at.get(alert_key)
+        return last is not None and self._swept_sec + 1 - last.timestamp() < self.config.cooldown_sec
+
+    def _storm_hits(
+        self,
+        alert_key: str,
+        indexes: list[int],
+        peak: Any,
+        events: list[dict[str, Any]],
+        epochs: list[float],
+        rule_slot: int,
+    ) -> bool:
+        """Count a group's hits at once when its storm cannot report within the swept second."""
+        if self._storms is None:
+            return False
+        storm = self._storm(alert_key)
+        if storm is None or self._swept_sec + 1 - storm.reported_at >= self.config.storm_summary_interval_sec:
+            return False
+        hit_ts = [epochs[index] for index in indexes]
+        last = indexes[-1]
+        storm.hit(min(hit_ts), max(hit_ts), peak, str(events[last].get("event_id") or ""), len(indexes))
+        self._batch_position = (last, rule_slot)
+        self._touch_storm(alert_key, storm, max(hit_ts))
+        return True
+
+    def _deny_group(
+        self,
+        key: str,
+        indexes: list[int],
+        mixed: bool,
+        events: list[dict[str, Any]],
+        nows: list[Any],
+        epochs: list[float],
+        results: list[list],
+    ) -> None:
+        window_sec = self.config.deny_window_sec
+        ring = self._deny_windows.get(key)
+        if ring is None:
+            ring = RingCounter((window_sec,))
+        if mixed:
+            # Late events may or may not count; take them one at a time.
+            for index in indexes:
+                ring.add(epochs[index])
+                self._batch_position = (index, 1)
+                _append(results, index, self._deny_alert(events[index], nows[index], key, ring.count(window_sec)))
+        else:
+            ring.add(epochs[indexes[0]], 0, len(indexes))
+            base = ring.count(window_sec) - len(indexes)
+            first = max(self.config.deny_threshold - base - 1, 0)
+            alert_key = f"deny_burst::{key}"
+            if first < len(indexes) and (
+                self._cooling_down(alert_key)
+                or self._storm_hits(alert_key, indexes[first:], base + len(indexes), events, epochs, 1)
+            ):
+                first = len(indexes)
+            for offset in range(first, len(indexes)):
+                index = indexes[offset]
+                self._batch_position = (index, 1)
+                _append(results, index, self._deny_alert(events[index], nows[index], key, base + offset + 1))
+        self._deny_windows.set(key, ring, max(map(epochs.__getitem__, indexes)))
+
+    def _bytes_group(
+        self,
+        srcip: str,
+        indexes: list[int],
+        values: list[int],
+        mixed: bool,
+        events: list[dict[str, Any]],
+        nows: list[Any],
+        epochs: list[float],
+        results: list[list],
+    ) -> None:
+        window_sec = self.config.bytes_window_sec
+        ring = self._bytes_windows.get(srcip)
+        if ring is None:
+            ring = RingCounter((window_sec,))
+        if mixed:
+            for index, value in zip(indexes, values):
+                ring.add(epochs[index], value)
+                self._batch_position = (index, 2)
+                _append(results, index, self._bytes_alert(events[index], nows[index], srcip, ring.total(window_sec)))
+        else:
+            added = sum(values)
+            ring.add(epochs[indexes[0]], added, len(values))
+            total = ring.total(window_sec)
+            alert_key = f"bytes_spike::{srcip}"
+            if total < self.config.bytes_threshold or self._cooling_down(alert_key):
+                totals = []
+            else:
+                # Values are positive, so running totals only grow: alerts start
+                # at the first event whose total reaches the threshold.
+                totals = _running_totals(total - added, values, self.config.bytes_threshold)
+                hits = [indexes[offset] for offset, _ in totals]
+                if totals and self._storm_hits(alert_key, hits, totals[-1][1], events, epochs, 2):
+                    totals = []
+            for offset, running in totals:
+                index = indexes[offset]
+                self._batch_position = (index, 2)
+                _append(results, index, self._bytes_alert(events[index], nows[index], srcip, running))
+        self._bytes_windows.set(srcip, ring, max(map(epochs.__getitem__, indexes)))
+
+    def expire(self, watermark: float) -> int:
+        """Drop state that is too old for ``watermark`` (epoch seconds of event time)."""
+        if self._deny_sketch is not None:
+            self._deny_sketch.advance(int(watermark // 1))
+        return sum(
+            states.expire(watermark)
+            for states in (self._deny_windows, self._bytes_windows, self._last_alert_at, self._annotated_fault_states)
+        ) + sum(states.expire(watermark) for states in self._extra_maps()) + self._rules.expire(watermark)
+
+    def _extra_maps(self) -> list[ExpiringMap]:
+        """State maps of the optional feature-anomaly and topology fan-in rules and alert storms."""
+        maps = [self._anomaly.baselines] if self._anomaly is not None else []
+        maps += self._topology.maps() if self._topology is not None else []
+        return maps + ([self._storms] if self._storms is not None else [])
+
+    def state_stats(self) -> dict[str, int]:
+        """Key counts, approximate size and eviction counters of the rule state."""
+        spec_maps = self._rules.maps()
+        baselines = self._anomaly.baselines if self._anomaly is not None else None
+        maps = (
+            self._deny_windows,
+            self._bytes_windows,
+            self._last_alert_at,
+            self._annotated_fault_states,
+            *spec_maps,
+            *self._extra_maps(),
+        )
+        rings = [*self._deny_windows.values(), *self._bytes_windows.values()]
+        rings += [ring for rule in self._rules.rules if not rule.distinct for ring in rule.windows.values()]
+        slots = sum(len(ring) for ring in rings)
+        distinct_bytes = sum(window.size_bytes for rule in self._rules.rules if rule.distinct for window in rule.windows.values())
+        sketch = self._deny_sketch
+        return {
+            "deny_window_keys": len(self._deny_windows),
+            "bytes_window_keys": len(self._bytes_windows),
+            "cooldown_keys": len(self._last_alert_at),
+            "fault_state_keys": len(self._annotated_fault_states),
+            "spec_rule_keys": sum(len(states) for states in spec_maps),
+            "window_slots": slots,
+            "deny_heavy_hitters": len(sketch.heavy_hitters()) if sketch is not None else 0,
+            "feature_baseline_keys": len(baselines) if baselines is not None else 0,
+            "topology_adjacency_keys": len(self._topology.adjacency) if self._topology is not None else 0,
+            "topology_faulting_devices": len(self._topology.faulting) if self._topology is not None else 0,
+            "alert_storm_keys": len(self._storms) if self._storms is not None else 0,
+            "rule_state_bytes_approx": sum(len(states) for states in maps) * _KEY_BYTES
+            + len(rings) * _RING_BYTES
+            + slots * _SLOT_BYTES
+            + (sketch.size_bytes if sketch is not None else 0)
+            + distinct_bytes
+            + (sum(baseline.size_bytes for baseline in baselines.values()) if baselines is not None else 0),
+            "state_evicted_ttl": sum(states.evicted_ttl for states in maps),
+            "state_evicted_lru": sum(states.evicted_lru for states in maps),
+            "rule_events": self.rule_events,
+            "prefilter_skipped": self.prefilter_skipped,
+        }
+
+    def export_state(self) -> dict[str, Any]:
+        """Window, cooldown and annotated-fault state as JSON-ready data (epoch seconds).
+
+        Windows are exported as ``[second, count, sum]`` slots.
+        """
+        faults = self._annotated_fault_states
+        return {
+            "watermark": self._watermark,
+            "deny_windows": {key: [list(slot) for slot in ring.slots()] for key, ring in self._deny_windows.items() if ring},
+            "bytes_windows": {key: [list(slot) for slot in ring.slots()] for key, ring in self._bytes_windows.items() if ring},
+            "last_alert_at": {key: ts.timestamp() for key, ts in self._last_alert_at.items()},
+            "annotated_fault_states": dict(faults.items()),
+            "annotated_fault_seen_at": {key: faults.touched(key) for key, _ in faults.items()},
+            "spec_rules": self._rules.export_state(),
+            "deny_sketch": self._deny_sketch.export_state() if self._deny_sketch is not None else None,
+            "feature_baselines": self._anomaly.export_state() if self._anomaly is not None else {},
+            "topology_fanin": self._topology.export_state() if self._topology is not None else {},
+            "alert_storms": self._export_storms(),
+            "ended_storm_summaries": list(self._ended_storms),
+        }
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        self._deny_windows.clear()
+        for key, items in _by_last_slot(state.get("deny_windows")):
+            ring = RingCounter((self.config.deny_window_sec,))
+            ring.load(items)
+            self._deny_windows.set(key, ring, float(ring.head or 0))
+        self._bytes_windows.clear()
+        for key, items in _by_last_slot(state.get("bytes_windows")):
+            ring = RingCounter((self.config.bytes_window_sec,))
+            ring.load(items)
+            self._bytes_windows.set(key, ring, float(ring.head or 0))
+        self._last_alert_at.clear()
+        for key, ts in sorted((state.get("last_alert_at") or {}).items(), key=lambda item: item[1]):
+            self._last_alert_at.set(key, _from_epoch(ts), float(ts))
+        self._rules.import_state(state.get("spec_rules") or {})
+        if self._deny_sketch is not None and not self._deny_sketch.import_state(state.get("deny_sketch") or {}):
+            LOGGER.warning("deny sketch snapshot missing or of another geometry; heavy-hitter counts start empty")
+        # Snapshots from before eviction carry no watermark; the newest restored time stands in.
+        latest = [
+            touched
+            for states in (self._deny_windows, self._bytes_windows, self._last_alert_at, *self._rules.maps())
+            for touched in states.touched_times()
+        ]
+        watermark = float(state.get("watermark") or max(latest, default=0.0))
+        seen_at = state.get("annotated_fault_seen_at") or {}
+        faults = sorted(
+            (state.get("annotated_fault_states") or {}).items(),
+            key=lambda item: float(seen_at.get(item[0]) or watermark),
+        )
+        self._annotated_fault_states.clear()
+        for key, value in faults:
+            # Older snapshots also kept healthy entities.
+            if value != "healthy":
+                self._annotated_fault_states.set(key, value, float(seen_at.get(key) or watermark))
+        if self._anomaly is not None:
+            self._anomaly.import_state(state.get("feature_baselines") or {}, watermark)
+        if self._topology is not None:
+            self._topology.import_state(state.get("topology_fanin") or {})
+        if self._storms is not None:
+            self._storms.clear()
+            for key, saved in sorted((state.get("alert_storms") or {}).items(), key=lambda item: item[1]["touched"]):
+                self._storms.set(key, AlertStorm.load(saved), float(saved["touched"]))
+            self._ended_storms = list(state.get("ended_storm_summaries") or [])
+        self._watermark = watermark
+        self._swept_sec = int(watermark)
 
     def _cooldown_ok(self, alert_key: str, now: datetime) -> bool:
-        last = self._last_alert_at.get(alert_key)
+        if self._storms is not None and self._storm(alert_key) is not None:
+            # An ongoing storm is reported by summaries, not by a new alert.
+            return False
+        pending = self._pending_cooldowns
+        if pending is None:
+            last = self._last_alert_at.get(alert_key)
+        else:
+            last = pending.get(alert_key) or self._last_alert_at.get(alert_key)
         if last is not None and (now - last).total_seconds() < self.config.cooldown_sec:
             return False
-        self._last_alert_at[alert_key] = now
+        if pending is None:
+            self._last_alert_at.set(alert_key, now, now.timestamp())
+        else:
+            pending[alert_key] = now
+            self._cooldown_log.append((self._batch_position, alert_key, now))
         return True
 
+    def _opened(self, alert_key: str, metric: str, alert: dict[str, Any], now: datetime) -> dict[str, Any]:
+        """Start the storm of a full alert; ``metric`` is the one its summaries report the maximum of."""
+        if self._storms is not None:
+            ts = now.timestamp()
+            self._touch_storm(alert_key, AlertStorm(alert, metric, ts), ts)
+        return alert
+
+    def _suppressed(self, alert_key: str, event: dict[str, Any], now: datetime, value: Any) -> dict[str, Any] | None:
+        """Count a suppressed hit in its storm; an ``ongoing`` summary once the interval has passed."""
+        if self._storms is None:
+            return None
+        storm = self._storm(alert_key)
+        if storm is None:
+            return None
+        ts = now.timestamp()
+        storm.hit(ts, ts, value, str(event.get("event_id") or ""))
+        self._touch_storm(alert_key, storm, ts)
+        if ts - storm.reported_at < self.config.storm_summary_interval_sec:
+            return None
+        return storm.summary("ongoing", ts)
+
+    def _storm(self, alert_key: str) -> AlertStorm | None:
+        pending = self._pending_storms
+        if pending is not None:
+            storm = pending.get(alert_key)
+            if storm is not None:
+                return storm
+        return self._storms.get(alert_key)
+
+    def _touch_storm(self, alert_key: str, storm: AlertStorm, ts: float) -> None:
+        if self._pending_storms is None:
+            self._storms.set(alert_key, storm, ts)
+        else:
+            self._pending_storms[alert_key] = storm
+            self._storm_log.append((self._batch_position, alert_key, storm, ts))
+
+    def _storm_ended(self, alert_key: str, storm: AlertStorm) -> None:
+        if storm.count:
+            self._ended_storms.append(storm.summary("ended", storm.last_ts))
+
+    def _with_ended_storms(self, alerts: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        if not self._ended_storms:
+            return alerts
+        ended = self._ended_storms
+        self._ended_storms = []
+        return ended + alerts
+
+    def _export_storms(self) -> dict[str, Any]:
+        storms = self._storms
+        if storms is None:
+            return {}
+        return {key: {**storm.export_state(), "touched": storms.touched(key)} for key, storm in storms.items()}
+
+
+def _running_totals(start: int, values: list[int], threshold: int) -> list[tuple[int, int]]:
+    """``(offset, start + sum(values[:offset + 1]))`` from the first total reaching ``threshold``."""
+    if start + sum(values) < threshold:
+        return []
+    if np is not None and len(values) >= _NUMPY_MIN_RUN:
+        totals = np.cumsum(np.asarray(values, dtype=np.int64)) + start
+        first = int(np.searchsorted(totals, threshold))
+        return [(offset, int(totals[offset])) for offset in range(first, len(values))]
+    result = []
+    running = start
+    for offset, value in enumerate(values):
+        running += value
+        if running >= threshold:
+            result.append((offset, running))
+    return result
+
+
+def _append(results: list[list], index: int, alert: dict[str, Any] | None) -> None:
+    if alert:
+        results[index].append(alert)
+
+
+def _ring(windows: ExpiringMap, key: str, window_sec: int, ts: float) -> RingCounter:
+    ring = windows.get(key)
+    if ring is None:
+        ring = RingCounter((window_sec,))
+    windows.set(key, ring, ts)
+    return ring
+
+
+def _by_last_slot(windows: dict[str, list[Any]] | None) -> list[tuple[str, list[tuple[int, int, int]]]]:
+    # Oldest windows first, so the import keeps the maps in last-touch order.
+    loaded = [(key, _window_slots(items)) for key, items in (windows or {}).items()]
+    return sorted(loaded, key=lambda item: max((slot[0] for slot in item[1]), default=0))
+
+
+def _window_slots(items: list[Any]) -> list[tuple[int, int, int]]:
+    # Snapshots written before windows were bucketed hold one entry per event:
+    # a bare epoch for deny windows, ``[epoch, bytes]`` for bytes windows.
+    slots = []
+    for item in items:
+        if isinstance(item, (int, float)):
+            slots.append((int(item // 1), 1, 0))
+        elif len(item) == 2:
+            slots.append((int(item[0] // 1), 1, int(item[1])))
+        else:
+            slots.append((int(item[0]), int(item[1]), int(item[2])))
+    return slots
+
+
+def _from_epoch(value: float) -> datetime:
+    return datetime.fromtimestamp(float(value), tz=timezone.utc)
+
 
 def _parse_event_ts(event: dict[str, Any]) -> datetime | None:
     raw_ts = event.get("event_ts")
@@ -252,7 +975,7 @@ def _fault_annotation(event: dict[str, Any]) -> dict[str, Any] | None:
             "label_value": str(context.get("label_value") or context.get("scenario") or ""),
         }
 
-    for field_name in ["fault_label", "fault_type", "scenario", "label", "class", "status", "state"]:
+    for field_name in _FAULT_LABEL_FIELDS:
         if field_name not in event:
             continue
         raw_value = event.get(field_name)
@@ -268,6 +991,36 @@ def _fault_annotation(event: dict[str, Any]) -> dict[str, Any] | None:
     return None
 
 
+def _has_annotation(event: dict[str, Any]) -> bool:
+    """``_fault_annotation(event) is not None`` without building the annotation."""
+    context = event.get("fault_context")
+    if isinstance(context, dict):
+        return "is_fault" in context or "scenario" in context or "label_value" in context
+    return any(field_name in event for field_name in _FAULT_LABEL_FIELDS)
+
+
+def _annotates_fault(event: dict[str, Any]) -> bool:
+    """``_fault_annotation(event)["is_fault"]`` without building the annotation."""
+    context = event.get("fault_context")
+    if isinstance(context, dict):
+        return bool(context.get("is_fault"))
+    for field_name in _FAULT_LABEL_FIELDS:
+        if field_name in event:
+            return _is_fault_label(event.get(field_name))
+    return False
+
+
+def _is_deny(event: dict[str, Any]) -> bool:
+    return str(event.get("action") or "").lower() == "deny"
+
+
+def _bytes_total(event: dict[str, Any]) -> int:
+    try:
+        return int(event.get("bytes_total") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
 def _event_entity_key(event: dict[str, Any]) -> str:
     topology = event.get("topology_context")
     if not isinstance(topology, dict):
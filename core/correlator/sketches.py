@@ -0,0 +1,311 @@
+import base64
+import hashlib
+import math
+from array import array
+from operator import sub
+from typing import Any
+
+
+class WindowedCountMin:
+    """Count-min sketch over a sliding event-time window, with a top-K of its heaviest keys.
+
+    One ``width`` x ``depth`` table per occupied second is kept, plus their
+    running sum, so the window slides by subtracting whole seconds and memory
+    is at most ``(window_sec + 2) * width * depth`` counters however many keys
+    arrive. Estimates are count-mean-min: each row's counter minus the mean
+    count the other keys add to it, then the median over rows, capped by the
+    plain count-min. With many distinct keys (a spoofed-source scan) that
+    noise is about ``total / width`` per counter, and ``error_bound()`` is three
+    standard deviations of it. The window covers the seconds
+    ``head - window_sec .. head``, where ``head`` is the newest second seen by
+    the sketch rather than by each key; older events are ignored.
+    """
+
+    def __init__(self, window_sec: int, width: int = 1024, depth: int = 4, top_k: int = 32) -> None:
+        self.window_sec = max(int(window_sec), 0)
+        self.width = max(int(width), 1)
+        self.depth = max(int(depth), 1)
+        self.top_k = max(int(top_k), 1)
+        self.head: int | None = None
+        self.total = 0
+        self._seconds: dict[int, tuple[array, int]] = {}
+        self._running = self._table()
+        # Heaviest keys with their cells and last estimate; refreshed per second.
+        self._top: dict[str, tuple[tuple[int, ...], int]] = {}
+        self._top_floor: str | None = None
+
+    def add(self, key: str, ts: float, count: int = 1) -> int:
+        """Count ``key`` at ``ts`` and return its window estimate."""
+        sec = int(ts // 1)
+        cells = self._cells(key)
+        if self.head is None or sec > self.head:
+            self.advance(sec)
+        if sec >= self.head - self.window_sec:
+            table, total = self._seconds.get(sec) or (self._table(), 0)
+            running = self._running
+            for cell in cells:
+                table[cell] += count
+                running[cell] += count
+            self._seconds[sec] = (table, total + count)
+            self.total += count
+        estimate = self._estimate(cells)
+        self._offer(key, cells, estimate)
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return self._estimate(self._cells(key))
+
+    def error_bound(self) -> int:
+        """Three standard deviations of the count other keys add to one counter."""
+        return math.ceil(3 * math.sqrt(self.total / self.width))
+
+    def in_top(self, key: str) -> bool:
+        return key in self._top
+
+    def heavy_hitters(self) -> list[tuple[str, int]]:
+        """Top-K keys by estimate, heaviest first."""
+        return sorted(((key, estimate) for key, (_, estimate) in self._top.items()), key=lambda item: -item[1])
+
+    def advance(self, sec: int) -> None:
+        """Move the window head to ``sec``, dropping seconds that fall out of it."""
+        if self.head is not None and sec <= self.head:
+            return
+        self.head = sec
+        cutoff = sec - self.window_sec
+        expired = [old for old in self._seconds if old < cutoff]
+        for old in expired:
+            table, total = self._seconds.pop(old)
+            self._running = array("I", map(sub, self._running, table))
+            self.total -= total
+        if expired:
+            self._refresh_top()
+
+    @property
+    def size_bytes(self) -> int:
+        return (len(self._seconds) + 1) * self.width * self.depth * self._running.itemsize
+
+    def export_state(self) -> dict[str, Any]:
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "head": self.head,
+            "seconds": {
+                str(sec): [total, base64.b64encode(table.tobytes()).decode("ascii")]
+                for sec, (table, total) in sorted(self._seconds.items())
+            },
+            "top": [key for key, _ in self.heavy_hitters()],
+        }
+
+    def import_state(self, state: dict[str, Any]) -> bool:
+        """Restore a snapshot of the same geometry; False (and empty) otherwise."""
+        self._seconds = {}
+        self._running = self._table()
+        self.total = 0
+        self.head = None
+        self._top = {}
+        self._top_floor = None
+        if int(state.get("width") or 0) != self.width or int(state.get("depth") or 0) != self.depth:
+            return False
+        for sec, (total, encoded) in (state.get("seconds") or {}).items():
+            table = array("I")
+            table.frombytes(base64.b64decode(encoded))
+            if len(table) != len(self._running):
+                continue
+            self._seconds[int(sec)] = (table, int(total))
+            self._running = array("I", map(sum, zip(self._running, table)))
+            self.total += int(total)
+        head = state.get("head")
+        self.head = int(head) if head is not None else max(self._seconds, default=None)
+        for key in state.get("top") or []:
+            cells = self._cells(str(key))
+            self._offer(str(key), cells, self._estimate(cells))
+        return True
+
+    def _table(self) -> array:
+        return array("I", bytes(4 * self.width * self.depth))
+
+    def _cells(self, key: str) -> tuple[int, ...]:
+        # Stable across processes (unlike hash()), so restored sketches still match.
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        first, step = digest & 0xFFFFFFFF, (digest >> 32) | 1
+        width = self.width
+        return tuple(row * width + (first + row * step) % width for row in range(self.depth))
+
+    def _estimate(self, cells: tuple[int, ...]) -> int:
+        running = self._running
+        counts = [running[cell] for cell in cells]
+        if self.width == 1:
+            return min(counts)
+        corrected = sorted(count - (self.total - count) / (self.width - 1) for count in counts)
+        middle = len(corrected) // 2
+        median = corrected[middle] if len(corrected) % 2 else (corrected[middle - 1] + corrected[middle]) / 2
+        return max(0, min(round(median), min(counts)))
+
+    def _offer(self, key: str, cells: tuple[int, ...], estimate: int) -> None:
+        top = self._top
+        if key in top or len(top) < self.top_k:
+            top[key] = (cells, estimate)
+            if self._top_floor is None or key == self._top_floor or estimate < top[self._top_floor][1]:
+                self._top_floor = min(top, key=lambda item: top[item][1])
+            return
+        if estimate <= top[self._top_floor][1]:
+            return
+        del top[self._top_floor]
+        top[key] = (cells, estimate)
+        self._top_floor = min(top, key=lambda item: top[item][1])
+
+    def _refresh_top(self) -> None:
+        running = self._running
+        refreshed = {}
+        for key, (cells, _) in self._top.items():
+            estimate = self._estimate(cells) if min(running[cell] for cell in cells) else 0
+            if estimate:
+                refreshed[key] = (cells, estimate)
+        self._top = refreshed
+        self._top_floor = min(refreshed, key=lambda item: refreshed[item][1]) if refreshed else None
+
+
+class WindowedHyperLogLog:
+    """HyperLogLog distinct count over a sliding event-time window.
+
+    The window is split into ``buckets`` buckets of ``ceil(window_sec /
+    buckets)`` seconds, each with its own registers. A small bucket is kept
+    sparse, as a dict, until it fills ``1/16`` of its registers. The merged
+    registers of the buckets ``head - buckets .. head`` are kept up to date on
+    ``add`` and rebuilt only when a bucket leaves the window, so an estimate
+    costs O(1). The relative standard error is ``1.04 / sqrt(2**precision)``.
+    """
+
+    def __init__(self, window_sec: int, buckets: int = 6, precision: int = 8) -> None:
+        self.buckets = max(int(buckets), 1)
+        self.bucket_sec = max(math.ceil(max(int(window_sec), 0) / self.buckets), 1)
+        self.precision = min(max(int(precision), 4), 16)
+        self.registers = 1 << self.precision
+        self.head: int | None = None
+        self._buckets: dict[int, dict[int, int] | bytearray] = {}
+        self._merged = bytearray(self.registers)
+        self._inverse_sum = float(self.registers)
+        self._zeros = self.registers
+
+    @property
+    def span_sec(self) -> int:
+        """Event-time seconds after which a bucket can no longer be in the window."""
+        return (self.buckets + 1) * self.bucket_sec
+
+    @property
+    def last_sec(self) -> float:
+        """Last second of the newest bucket, or 0 when empty."""
+        return float((self.head + 1) * self.bucket_sec - 1) if self.head is not None else 0.0
+
+    def add(self, value: str, ts: float) -> None:
+        bucket = int(ts // self.bucket_sec)
+        if self.head is None or bucket > self.head:
+            self._advance(bucket)
+        elif bucket < self.head - self.buckets:
+            return
+        index, rank = self._register(value)
+        registers = self._buckets.get(bucket)
+        if registers is None:
+            registers = self._buckets[bucket] = {}
+        if isinstance(registers, dict):
+            if registers.get(index, 0) < rank:
+                registers[index] = rank
+                if len(registers) > self.registers >> 4:
+                    self._buckets[bucket] = _dense(registers, self.registers)
+        elif registers[index] < rank:
+            registers[index] = rank
+        merged = self._merged[index]
+        if merged < rank:
+            self._inverse_sum += 2.0**-rank - 2.0**-merged
+            self._zeros -= merged == 0
+            self._merged[index] = rank
+
+    def estimate(self) -> int:
+        m = self.registers
+        raw = _alpha(m) * m * m / self._inverse_sum
+        if raw <= 2.5 * m and self._zeros:
+            return round(m * math.log(m / self._zeros))
+        return round(raw)
+
+    def error_bound(self) -> int:
+        """Three standard errors of the current estimate."""
+        return math.ceil(3 * 1.04 / math.sqrt(self.registers) * self.estimate())
+
+    @property
+    def size_bytes(self) -> int:
+        return self.registers + sum(
+            len(registers) * 2 if isinstance(registers, dict) else self.registers for registers in self._buckets.values()
+        )
+
+    def slots(self) -> list[tuple[int, str]]:
+        """(bucket start second, base64 registers) per bucket, oldest first."""
+        return [
+            (bucket * self.bucket_sec, base64.b64encode(_dense(registers, self.registers)).decode("ascii"))
+            for bucket, registers in sorted(self._buckets.items())
+        ]
+
+    def load(self, slots: list[Any]) -> None:
+        self._buckets = {}
+        self.head = None
+        for start, encoded in slots:
+            registers = bytearray(base64.b64decode(encoded))
+            if len(registers) != self.registers:
+                continue
+            bucket = int(start) // self.bucket_sec
+            self.head = bucket if self.head is None else max(self.head, bucket)
+            ranks = {index: rank for index, rank in enumerate(registers) if rank}
+            self._buckets[bucket] = ranks if len(ranks) <= self.registers >> 4 else registers
+        if self.head is not None:
+            self._advance(self.head, force=True)
+        else:
+            self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _advance(self, bucket: int, force: bool = False) -> None:
+        self.head = bucket
+        cutoff = bucket - self.buckets
+        expired = [old for old in self._buckets if old < cutoff]
+        for old in expired:
+            del self._buckets[old]
+        if expired or force:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        merged = bytearray(self.registers)
+        for registers in self._buckets.values():
+            if isinstance(registers, dict):
+                for index, rank in registers.items():
+                    if merged[index] < rank:
+                        merged[index] = rank
+            else:
+                merged = bytearray(map(max, merged, registers))
+        self._merged = merged
+        self._inverse_sum = sum(2.0**-rank for rank in merged)
+        self._zeros = merged.count(0)
+
+    def _register(self, value: str) -> tuple[int, int]:
+        digest = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+        rest_bits = 64 - self.precision
+        rest = digest & ((1 << rest_bits) - 1)
+        return digest >> rest_bits, rest_bits - rest.bit_length() + 1
+
+
+def _dense(registers: dict[int, int] | bytearray, size: int) -> bytearray:
+    if not isinstance(registers, dict):
+        return registers
+    dense = bytearray(size)
+    for index, rank in registers.items():
+        dense[index] = rank
+    return dense
+
+
+def _alpha(registers: int) -> float:
+    if registers <= 16:
+        return 0.673
+    if registers <= 32:
+        return 0.697
+    if registers <= 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / registers)
@@ -0,0 +1,291 @@
+import base64
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any
+
+from common.infra.kafka_batch import BatchConsumer
+from core.correlator.partition_state import CorrelatorState, PartitionStates
+
+LOGGER = logging.getLogger(__name__)
+
+# Snapshot layout (little endian):
+#   header: magic "CRSN", u16 version, u16 reserved, u64 created_ms, u32 body length
+#   body:   zlib-compressed JSON {"offsets": {"topic:partition": next_offset}, "gate": ..., "engine": ...}
+# ``offsets`` are the committed offsets the state corresponds to: every record
+# below them is reflected in the state, none at or above.
+_MAGIC = b"CRSN"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHQI")
+
+
+def encode_snapshot(state: CorrelatorState, offsets: dict[tuple[str, int], int]) -> bytes:
+    body = {
+        "offsets": {f"{topic}:{partition}": offset for (topic, partition), offset in sorted(offsets.items())},
+        "gate": state.gate.export_state(),
+        "engine": state.engine.export_state(),
+    }
+    payload = zlib.compress(json.dumps(body, ensure_ascii=True, separators=(",", ":")).encode("utf-8"), 6)
+    return _HEADER.pack(_MAGIC, _VERSION, 0, int(time.time() * 1000), len(payload)) + payload
+
+
+def decode_snapshot(blob: bytes) -> dict[str, Any]:
+    if len(blob) < _HEADER.size:
+        raise ValueError("truncated correlator snapshot")
+    magic, version, _, created_ms, length = _HEADER.unpack_from(blob, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"unsupported correlator snapshot: magic={magic!r} version={version}")
+    body = blob[_HEADER.size : _HEADER.size + length]
+    if len(body) != length:
+        raise ValueError("truncated correlator snapshot")
+    data = json.loads(zlib.decompress(body).decode("utf-8"))
+    offsets = {}
+    for name, offset in (data.get("offsets") or {}).items():
+        topic, _, partition = name.rpartition(":")
+        offsets[(topic, int(partition))] = int(offset)
+    data["offsets"] = offsets
+    data["created_ms"] = created_ms
+    return data
+
+
+class SnapshotStore:
+    """Snapshot blobs by name in a local directory and/or a compacted Kafka topic."""
+
+    def __init__(
+        self,
+        directory: str = "",
+        producer: Any = None,
+        changelog_topic: str = "",
+        key_prefix: str = "",
+        changelog: dict[str, bytes] | None = None,
+    ) -> None:
+        self.directory = Path(directory) if directory else None
+        self.producer = producer if changelog_topic else None
+        self.changelog_topic = changelog_topic
+        self.key_prefix = key_prefix
+        self._changelog = dict(changelog or {})
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None or self.producer is not None
+
+    def save(self, name: str, blob: bytes) -> None:
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as fp:
+                    fp.write(blob)
+                    fp.flush()
+                    os.fsync(fp.fileno())
+                os.replace(tmp_path, self.directory / f"{name}.snap")
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        if self.producer is not None:
+            key = f"{self.key_prefix}/{name}".encode("utf-8")
+            self.producer.send(self.changelog_topic, key=key, value=base64.b64encode(blob).decode("ascii")).get(timeout=30)
+            self._changelog[name] = blob
+
+    def load(self, name: str) -> bytes | None:
+        """The newer of the local and changelog copies (by committed offsets)."""
+        candidates = []
+        if self.directory is not None:
+            path = self.directory / f"{name}.snap"
+            if path.exists():
+                candidates.append(path.read_bytes())
+        if name in self._changelog:
+            candidates.append(self._changelog[name])
+        best: bytes | None = None
+        best_rank = None
+        for blob in candidates:
+            try:
+                snapshot = decode_snapshot(blob)
+            except ValueError as exc:
+                LOGGER.warning("ignore unreadable correlator snapshot name=%s: %s", name, exc)
+                continue
+            rank = (sum(snapshot["offsets"].values()), snapshot["created_ms"])
+            if best_rank is None or rank > best_rank:
+                best, best_rank = blob, rank
+        return best
+
+
+def read_changelog(bootstrap_servers: str, topic: str, key_prefix: str, timeout_sec: float = 30.0) -> dict[str, bytes]:
+    """Latest blob per snapshot name in the compacted changelog topic."""
+    from kafka import KafkaConsumer, TopicPartition
+
+    consumer = KafkaConsumer(
+        bootstrap_servers=[x.strip() for x in bootstrap_servers.split(",") if x.strip()],
+        group_id=None,
+        enable_auto_commit=False,
+    )
+    latest: dict[str, bytes] = {}
+    prefix = f"{key_prefix}/"
+    try:
+        partitions = [TopicPartition(topic, partition) for partition in sorted(consumer.partitions_for_topic(topic) or [])]
+        if not partitions:
+            return latest
+        consumer.assign(partitions)
+        consumer.seek_to_beginning(*partitions)
+        end_offsets = consumer.end_offsets(partitions)
+        deadline = time.monotonic() + timeout_sec
+        while any(consumer.position(tp) < end_offsets[tp] for tp in partitions):
+            if time.monotonic() > deadline:
+                LOGGER.warning("changelog read timed out topic=%s; restoring from what was read", topic)
+                break
+            for records in consumer.poll(timeout_ms=500).values():
+                for record in records:
+                    key = (record.key or b"").decode("utf-8")
+                    if not key.startswith(prefix):
+                        continue
+                    name = key[len(prefix) :]
+                    if record.value is None:
+                        latest.pop(name, None)
+                    else:
+                        latest[name] = base64.b64decode(record.value)
+    finally:
+        consumer.close()
+    return latest
+
+
+class StateSnapshotter:
+    """Save and restore ``PartitionStates`` in step with committed offsets.
+
+    ``maybe_save`` commits synchronously and then snapshots every partition
+    whose committed offset moved. Rebalance hooks restore state for assigned
+    partitions and snapshot revoked ones before their state is dropped.
+    """
+
+    def __init__(
+        self,
+        states: PartitionStates,
+        batches: BatchConsumer,
+        store: SnapshotStore,
+        interval_sec: float,
+        stats: dict[str, int],
+    ) -> None:
+        self.states = states
+        self.batches = batches
+        self.store = store
+        self.interval_sec = interval_sec
+        self.stats = stats
+        self._saved_offsets: dict[tuple[str, int], dict[tuple[str, int], int]] = {}
+        self._live: set[tuple[str, int]] = set()
+        self._last_save = time.monotonic()
+        for key in ("snapshots_written", "snapshot_bytes", "snapshot_ms", "restored_partitions", "restore_ms", "snapshot_error"):
+            stats.setdefault(key, 0)
+
+    def on_assigned(self, partitions: list[Any]) -> None:
+        self.states.assign(partitions)
+        self.restore(partitions)
+
+    def on_revoked(self, partitions: list[Any]) -> None:
+        # The listener has already committed, so the revoked partitions' offsets are final.
+        if self.states.scope == "partition":
+            keys = {(item.topic, item.partition) for item in partitions}
+            self.save(keys)
+            for key in keys:
+                self._live.discard(key)
+                self._saved_offsets.pop(key, None)
+        self.states.revoke(partitions)
+
+    def maybe_save(self) -> None:
+        if not self.store.enabled or time.monotonic() - self._last_save < self.interval_sec:
+            return
+        self.batches.commit(asynchronous=False)
+        self.save()
+
+    def save(self, keys: set[tuple[str, int]] | None = None) -> None:
+        self._last_save = time.monotonic()
+        if not self.store.enabled:
+            return
+        committed = self.batches.tracker.committed()
+        started = time.perf_counter()
+        written = 0
+        size = 0
+        for key, state in self.states.items():
+            if keys is not None and key not in keys:
+                continue
+            if self.states.scope == "global":
+                offsets = committed
+            else:
+                offsets = {key: committed[key]} if key in committed else {}
+            if not offsets or offsets == self._saved_offsets.get(key):
+                continue
+            blob = encode_snapshot(state, offsets)
+            try:
+                self.store.save(_snapshot_name(key), blob)
+            except Exception:
+                self.stats["snapshot_error"] += 1
+                LOGGER.exception("failed to save correlator snapshot name=%s", _snapshot_name(key))
+                continue
+            self._saved_offsets[key] = offsets
+            written += 1
+            size += len(blob)
+        if written:
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            self.stats["snapshots_written"] += written
+            self.stats["snapshot_bytes"] = size
+            self.stats["snapshot_ms"] = elapsed_ms
+            LOGGER.info("correlator snapshot saved: partitions=%d bytes=%d elapsed_ms=%d", written, size, elapsed_ms)
+
+    def restore(self, partitions: list[Any]) -> None:
+        if not self.store.enabled:
+            return
+        keys = sorted({self.states.key_for(item.topic, item.partition) for item in partitions})
+        for key in keys:
+            # Only state that is not live yet is restored; a later assignment
+            # in global scope must not roll the shared state back.
+            if key in self._live:
+                continue
+            self._live.add(key)
+            started = time.perf_counter()
+            blob = self.store.load(_snapshot_name(key))
+            if blob is None:
+                continue
+            snapshot = decode_snapshot(blob)
+            state = self.states.get(*key)
+            state.gate.import_state(snapshot.get("gate") or {})
+            state.engine.import_state(snapshot.get("engine") or {})
+            self._saved_offsets[key] = snapshot["offsets"]
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            self.stats["restored_partitions"] += 1
+            self.stats["restore_ms"] += elapsed_ms
+            LOGGER.info(
+                "correlator snapshot restored: name=%s bytes=%d offsets=%s committed=%s elapsed_ms=%d",
+                _snapshot_name(key),
+                len(blob),
+                _describe_offsets(snapshot["offsets"]),
+                _describe_offsets(self._committed_offsets(snapshot["offsets"])),
+                elapsed_ms,
+            )
+
+    def _committed_offsets(self, offsets: dict[tuple[str, int], int]) -> dict[tuple[str, int], int]:
+        # The group's committed position can be ahead of the snapshot (records
+        # processed after it are then missing from the windows) or behind it
+        # (replayed records are dropped by the restored dedup set).
+        from kafka.structs import TopicPartition
+
+        committed = {}
+        for topic, partition in offsets:
+            try:
+                value = self.batches.consumer.committed(TopicPartition(topic, partition))
+            except Exception:
+                value = None
+            if value is not None:
+                committed[(topic, partition)] = int(value)
+        return committed
+
+
+def _snapshot_name(key: tuple[str, int]) -> str:
+    topic, partition = key
+    return "global" if partition < 0 else f"{topic}-{partition}"
+
+
+def _describe_offsets(offsets: dict[tuple[str, int], int]) -> str:
+    return ",".join(f"{topic}:{partition}@{offset}" for (topic, partition), offset in sorted(offsets.items())) or "-"
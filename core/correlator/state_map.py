@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import Any, Callable, Iterator
+
+
+class ExpiringMap:
+    """Per-key rule state, evicted by event-time TTL and capped in size.
+
+    Keys are kept in last-touch order, so the least recently touched key is
+    always first: ``expire`` pops from the front while keys are older than
+    ``ttl_sec`` before the watermark, and ``set`` spills the front key once
+    the map holds more than ``max_keys`` (0 = unbounded). With one TTL per map
+    this order is the expiry order, so both cost O(1) per key. A key touched
+    by a late event keeps its newest touch time but moves to the back, which
+    at worst delays its eviction. ``on_evict(key, value)`` is called for keys
+    dropped by TTL or by the cap, not for ``pop`` or ``clear``.
+    """
+
+    __slots__ = ("ttl_sec", "max_keys", "on_evict", "_values", "_touched", "evicted_ttl", "evicted_lru")
+
+    def __init__(self, ttl_sec: int, max_keys: int = 0, on_evict: Callable[[str, Any], None] | None = None) -> None:
+        self.ttl_sec = max(int(ttl_sec), 0)
+        self.max_keys = max(int(max_keys), 0)
+        self.on_evict = on_evict
+        self._values: OrderedDict[str, Any] = OrderedDict()
+        self._touched: dict[str, float] = {}
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
+
+    def set(self, key: str, value: Any, ts: float) -> None:
+        values = self._values
+        if key in values:
+            values.move_to_end(key)
+            if ts < self._touched[key]:
+                ts = self._touched[key]
+        values[key] = value
+        self._touched[key] = ts
+        if self.max_keys and len(values) > self.max_keys:
+            oldest, value = values.popitem(last=False)
+            del self._touched[oldest]
+            self.evicted_lru += 1
+            if self.on_evict is not None:
+                self.on_evict(oldest, value)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        self._touched.pop(key, None)
+        return self._values.pop(key, default)
+
+    def touched(self, key: str) -> float | None:
+        return self._touched.get(key)
+
+    def expire(self, watermark: float) -> int:
+        """Drop keys last touched before ``watermark - ttl_sec`` (whole seconds)."""
+        cutoff = int(watermark // 1) - self.ttl_sec
+        values = self._values
+        touched = self._touched
+        evicted = 0
+        while values:
+            key = next(iter(values))
+            if touched[key] >= cutoff:
+                break
+            _, value = values.popitem(last=False)
+            del touched[key]
+            evicted += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+        self.evicted_ttl += evicted
+        return evicted
+
+    def touched_times(self) -> Iterator[float]:
+        return iter(self._touched.values())
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        return iter(self._values.items())
+
+    def values(self) -> Iterator[Any]:
+        return iter(self._values.values())
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._touched.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
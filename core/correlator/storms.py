@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any
+
+STORM_MODES = ("off", "summary")
+
+
+class AlertStorm:
+    """Hits of one alert key suppressed since its full alert was emitted.
+
+    ``metric`` names the alert metric whose maximum is reported. Counts,
+    first/last hit time and that maximum cover the hits since the previous
+    summary; ``total`` covers the whole storm.
+    """
+
+    __slots__ = (
+        "alert_id",
+        "rule_id",
+        "severity",
+        "dimensions",
+        "metric",
+        "reported_at",
+        "seq",
+        "total",
+        "count",
+        "first_ts",
+        "last_ts",
+        "peak",
+        "last_event_id",
+    )
+
+    def __init__(self, alert: dict[str, Any], metric: str, ts: float) -> None:
+        self.alert_id = str(alert["alert_id"])
+        self.rule_id = str(alert["rule_id"])
+        self.severity = str(alert["severity"])
+        self.dimensions = dict(alert["dimensions"])
+        self.metric = metric
+        self.reported_at = ts
+        self.seq = 0
+        self.total = 0
+        self.count = 0
+        self.first_ts = 0.0
+        self.last_ts = 0.0
+        self.peak: Any = None
+        self.last_event_id = ""
+
+    def hit(self, first_ts: float, last_ts: float, peak: Any, event_id: str, count: int = 1) -> None:
+        """Count ``count`` suppressed hits between ``first_ts`` and ``last_ts``."""
+        if not self.count:
+            self.first_ts, self.last_ts = first_ts, last_ts
+        else:
+            self.first_ts = min(self.first_ts, first_ts)
+            self.last_ts = max(self.last_ts, last_ts)
+        if peak is not None and (self.peak is None or peak > self.peak):
+            self.peak = peak
+        self.count += count
+        self.total += count
+        self.last_event_id = event_id
+
+    def summary(self, status: str, ts: float) -> dict[str, Any]:
+        """An ``ongoing`` or ``ended`` summary of the hits since the last one; resets them."""
+        self.seq += 1
+        seed = f"{self.alert_id}|summary|{self.seq}"
+        alert = {
+            "schema_version": 1,
+            "alert_id": hashlib.sha1(seed.encode("utf-8"), usedforsecurity=False).hexdigest(),
+            "alert_ts": _iso(self.last_ts),
+            "alert_kind": "storm_summary",
+            "storm_status": status,
+            "parent_alert_id": self.alert_id,
+            "rule_id": self.rule_id,
+            "severity": self.severity,
+            "source_event_id": self.last_event_id,
+            "dimensions": dict(self.dimensions),
+            "metrics": {
+                "suppressed_count": self.count,
+                "storm_suppressed_total": self.total,
+                "first_ts": _iso(self.first_ts),
+                "last_ts": _iso(self.last_ts),
+                f"max_{self.metric}": self.peak,
+                "summary_seq": self.seq,
+            },
+        }
+        self.reported_at = ts
+        self.count = 0
+        self.peak = None
+        return alert
+
+    def export_state(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def load(cls, state: dict[str, Any]) -> AlertStorm:
+        storm = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(storm, name, state.get(name))
+        storm.dimensions = dict(storm.dimensions or {})
+        for name in ("reported_at", "first_ts", "last_ts"):
+            setattr(storm, name, float(getattr(storm, name) or 0.0))
+        for name in ("seq", "total", "count"):
+            setattr(storm, name, int(getattr(storm, name) or 0))
+        storm.last_event_id = str(storm.last_event_id or "")
+        return storm
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
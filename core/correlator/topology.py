@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from core.correlator.state_map import ExpiringMap
+
+
+@dataclass(frozen=True)
+class FanInSpec:
+    """Alert once when ``min_devices`` adjacent devices fault within ``window_sec``.
+
+    Adjacency is learned from the ``topology_context.neighbor_refs`` and
+    ``path_signature`` of fault events and kept for ``adjacency_ttl_sec``;
+    each device keeps at most ``max_degree`` neighbors. With
+    ``suppress_member_alerts``, ``annotated_fault_v1`` alerts of devices in an
+    alerted cluster are dropped in favour of the cluster alert.
+    """
+
+    rule_id: str = "topology_fanin_v1"
+    severity: str = "critical"
+    window_sec: int = 300
+    min_devices: int = 2
+    max_degree: int = 64
+    adjacency_ttl_sec: int = 86400
+    suppress_member_alerts: bool = True
+
+
+def parse_fanin_spec(item: Any) -> FanInSpec | None:
+    """Validate the ``topology_fanin`` object of a rule profile (None when absent or disabled)."""
+    if item is None:
+        return None
+    if not isinstance(item, dict):
+        raise ValueError(f"invalid topology_fanin (dict expected): {item!r}")
+    if not item.get("enabled", True):
+        return None
+    defaults = FanInSpec()
+    spec = FanInSpec(
+        rule_id=str(item.get("rule_id") or defaults.rule_id),
+        severity=str(item.get("severity") or defaults.severity),
+        window_sec=int(item.get("window_sec", defaults.window_sec)),
+        min_devices=int(item.get("min_devices", defaults.min_devices)),
+        max_degree=int(item.get("max_degree", defaults.max_degree)),
+        adjacency_ttl_sec=int(item.get("adjacency_ttl_sec", defaults.adjacency_ttl_sec)),
+        suppress_member_alerts=bool(item.get("suppress_member_alerts", defaults.suppress_member_alerts)),
+    )
+    if spec.min_devices < 2 or spec.max_degree < 1 or spec.window_sec < 0:
+        raise ValueError("topology_fanin needs min_devices >= 2, max_degree >= 1 and window_sec >= 0")
+    return spec
+
+
+class FaultCluster:
+    """Adjacent faulting devices; merged clusters point to the one they joined."""
+
+    __slots__ = ("cluster_id", "parent", "members", "alerted")
+
+    def __init__(self, cluster_id: str) -> None:
+        self.cluster_id = cluster_id
+        self.parent: FaultCluster | None = None
+        self.members: set[str] = set()
+        self.alerted = False
+
+    def root(self) -> FaultCluster:
+        cluster = self
+        while cluster.parent is not None:
+            cluster = cluster.parent
+        # Path compression keeps later lookups O(1).
+        node = self
+        while node.parent is not None and node.parent is not cluster:
+            node.parent, node = cluster, node.parent
+        return cluster
+
+
+class TopologyFanIn:
+    """Neighbor index and clusters of adjacent devices faulting in the same window.
+
+    A fault touches the device's index entry and its neighbors' (O(degree)),
+    then joins the clusters of faulting neighbors. Clusters merge smaller
+    into larger, so copying member sets is amortized O(log n) per device.
+    """
+
+    def __init__(self, spec: FanInSpec, max_keys: int = 0) -> None:
+        self.spec = spec
+        self.adjacency = ExpiringMap(spec.adjacency_ttl_sec, max_keys)
+        self.faulting = ExpiringMap(spec.window_sec, max_keys, on_evict=self._leave)
+
+    def observe_fault(self, device: str, neighbors: list[str], ts: float) -> FaultCluster:
+        """Record a fault of ``device`` and return its cluster root."""
+        self._link(device, neighbors, ts)
+        cluster = self.faulting.get(device)
+        if cluster is None:
+            cluster = FaultCluster(device)
+            cluster.members.add(device)
+        else:
+            cluster = cluster.root()
+        for neighbor in self.adjacency.get(device) or ():
+            other = self.faulting.get(neighbor)
+            if other is not None:
+                cluster = _merge(cluster, other.root())
+        self.faulting.set(device, cluster, ts)
+        return cluster
+
+    def recover(self, device: str) -> None:
+        cluster = self.faulting.pop(device)
+        if cluster is not None:
+            self._leave(device, cluster)
+
+    def maps(self) -> list[ExpiringMap]:
+        return [self.adjacency, self.faulting]
+
+    def export_state(self) -> dict[str, Any]:
+        faulting = self.faulting
+        clusters = {}
+        for device, cluster in faulting.items():
+            root = cluster.root()
+            clusters[device] = [faulting.touched(device), root.cluster_id, root.alerted]
+        return {
+            "adjacency": {node: [sorted(neighbors), self.adjacency.touched(node)] for node, neighbors in self.adjacency.items()},
+            "faulting": clusters,
+        }
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        self.adjacency.clear()
+        for node, (neighbors, touched) in sorted((state.get("adjacency") or {}).items(), key=lambda item: item[1][1]):
+            self.adjacency.set(node, set(neighbors), float(touched))
+        self.faulting.clear()
+        roots: dict[str, FaultCluster] = {}
+        for device, (touched, cluster_id, alerted) in sorted((state.get("faulting") or {}).items(), key=lambda item: item[1][0]):
+            cluster = roots.get(cluster_id)
+            if cluster is None:
+                cluster = roots[cluster_id] = FaultCluster(cluster_id)
+            cluster.members.add(device)
+            cluster.alerted = cluster.alerted or bool(alerted)
+            self.faulting.set(device, cluster, float(touched))
+
+    def _link(self, device: str, neighbors: list[str], ts: float) -> None:
+        adjacency = self.adjacency
+        max_degree = self.spec.max_degree
+        own = adjacency.get(device)
+        if own is None:
+            own = set()
+        for neighbor in neighbors:
+            if neighbor == device:
+                continue
+            if neighbor not in own and len(own) < max_degree:
+                own.add(neighbor)
+            theirs = adjacency.get(neighbor)
+            if theirs is None:
+                theirs = set()
+            if device not in theirs and len(theirs) < max_degree:
+                theirs.add(device)
+                adjacency.set(neighbor, theirs, ts)
+        adjacency.set(device, own, ts)
+
+    def _leave(self, device: str, cluster: FaultCluster) -> None:
+        cluster.root().members.discard(device)
+
+
+def topology_neighbors(topology: Any, device: str) -> list[str]:
+    """Neighbor device names from ``neighbor_refs`` and the nodes of ``path_signature``."""
+    if not isinstance(topology, dict):
+        return []
+    neighbors = []
+    refs = topology.get("neighbor_refs")
+    if isinstance(refs, list):
+        neighbors.extend(str(ref) for ref in refs if ref)
+    path = str(topology.get("path_signature") or "")
+    if "->" in path:
+        # "<entity>|hop_core=..." signatures carry no other node.
+        neighbors.extend(node for node in path.split("->") if node)
+    return [node for node in dict.fromkeys(neighbors) if node != device]
+
+
+def _merge(cluster: FaultCluster, other: FaultCluster) -> FaultCluster:
+    # ``other`` was already faulting, so it stays the root on ties.
+    if other is cluster:
+        return cluster
+    if len(other.members) >= len(cluster.members):
+        cluster, other = other, cluster
+    other.parent = cluster
+    cluster.members |= other.members
+    cluster.alerted = cluster.alerted or other.alerted
+    other.members = set()
+    return cluster
@@ -0,0 +1,148 @@
+from typing import Iterable, Sequence
+
+_LAYOUTS: dict[tuple[int, ...], tuple[tuple[int, ...], dict[int, int]]] = {}
+
+
+def _layout(windows: tuple[int, ...]) -> tuple[tuple[int, ...], dict[int, int]]:
+    # Counters are created per key, so the sorted windows and their offsets are shared.
+    layout = _LAYOUTS.get(windows)
+    if layout is None:
+        ordered = tuple(sorted({max(int(window), 0) for window in windows}))
+        if not ordered:
+            raise ValueError("RingCounter needs at least one window")
+        layout = (ordered, {window: position * 3 for position, window in enumerate(ordered)})
+        _LAYOUTS[windows] = layout
+    return layout
+
+
+class RingCounter:
+    """Event counts and value sums per one-second slot, over several window lengths.
+
+    Only occupied seconds are kept, oldest first, so a key costs at most
+    ``max(windows) + 1`` slots however many events arrive, and a sparse key
+    costs a few. Each window keeps a running count and sum plus the index of
+    its oldest slot, so ``add`` is amortized O(1) and ``count``/``total`` are
+    O(1). A window of ``w`` seconds covers the slots ``head - w .. head``,
+    where ``head`` is the newest second seen. Events older than the largest
+    window are ignored.
+    """
+
+    # _slots is flat [second, count, sum, ...] and _windows is flat
+    # [cursor, count, sum, ...] per window, to keep one counter per key small.
+    __slots__ = ("windows", "_offsets", "_slots", "_start", "_windows", "_head_count", "_head_sum")
+
+    def __init__(self, windows: Sequence[int]) -> None:
+        self.windows, self._offsets = _layout(tuple(windows))
+        self._slots: list[int] = []
+        self._start = 0
+        self._windows = [0] * (3 * len(self.windows))
+        # The newest second is in every window, so events landing in it are
+        # only added up here and folded into the slots when the next second starts.
+        self._head_count = 0
+        self._head_sum = 0
+
+    @property
+    def head(self) -> int | None:
+        return self._slots[-3] if len(self._slots) > self._start else None
+
+    def add(self, ts: float, value: int = 0, count: int = 1) -> None:
+        sec = int(ts // 1)
+        slots = self._slots
+        if len(slots) > self._start:
+            head = slots[-3]
+            if sec == head:
+                self._head_count += count
+                self._head_sum += value
+                return
+            self._flush_head()
+            if sec < head:
+                self._add_late(sec, head, value, count)
+                return
+        slots += (sec, 0, 0)
+        self._head_count = count
+        self._head_sum = value
+        state = self._windows
+        for offset, window in zip(range(0, len(state), 3), self.windows):
+            cursor = state[offset]
+            cutoff = sec - window
+            while slots[cursor] < cutoff:
+                state[offset + 1] -= slots[cursor + 1]
+                state[offset + 2] -= slots[cursor + 2]
+                cursor += 3
+            state[offset] = cursor
+        self._start = state[-3]
+        if self._start > 96 and self._start * 2 > len(slots):
+            self._compact()
+
+    def count(self, window: int) -> int:
+        return self._windows[self._offsets[window] + 1] + self._head_count
+
+    def total(self, window: int) -> int:
+        return self._windows[self._offsets[window] + 2] + self._head_sum
+
+    def slots(self) -> list[tuple[int, int, int]]:
+        """Live ``(second, count, sum)`` slots, oldest first."""
+        self._flush_head()
+        slots = self._slots
+        return [(slots[index], slots[index + 1], slots[index + 2]) for index in range(self._start, len(slots), 3)]
+
+    def load(self, slots: Iterable[Sequence[int]]) -> None:
+        for sec, count, value in slots:
+            self.add(int(sec), int(value), int(count))
+
+    def __len__(self) -> int:
+        return (len(self._slots) - self._start) // 3
+
+    def __bool__(self) -> bool:
+        return len(self._slots) > self._start
+
+    def _flush_head(self) -> None:
+        count = self._head_count
+        value = self._head_sum
+        if not count and not value:
+            return
+        self._slots[-2] += count
+        self._slots[-1] += value
+        state = self._windows
+        for offset in range(0, len(state), 3):
+            state[offset + 1] += count
+            state[offset + 2] += value
+        self._head_count = 0
+        self._head_sum = 0
+
+    def _add_late(self, sec: int, head: int, value: int, count: int) -> None:
+        if sec < head - self.windows[-1]:
+            return
+        slots = self._slots
+        low, high = self._start // 3, len(slots) // 3
+        while low < high:
+            middle = (low + high) // 2
+            if slots[middle * 3] < sec:
+                low = middle + 1
+            else:
+                high = middle
+        position = low * 3
+        state = self._windows
+        if slots[position] == sec:
+            slots[position + 1] += count
+            slots[position + 2] += value
+        else:
+            slots[position:position] = (sec, count, value)
+            for offset in range(0, len(state), 3):
+                if state[offset] > position:
+                    state[offset] += 3
+        for offset, window in zip(range(0, len(state), 3), self.windows):
+            if sec >= head - window:
+                state[offset + 1] += count
+                state[offset + 2] += value
+            elif state[offset] == position:
+                # The new slot is outside this window; keep the cursor on the first slot inside it.
+                state[offset] = position + 3
+
+    def _compact(self) -> None:
+        start = self._start
+        del self._slots[:start]
+        state = self._windows
+        for offset in range(0, len(state), 3):
+            state[offset] -= start
+        self._start = 0
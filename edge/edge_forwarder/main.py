@@ -1,5 +1,4 @@
 import glob
-import hashlib
 import json
 import logging
 import os
@@ -11,6 +10,7 @@ from kafka import KafkaProducer
 from common.infra.config import env_float, env_int, env_str
 from common.infra.jsonl_checkpoint import load_checkpoint, save_checkpoint
 from common.infra.logging_utils import configure_logging
+from common.infra.partition_keys import KEY_MODES, record_key
 
 LOGGER = logging.getLogger(__name__)
 
@@ -27,13 +27,6 @@ def _env_bool(name: str, default: bool) -> bool:
     return default
 
 
-def _event_key(payload: dict[str, Any], raw_line: str) -> bytes:
-    event_id = payload.get("event_id")
-    if isinstance(event_id, str) and event_id:
-        return event_id.encode("utf-8")
-    return hashlib.md5(raw_line.encode("utf-8"), usedforsecurity=False).hexdigest().encode("utf-8")
-
-
 def _producer(bootstrap_servers: str) -> KafkaProducer:
     return KafkaProducer(
         bootstrap_servers=[x.strip() for x in bootstrap_servers.split(",") if x.strip()],
@@ -100,6 +93,10 @@ def main() -> None:
     topic_raw = env_str("KAFKA_TOPIC_RAW", "netops.facts.raw.v1")
     scan_interval_sec = env_float("FORWARDER_SCAN_INTERVAL_SEC", 5.0)
     max_batch_lines = env_int("FORWARDER_MAX_BATCH_LINES", 1000)
+    key_mode = env_str("FORWARDER_KEY_MODE", "device").lower()
+    if key_mode not in KEY_MODES:
+        LOGGER.warning("invalid FORWARDER_KEY_MODE=%s, fallback to device", key_mode)
+        key_mode = "device"
 
     drop_local_deny = _env_bool("FORWARDER_FILTER_DROP_LOCAL_DENY", False)
     drop_broadcast_mdns_nbns = _env_bool("FORWARDER_FILTER_DROP_BROADCAST_MDNS_NBNS", False)
@@ -112,9 +109,10 @@ def main() -> None:
     cumulative_dropped = 0
 
     LOGGER.info(
-        "forwarder started: glob=%s topic=%s drop_local_deny=%s drop_broadcast_mdns_nbns=%s",
+        "forwarder started: glob=%s topic=%s key_mode=%s drop_local_deny=%s drop_broadcast_mdns_nbns=%s",
         input_glob,
         topic_raw,
+        key_mode,
         drop_local_deny,
         drop_broadcast_mdns_nbns,
     )
@@ -167,7 +165,7 @@ def main() -> None:
                         file_offsets[path] = fp.tell()
                         continue
 
-                    key = _event_key(payload, line)
+                    key = record_key(payload, line, key_mode)
                     producer.send(topic_raw, key=key, value=line)
 
                     lines_sent += 1
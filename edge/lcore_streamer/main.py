@@ -4,12 +4,25 @@ import argparse
 import json
 import logging
 import os
+import sys
 import time
 from pathlib import Path
-from typing import Any, Iterable
-
-from common.data_features import LCORE_D_SOURCE_URL, AdaptiveFeatureExtractor, iter_records_from_paths, row_to_canonical_event
+from typing import Any, Iterable, Mapping
+
+from common.data_features import (
+    FEATURE_ENCODINGS,
+    LCORE_D_SOURCE_URL,
+    AdaptiveFeatureExtractor,
+    FeaturePlan,
+    event_time_key,
+    iter_records_from_paths,
+    row_entity_key,
+    row_to_canonical_event,
+)
 from common.infra.logging_utils import configure_logging
+from edge.lcore_streamer.pacing import PacingStats, SourceTimePacer, TokenBucketPacer, event_epoch
+from edge.lcore_streamer.replay_cache import ReplayCache, open_or_build_replay_cache
+from edge.lcore_streamer.sharding import SHARD_MODES, ShardSpec, check_resumable, run_shard_group, shard_path
 
 LOGGER = logging.getLogger(__name__)
 
@@ -49,13 +62,82 @@ def _parse_args() -> argparse.Namespace:
     parser.add_argument("--run-id", default=_env_str("LCORE_RUN_ID", ""), help="Replay/run identifier included in dataset_context and event_id.")
     parser.add_argument("--source-uri", default=_env_str("LCORE_SOURCE_URI", LCORE_D_SOURCE_URL))
     parser.add_argument("--sample-rows", type=int, default=_env_int("LCORE_SAMPLE_ROWS", 5000))
+    parser.add_argument(
+        "--profile-checkpoint-rows",
+        type=int,
+        default=_env_int("LCORE_PROFILE_CHECKPOINT_ROWS", 500),
+        help="Re-rank field roles every N profiled rows.",
+    )
+    parser.add_argument(
+        "--profile-stable-checkpoints",
+        type=int,
+        default=_env_int("LCORE_PROFILE_STABLE_CHECKPOINTS", 3),
+        help="Stop profiling once roles are unchanged for this many checkpoints. 0 always profiles --sample-rows rows.",
+    )
+    parser.add_argument(
+        "--feature-encoding",
+        choices=FEATURE_ENCODINGS,
+        default=_env_str("LCORE_FEATURE_ENCODING", "map"),
+        help="map: metric names in every event. dense/f32b64: value array referenced by the plan hash in dataset_context.",
+    )
     parser.add_argument("--events-per-second", type=float, default=_env_float("LCORE_EVENTS_PER_SECOND", 20.0))
+    parser.add_argument(
+        "--pacing",
+        choices=["rate", "source-time"],
+        default=_env_str("LCORE_PACING", "rate"),
+        help="rate: token bucket at --events-per-second. source-time: replay the source inter-arrival times divided by --speed.",
+    )
+    parser.add_argument("--burst", type=int, default=_env_int("LCORE_BURST", 1), help="Rows that may be emitted back-to-back in rate pacing.")
+    parser.add_argument("--speed", type=float, default=_env_float("LCORE_REPLAY_SPEED", 1.0), help="Speed factor for source-time pacing.")
+    parser.add_argument(
+        "--max-gap-seconds",
+        type=float,
+        default=_env_float("LCORE_MAX_GAP_SECONDS", 60.0),
+        help="Source-time gaps longer than this are compressed to it. 0 keeps gaps as-is.",
+    )
     parser.add_argument("--max-records", type=int, default=_env_int("LCORE_MAX_RECORDS", 0), help="0 means stream until EOF.")
     parser.add_argument("--checkpoint-every", type=int, default=_env_int("LCORE_CHECKPOINT_EVERY", 100))
     parser.add_argument("--reset-output", action="store_true", default=_env_str("LCORE_RESET_OUTPUT", "false").lower() in {"1", "true", "yes"})
     parser.add_argument("--loop", action="store_true", default=_env_str("LCORE_LOOP", "false").lower() in {"1", "true", "yes"}, help="Replay the input again after EOF. Each loop uses a new run_id.")
     parser.add_argument("--max-loops", type=int, default=_env_int("LCORE_MAX_LOOPS", 0), help="Only used with --loop. 0 means infinite.")
     parser.add_argument("--loop-sleep-seconds", type=float, default=_env_float("LCORE_LOOP_SLEEP_SECONDS", 5.0))
+    parser.add_argument(
+        "--read-ahead",
+        type=int,
+        default=_env_int("LCORE_READ_AHEAD", 8),
+        help="Row batches read and decoded ahead on a background thread. 0 reads on the main thread.",
+    )
+    parser.add_argument(
+        "--merge-by-time",
+        action="store_true",
+        default=_env_str("LCORE_MERGE_BY_TIME", "false").lower() in {"1", "true", "yes"},
+        help="Interleave input files by the plan's primary time field instead of streaming them one after another.",
+    )
+    parser.add_argument(
+        "--replay-cache",
+        default=_env_str("LCORE_REPLAY_CACHE", ""),
+        help="Binary cache of canonicalized events. Built once per plan/input set; passes and loops then only re-stamp identity fields.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=_env_int("LCORE_SHARDS", 1),
+        help="Streamer processes. With N > 1 and no --shard-index, this process coordinates N shard processes.",
+    )
+    parser.add_argument("--shard-index", type=int, default=_env_int("LCORE_SHARD_INDEX", -1), help="Run as this shard only.")
+    parser.add_argument(
+        "--shard-mode",
+        choices=SHARD_MODES,
+        default=_env_str("LCORE_SHARD_MODE", "modulo"),
+        help="modulo: row_index %% shards. range: contiguous row blocks. device: all rows of a device on one shard.",
+    )
+    parser.add_argument("--shard-total-rows", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--reuse-plan",
+        action="store_true",
+        default=_env_str("LCORE_REUSE_PLAN", "false").lower() in {"1", "true", "yes"},
+        help="Load the feature plan from --plan-json instead of profiling the input again.",
+    )
     return parser.parse_args()
 
 
@@ -96,8 +178,70 @@ def _cycle_run_id(base_run_id: str, cycle_index: int, loop_enabled: bool) -> str
     return f"{base_run_id}-loop-{cycle_index:04d}"
 
 
-def _records(inputs: Iterable[str]) -> Iterable[dict[str, Any]]:
-    return iter_records_from_paths(inputs)
+def _records(inputs: Iterable[str], read_ahead: int = 0, plan: FeaturePlan | None = None) -> Iterable[Mapping[str, Any]]:
+    """Input rows; with a plan, files are merged on its primary time field instead of concatenated."""
+    order_by = event_time_key(plan) if plan is not None else None
+    return iter_records_from_paths(inputs, read_ahead=read_ahead, order_by=order_by)
+
+
+def _ingest_ts() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _build_pacer(args: argparse.Namespace) -> TokenBucketPacer | SourceTimePacer:
+    if args.pacing == "source-time":
+        return SourceTimePacer(speed=args.speed, max_gap_sec=args.max_gap_seconds)
+    return TokenBucketPacer(args.events_per_second, burst=args.burst)
+
+
+def _coordinate_shards(
+    args: argparse.Namespace,
+    inputs: list[str],
+    plan: FeaturePlan,
+    checkpoint_path: Path,
+    read_ahead: int,
+    merge_plan: FeaturePlan | None,
+    cache_variant: str,
+) -> None:
+    checkpoint = {} if args.reset_output else _load_checkpoint(checkpoint_path)
+    total_rows = 0
+    if args.replay_cache:
+        # Build the cache once here; shard processes find it valid and only open it.
+        cache = open_or_build_replay_cache(
+            Path(args.replay_cache),
+            lambda: _records(inputs, read_ahead, merge_plan),
+            plan,
+            inputs,
+            cache_variant,
+        )
+        total_rows = cache.record_count
+        cache.close()
+    elif args.shard_mode == "range":
+        total_rows = int(checkpoint.get("total_rows") or 0) or sum(1 for _ in _records(inputs, read_ahead, merge_plan))
+    spec = ShardSpec(args.shards, 0, args.shard_mode, total_rows if args.shard_mode == "range" else 0)
+    if not args.reset_output:
+        check_resumable(checkpoint, spec)
+
+    base_run_id = args.run_id or str(checkpoint.get("base_run_id") or "") or _generated_run_id(args.dataset_id)
+    LOGGER.info(
+        "lcore shard coordinator started: shards=%d mode=%s total_rows=%d run_id=%s",
+        spec.count,
+        spec.mode,
+        spec.total_rows,
+        base_run_id,
+    )
+    exit_code = run_shard_group(
+        sys.argv[1:],
+        spec,
+        base_run_id,
+        args.events_per_second,
+        args.max_records,
+        checkpoint_path,
+        _save_checkpoint,
+        _load_checkpoint,
+    )
+    if exit_code:
+        raise SystemExit(exit_code)
 
 
 def main() -> None:
@@ -118,12 +262,48 @@ def main() -> None:
         dataset_id=args.dataset_id,
         source_uri=args.source_uri,
         max_sample_rows=args.sample_rows,
+        feature_encoding=args.feature_encoding,
+        checkpoint_rows=args.profile_checkpoint_rows,
+        stable_checkpoints=args.profile_stable_checkpoints,
     )
-    plan = extractor.build_plan(_records(inputs))
-    plan_path.write_text(json.dumps(plan.to_dict(), ensure_ascii=True, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if args.reuse_plan and plan_path.exists():
+        plan = FeaturePlan.from_dict(json.loads(plan_path.read_text(encoding="utf-8")))
+    else:
+        profile_started = time.monotonic()
+        plan = extractor.build_plan(_records(inputs))
+        plan_path.write_text(json.dumps(plan.to_document(), ensure_ascii=True, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        LOGGER.info(
+            "lcore feature plan built: rows=%d stable_after_rows=%d stop=%s elapsed_sec=%.2f",
+            plan.observed_rows,
+            plan.stable_after_rows,
+            plan.profile_stop_reason,
+            time.monotonic() - profile_started,
+        )
+
+    read_ahead = max(args.read_ahead, 0)
+    merge_plan: FeaturePlan | None = None
+    if args.merge_by_time:
+        if plan.primary_time_field:
+            merge_plan = plan
+        else:
+            LOGGER.warning("--merge-by-time ignored: the feature plan has no primary time field")
+    cache_variant = "merge-by-time" if merge_plan is not None else ""
+
+    if args.shards > 1 and args.shard_index < 0:
+        _coordinate_shards(args, inputs, plan, checkpoint_path, read_ahead, merge_plan, cache_variant)
+        return
+
+    spec = ShardSpec()
+    if args.shards > 1:
+        if not 0 <= args.shard_index < args.shards:
+            raise SystemExit(f"--shard-index must be in [0, {args.shards})")
+        spec = ShardSpec(args.shards, args.shard_index, args.shard_mode, args.shard_total_rows)
+        output_path = shard_path(output_path, spec)
+        checkpoint_path = shard_path(checkpoint_path, spec)
+    shard_start, shard_end = spec.bounds()
 
     checkpoint = {"next_row_index": 0} if args.reset_output else _load_checkpoint(checkpoint_path)
-    next_row_index = int(checkpoint.get("next_row_index", 0))
+    next_row_index = max(int(checkpoint.get("next_row_index", 0)), shard_start)
     base_run_id = args.run_id or str(checkpoint.get("base_run_id") or checkpoint.get("run_id") or "") or _generated_run_id(args.dataset_id)
     loop_index = int(checkpoint.get("loop_index", 0))
     run_id = _cycle_run_id(base_run_id, loop_index, args.loop)
@@ -134,35 +314,70 @@ def main() -> None:
         checkpoint["loop_index"] = loop_index
         _save_checkpoint(checkpoint_path, checkpoint)
 
-    interval = 0.0 if args.events_per_second <= 0 else 1.0 / args.events_per_second
+    pacer = _build_pacer(args)
+    pacing_stats = PacingStats()
     streamed = 0
     started = time.monotonic()
 
     LOGGER.info(
-        "lcore streamer started: inputs=%s output=%s eps=%.2f start_row=%d run_id=%s loop=%s scenario_values=%s",
+        "lcore streamer started: inputs=%s output=%s pacing=%s eps=%.2f speed=%.2f start_row=%d run_id=%s loop=%s shard=%d/%d scenario_values=%s",
         inputs,
         output_path,
+        args.pacing,
         args.events_per_second,
+        args.speed,
         next_row_index,
         run_id,
         args.loop,
+        spec.index,
+        spec.count,
         plan.scenario_values,
     )
 
+    cache: ReplayCache | None = None
+    if args.replay_cache:
+        cache = open_or_build_replay_cache(
+            Path(args.replay_cache),
+            lambda: _records(inputs, read_ahead, merge_plan),
+            plan,
+            inputs,
+            cache_variant,
+        )
+        LOGGER.info("lcore replay cache ready: path=%s records=%d plan_hash=%s", args.replay_cache, cache.record_count, cache.plan_hash)
+    source_time = args.pacing == "source-time"
+
     with output_path.open("a", encoding="utf-8", buffering=1) as fp:
         while True:
             wrote_this_pass = 0
-            for row_index, row in enumerate(_records(inputs)):
-                if row_index < next_row_index:
-                    continue
+            if cache is not None:
+                items: Iterable[tuple[int, Any]] = ((item.row_index, item) for item in cache.iter_events(next_row_index))
+            else:
+                items = ((idx, row) for idx, row in enumerate(_records(inputs, read_ahead, merge_plan)) if idx >= next_row_index)
+            for row_index, item in items:
                 if args.max_records > 0 and streamed >= args.max_records:
                     break
-
-                event = row_to_canonical_event(row, plan, row_index, run_id=run_id)
-                event["dataset_context"]["stream_source"] = "edge.lcore_streamer"
-                event["dataset_context"]["stream_row_index"] = row_index
-                event["ingest_ts"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-                fp.write(json.dumps(event, ensure_ascii=True, separators=(",", ":")) + "\n")
+                if shard_end is not None and row_index >= shard_end:
+                    break
+                if not spec.owns(row_index):
+                    continue
+                if spec.keyed:
+                    device = item.device_key() if cache is not None else row_entity_key(item, plan)
+                    if not spec.owns_key(device):
+                        continue
+
+                if cache is not None:
+                    pacing_stats.observe(pacer.wait(item.source_ts if source_time else None))
+                    line, event_id, event_ts = item.render(plan.dataset_id, run_id, _ingest_ts())
+                else:
+                    event = row_to_canonical_event(item, plan, row_index, run_id=run_id)
+                    event["dataset_context"]["stream_source"] = "edge.lcore_streamer"
+                    event["dataset_context"]["stream_row_index"] = row_index
+                    pacing_stats.observe(pacer.wait(event_epoch(event) if source_time else None))
+                    event["ingest_ts"] = _ingest_ts()
+                    line = json.dumps(event, ensure_ascii=True, separators=(",", ":"))
+                    event_id = event["event_id"]
+                    event_ts = event["event_ts"]
+                fp.write(line + "\n")
 
                 streamed += 1
                 wrote_this_pass += 1
@@ -170,14 +385,20 @@ def main() -> None:
                 checkpoint["base_run_id"] = base_run_id
                 checkpoint["run_id"] = run_id
                 checkpoint["loop_index"] = loop_index
-                checkpoint["last_event_id"] = event["event_id"]
-                checkpoint["last_event_ts"] = event["event_ts"]
+                checkpoint["last_event_id"] = event_id
+                checkpoint["last_event_ts"] = event_ts
 
                 if streamed % max(args.checkpoint_every, 1) == 0:
+                    checkpoint["pacing"] = pacing_stats.report()
                     _save_checkpoint(checkpoint_path, checkpoint)
-
-                if interval > 0:
-                    time.sleep(interval)
+                    LOGGER.info(
+                        "lcore streamer checkpoint: next_row_index=%d achieved_eps=%.2f window_eps=%.2f lag_avg_ms=%.3f lag_max_ms=%.3f",
+                        checkpoint["next_row_index"],
+                        checkpoint["pacing"]["achieved_eps"],
+                        checkpoint["pacing"]["window_eps"],
+                        checkpoint["pacing"]["lag_avg_ms"],
+                        checkpoint["pacing"]["lag_max_ms"],
+                    )
 
             if args.max_records > 0 and streamed >= args.max_records:
                 break
@@ -189,9 +410,9 @@ def main() -> None:
             if args.max_loops > 0 and loop_index >= args.max_loops:
                 break
 
-            next_row_index = 0
+            next_row_index = shard_start
             run_id = _cycle_run_id(base_run_id, loop_index, loop_enabled=True)
-            checkpoint["next_row_index"] = 0
+            checkpoint["next_row_index"] = shard_start
             checkpoint["base_run_id"] = base_run_id
             checkpoint["run_id"] = run_id
             checkpoint["loop_index"] = loop_index
@@ -208,8 +429,11 @@ def main() -> None:
         checkpoint["base_run_id"] = base_run_id
         checkpoint["run_id"] = run_id
         checkpoint["loop_index"] = loop_index
+        checkpoint["pacing"] = pacing_stats.report()
 
     _save_checkpoint(checkpoint_path, checkpoint)
+    if cache is not None:
+        cache.close()
     elapsed = max(time.monotonic() - started, 1e-6)
     LOGGER.info(
         "lcore streamer complete: streamed=%d elapsed_sec=%.2f effective_eps=%.2f next_row_index=%d",
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+# Sleeping for less than this costs more in wake-up jitter than it saves;
+# deadlines are absolute, so skipped sub-millisecond waits are absorbed later.
+_MIN_SLEEP_SEC = 0.0005
+
+
+class PacingStats:
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._started = clock()
+        self._window_started = self._started
+        self.emitted = 0
+        self._window_emitted = 0
+        self._window_lag_sum = 0.0
+        self._window_lag_max = 0.0
+
+    def observe(self, lag_sec: float) -> None:
+        self.emitted += 1
+        self._window_emitted += 1
+        self._window_lag_sum += lag_sec
+        if lag_sec > self._window_lag_max:
+            self._window_lag_max = lag_sec
+
+    def report(self) -> dict[str, Any]:
+        """Return cumulative and since-last-report pacing figures, then reset the window."""
+        now = self._clock()
+        elapsed = max(now - self._started, 1e-6)
+        window_elapsed = max(now - self._window_started, 1e-6)
+        window_count = max(self._window_emitted, 1)
+        report = {
+            "emitted": self.emitted,
+            "achieved_eps": round(self.emitted / elapsed, 2),
+            "window_eps": round(self._window_emitted / window_elapsed, 2),
+            "lag_avg_ms": round(self._window_lag_sum / window_count * 1000.0, 3),
+            "lag_max_ms": round(self._window_lag_max * 1000.0, 3),
+        }
+        self._window_started = now
+        self._window_emitted = 0
+        self._window_lag_sum = 0.0
+        self._window_lag_max = 0.0
+        return report
+
+
+class TokenBucketPacer:
+    """Rate pacer on monotonic deadlines (GCRA form of a token bucket).
+
+    Each emit advances a theoretical arrival time by ``1 / rate`` instead of
+    sleeping a fixed interval, so sleep overshoot and per-row JSON/write cost
+    are absorbed by the next deadline rather than accumulating as drift.
+    ``burst`` rows may be emitted ahead of schedule after an idle period, and a
+    writer that falls behind catches up for at most ``catch_up_sec`` before the
+    schedule is re-anchored, so a stall never turns into an unbounded burst.
+    """
+
+    def __init__(
+        self,
+        events_per_second: float,
+        burst: int = 1,
+        catch_up_sec: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._interval = 0.0 if events_per_second <= 0 else 1.0 / events_per_second
+        self._tolerance = self._interval * (max(burst, 1) - 1)
+        self._catch_up_sec = max(catch_up_sec, 0.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._tat: float | None = None
+
+    def wait(self, source_ts: float | None = None) -> float:
+        """Block until the next row may be emitted; return how late it is in seconds."""
+        if self._interval <= 0:
+            return 0.0
+        now = self._clock()
+        if self._tat is None:
+            self._tat = now
+        allowed_at = self._tat - self._tolerance
+        if now < allowed_at:
+            if allowed_at - now >= _MIN_SLEEP_SEC:
+                self._sleep(allowed_at - now)
+            now = max(self._clock(), allowed_at)
+        lag = max(now - self._tat, 0.0)
+        self._tat = max(self._tat, now - self._catch_up_sec) + self._interval
+        return lag
+
+
+class SourceTimePacer:
+    """Replay rows at the source timeline's inter-arrival times divided by ``speed``.
+
+    Gaps longer than ``max_gap_sec`` (source time) are compressed to that value
+    and time going backwards (e.g. at a file boundary) does not wait, so a
+    replay never stalls for hours on a capture gap.
+    """
+
+    def __init__(
+        self,
+        speed: float = 1.0,
+        max_gap_sec: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._speed = speed if speed > 0 else 1.0
+        self._max_gap_sec = max(max_gap_sec, 0.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._deadline: float | None = None
+        self._last_source_ts: float | None = None
+
+    def wait(self, source_ts: float | None = None) -> float:
+        now = self._clock()
+        if self._deadline is None or source_ts is None or self._last_source_ts is None:
+            if self._deadline is None:
+                self._deadline = now
+            if source_ts is not None:
+                self._last_source_ts = source_ts
+            return 0.0
+
+        gap = source_ts - self._last_source_ts
+        if gap > 0:
+            if self._max_gap_sec > 0:
+                gap = min(gap, self._max_gap_sec)
+            self._deadline += gap / self._speed
+            self._last_source_ts = source_ts
+
+        if now < self._deadline:
+            if self._deadline - now >= _MIN_SLEEP_SEC:
+                self._sleep(self._deadline - now)
+            return 0.0
+        return now - self._deadline
+
+
+def event_epoch(event: dict[str, Any]) -> float | None:
+    raw = event.get("event_ts")
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
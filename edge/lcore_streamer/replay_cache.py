@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from common.data_features import FeaturePlan, digest_event_id, row_digest, row_to_canonical_event
+
+# File layout (little endian):
+#   header:  magic "LCRC", u16 version, u16 reserved, 16s plan hash, 16s input fingerprint, u64 record count
+#   record:  u32 head_len, u32 tail_len, u64 row_index, i64 event_ts (us since epoch), 32s row digest,
+#            head bytes, tail bytes
+# head/tail are the event JSON (without event_id/event_ts/ingest_ts) split around the
+# dataset_context.run_id value, so a loop only splices new identity fields in front.
+_MAGIC = b"LCRC"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH16s16sQ")
+_RECORD = struct.Struct("<IIQq32s")
+_RUN_ID_SENTINEL = "\x00lcore-replay-run-id\x00"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_RESTAMPED_FIELDS = ("event_id", "event_ts", "ingest_ts")
+_DEVICE_KEY_RE = re.compile(rb'"src_device_key":("(?:[^"\\]|\\.)*")')
+
+
+class CachedEvent(NamedTuple):
+    row_index: int
+    event_ts_us: int
+    row_digest: bytes
+    head: bytes
+    tail: bytes
+
+    @property
+    def source_ts(self) -> float:
+        return self.event_ts_us / 1_000_000
+
+    def device_key(self) -> str:
+        # The top-level src_device_key precedes every nested copy and dataset_context.
+        match = _DEVICE_KEY_RE.search(self.head)
+        return json.loads(match.group(1)) if match else ""
+
+    def render(self, dataset_id: str, run_id: str, ingest_ts: str) -> tuple[str, str, str]:
+        """Return (json_line, event_id, event_ts) for this event stamped with ``run_id``."""
+        event_id = digest_event_id(dataset_id, run_id, self.row_index, self.row_digest)
+        event_ts = (_EPOCH + timedelta(microseconds=self.event_ts_us)).isoformat()
+        line = (
+            f'{{"event_id":"{event_id}","event_ts":"{event_ts}","ingest_ts":"{ingest_ts}",'
+            f"{self.head.decode('ascii')}{json.dumps(run_id, ensure_ascii=True)}{self.tail.decode('ascii')}"
+        )
+        return line, event_id, event_ts
+
+
+def inputs_fingerprint(inputs: Iterable[str], variant: str = "") -> str:
+    """Fingerprint of input paths, sizes, and mtimes. ``variant`` names the row order."""
+    digest = hashlib.sha256(variant.encode("utf-8"))
+    for raw_path in inputs:
+        path = Path(raw_path)
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for item in files:
+            try:
+                stat = item.stat()
+            except OSError:
+                continue
+            digest.update(f"{item}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_replay_cache(
+    path: Path,
+    rows: Iterable[Any],
+    plan: FeaturePlan,
+    input_fingerprint: str,
+    stream_source: str = "edge.lcore_streamer",
+) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    sentinel_json = json.dumps(_RUN_ID_SENTINEL, ensure_ascii=True)
+    count = 0
+    with tmp_path.open("wb") as fp:
+        fp.write(_HEADER.pack(_MAGIC, _VERSION, 0, _ascii16(plan.plan_hash()), _ascii16(input_fingerprint), 0))
+        for row_index, row in enumerate(rows):
+            event = row_to_canonical_event(row, plan, row_index, run_id=_RUN_ID_SENTINEL)
+            event["dataset_context"]["stream_source"] = stream_source
+            event["dataset_context"]["stream_row_index"] = row_index
+            event_ts_us = _event_ts_us(event["event_ts"])
+            for key in _RESTAMPED_FIELDS:
+                event.pop(key, None)
+            body = json.dumps(event, ensure_ascii=True, separators=(",", ":"))
+            head, _, tail = body[1:].partition(sentinel_json)
+            head_bytes = head.encode("ascii")
+            tail_bytes = tail.encode("ascii")
+            fp.write(_RECORD.pack(len(head_bytes), len(tail_bytes), row_index, event_ts_us, row_digest(row)))
+            fp.write(head_bytes)
+            fp.write(tail_bytes)
+            count += 1
+        fp.seek(0)
+        fp.write(_HEADER.pack(_MAGIC, _VERSION, 0, _ascii16(plan.plan_hash()), _ascii16(input_fingerprint), count))
+        fp.flush()
+        os.fsync(fp.fileno())
+    tmp_path.replace(path)
+    return count
+
+
+class ReplayCache:
+    """Memory-mapped reader for a cache written by ``build_replay_cache``."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fp = path.open("rb")
+        try:
+            self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fp.close()
+            raise ValueError(f"empty replay cache: {path}")
+        magic, version, _, plan_hash, fingerprint, count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"unsupported replay cache format: {path}")
+        self.plan_hash = plan_hash.decode("ascii")
+        self.input_fingerprint = fingerprint.decode("ascii")
+        self.record_count = count
+
+    def matches(self, plan: FeaturePlan, input_fingerprint: str) -> bool:
+        return self.plan_hash == plan.plan_hash() and self.input_fingerprint == input_fingerprint
+
+    def iter_events(self, start_row: int = 0) -> Iterator[CachedEvent]:
+        data = self._map
+        offset = _HEADER.size
+        record_size = _RECORD.size
+        end = len(data)
+        while offset < end:
+            head_len, tail_len, row_index, event_ts_us, digest = _RECORD.unpack_from(data, offset)
+            body_start = offset + record_size
+            offset = body_start + head_len + tail_len
+            if row_index < start_row:
+                continue
+            yield CachedEvent(
+                row_index,
+                event_ts_us,
+                digest,
+                data[body_start : body_start + head_len],
+                data[body_start + head_len : offset],
+            )
+
+    def close(self) -> None:
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._fp.close()
+
+
+def open_or_build_replay_cache(
+    path: Path,
+    rows_factory: Any,
+    plan: FeaturePlan,
+    inputs: Iterable[str],
+    variant: str = "",
+) -> ReplayCache:
+    fingerprint = inputs_fingerprint(inputs, variant)
+    if path.exists():
+        try:
+            cache = ReplayCache(path)
+        except ValueError:
+            cache = None
+        if cache is not None:
+            if cache.matches(plan, fingerprint):
+                return cache
+            cache.close()
+    build_replay_cache(path, rows_factory(), plan, fingerprint)
+    return ReplayCache(path)
+
+
+def _event_ts_us(event_ts: str) -> int:
+    parsed = datetime.fromisoformat(event_ts.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    delta = parsed - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _ascii16(value: str) -> bytes:
+    return value.encode("ascii")[:16].ljust(16, b"\0")
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+from common.infra.partition_keys import key_shard
+
+LOGGER = logging.getLogger(__name__)
+
+SHARD_MODES = ("modulo", "range", "device")
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Which row indexes one streamer process owns.
+
+    ``modulo`` assigns ``row_index % count == index``. ``range`` assigns a
+    contiguous block of ``total_rows / count`` rows, so each shard reads its
+    block in source order and can stop at the end of it. ``device`` assigns
+    every row of a device to the same shard (``owns_key``), so each shard's
+    output carries complete per-device streams.
+    """
+
+    count: int = 1
+    index: int = 0
+    mode: str = "modulo"
+    total_rows: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 1
+
+    def bounds(self) -> tuple[int, int | None]:
+        if not self.enabled or self.mode != "range":
+            return 0, None
+        base, extra = divmod(max(self.total_rows, 0), self.count)
+        start = self.index * base + min(self.index, extra)
+        return start, start + base + (1 if self.index < extra else 0)
+
+    @property
+    def keyed(self) -> bool:
+        return self.enabled and self.mode == "device"
+
+    def owns(self, row_index: int) -> bool:
+        """Row-index ownership; always True in ``device`` mode, see ``owns_key``."""
+        if not self.enabled or self.mode == "device":
+            return True
+        if self.mode == "range":
+            start, end = self.bounds()
+            return start <= row_index < (end or 0)
+        return row_index % self.count == self.index
+
+    def owns_key(self, device: str) -> bool:
+        if not self.keyed:
+            return True
+        return key_shard(device, self.count) == self.index
+
+
+def shard_path(path: Path, spec: ShardSpec) -> Path:
+    if not spec.enabled:
+        return path
+    return path.with_name(f"{path.stem}-shard{spec.index:02d}{path.suffix}")
+
+
+def split_quota(total: int, count: int, index: int) -> int:
+    """Share of ``total`` for shard ``index``; 0 stays 0 (unlimited)."""
+    if total <= 0:
+        return 0
+    base, extra = divmod(total, count)
+    return base + (1 if index < extra else 0)
+
+
+def combined_checkpoint(
+    spec: ShardSpec,
+    base_run_id: str,
+    shard_checkpoints: Sequence[dict[str, Any]],
+    elapsed_sec: float,
+) -> dict[str, Any]:
+    """Group checkpoint with each shard's position.
+
+    ``low_watermark_row_index`` is the smallest next row index over all shards:
+    every row below it has been written by its owner.
+    """
+    positions = []
+    emitted = 0
+    for index, checkpoint in enumerate(shard_checkpoints):
+        pacing = checkpoint.get("pacing") or {}
+        emitted += int(pacing.get("emitted", 0))
+        positions.append(
+            {
+                "shard_index": index,
+                "next_row_index": int(checkpoint.get("next_row_index", 0)),
+                "loop_index": int(checkpoint.get("loop_index", 0)),
+                "run_id": checkpoint.get("run_id", ""),
+                "last_event_id": checkpoint.get("last_event_id", ""),
+                "last_event_ts": checkpoint.get("last_event_ts", ""),
+            }
+        )
+    return {
+        "shards": spec.count,
+        "shard_mode": spec.mode,
+        "total_rows": spec.total_rows,
+        "base_run_id": base_run_id,
+        "shard_positions": positions,
+        "low_watermark_row_index": min((item["next_row_index"] for item in positions), default=0),
+        "emitted": emitted,
+        "aggregate_eps": round(emitted / max(elapsed_sec, 1e-6), 2),
+    }
+
+
+def check_resumable(checkpoint: dict[str, Any], spec: ShardSpec) -> None:
+    """Refuse to resume a group checkpoint written with a different shard layout."""
+    if "shards" not in checkpoint:
+        return
+    layout = (int(checkpoint.get("shards", 0)), checkpoint.get("shard_mode"), int(checkpoint.get("total_rows", 0)))
+    expected = (spec.count, spec.mode, spec.total_rows)
+    if layout != expected:
+        raise SystemExit(
+            f"checkpoint was written with shards/mode/total_rows={layout}, not {expected}; "
+            "rerun with the same layout or --reset-output"
+        )
+
+
+def run_shard_group(
+    argv: Sequence[str],
+    spec: ShardSpec,
+    base_run_id: str,
+    events_per_second: float,
+    max_records: int,
+    checkpoint_path: Path,
+    save_checkpoint: Callable[[Path, dict[str, Any]], None],
+    load_checkpoint: Callable[[Path], dict[str, Any]],
+    poll_sec: float = 1.0,
+) -> int:
+    """Run one streamer process per shard and keep the combined checkpoint current.
+
+    If a shard exits with an error the others are stopped; their own shard
+    checkpoints are already durable, so a rerun resumes every shard from its
+    last position.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(_REPO_ROOT), env.get("PYTHONPATH", "")]))
+    processes: list[subprocess.Popen[bytes]] = []
+    for index in range(spec.count):
+        command = [
+            sys.executable,
+            "-m",
+            "edge.lcore_streamer.main",
+            *argv,
+            "--shards",
+            str(spec.count),
+            "--shard-index",
+            str(index),
+            "--shard-mode",
+            spec.mode,
+            "--shard-total-rows",
+            str(spec.total_rows),
+            "--run-id",
+            base_run_id,
+            "--reuse-plan",
+            "--events-per-second",
+            repr(events_per_second / spec.count),
+            "--max-records",
+            str(split_quota(max_records, spec.count, index)),
+        ]
+        processes.append(subprocess.Popen(command, env=env))
+
+    started = time.monotonic()
+    shard_checkpoints = [shard_path(checkpoint_path, ShardSpec(spec.count, index, spec.mode)) for index in range(spec.count)]
+    exit_code = 0
+    try:
+        while True:
+            codes = [process.poll() for process in processes]
+            failed = [code for code in codes if code not in (None, 0)]
+            combined = combined_checkpoint(
+                spec,
+                base_run_id,
+                [load_checkpoint(path) for path in shard_checkpoints],
+                time.monotonic() - started,
+            )
+            save_checkpoint(checkpoint_path, combined)
+            if failed:
+                exit_code = failed[0]
+                LOGGER.error("lcore shard exited with code %s; stopping the group", exit_code)
+                break
+            if all(code == 0 for code in codes):
+                break
+            LOGGER.info(
+                "lcore shard group: emitted=%d aggregate_eps=%.2f low_watermark_row_index=%d",
+                combined["emitted"],
+                combined["aggregate_eps"],
+                combined["low_watermark_row_index"],
+            )
+            running = next((process for process in processes if process.poll() is None), None)
+            if running is None:
+                # Every shard exited since the poll above; poll again to read their codes.
+                continue
+            try:
+                running.wait(timeout=poll_sec)
+            except subprocess.TimeoutExpired:
+                pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+    combined = combined_checkpoint(
+        spec,
+        base_run_id,
+        [load_checkpoint(path) for path in shard_checkpoints],
+        time.monotonic() - started,
+    )
+    save_checkpoint(checkpoint_path, combined)
+    LOGGER.info(
+        "lcore shard group complete: shards=%d emitted=%d aggregate_eps=%.2f",
+        spec.count,
+        combined["emitted"],
+        combined["aggregate_eps"],
+    )
+    return exit_code
@@ -1,3 +1,5 @@
+import json
+
 from common.data_features import AdaptiveFeatureExtractor, iter_records_from_paths, row_to_canonical_event
 
 
@@ -57,6 +59,33 @@ def test_iter_records_from_paths_reads_csv(tmp_path) -> None:
     assert rows[0]["_source_file"] == str(path)
 
 
+def test_csv_record_views_match_dict_rows(tmp_path) -> None:
+    import csv
+
+    path = tmp_path / "sample.csv"
+    path.write_text(
+        "timestamp,Device_name,ICMP loss,class\n"
+        "1760264160,CORE-R1,0,H\n"
+        "\n"
+        "1760264220,CORE-R2,100\n",
+        encoding="utf-8",
+    )
+
+    rows = list(iter_records_from_paths([path]))
+    with path.open(encoding="utf-8", newline="") as fp:
+        expected = [dict(row, _source_file=str(path)) for row in csv.DictReader(fp)]
+
+    assert [dict(row) for row in rows] == expected
+    assert rows[1]["class"] is None
+    assert rows[1].source_line == 4
+
+    plan = AdaptiveFeatureExtractor(max_sample_rows=10).build_plan(rows)
+    assert plan.to_dict() == AdaptiveFeatureExtractor(max_sample_rows=10).build_plan(expected).to_dict()
+    assert [row_to_canonical_event(row, plan, idx) for idx, row in enumerate(rows)] == [
+        row_to_canonical_event(row, plan, idx) for idx, row in enumerate(expected)
+    ]
+
+
 def test_lcore_d_fault_labels_preserve_ten_scenarios() -> None:
     labels = [
         "Single link failure",
@@ -190,3 +219,86 @@ def test_run_id_is_part_of_canonical_event_identity() -> None:
     assert second["dataset_context"]["run_id"] == "run-b"
     assert first["event_id"] != second["event_id"]
     assert first["event_id"] == repeated["event_id"]
+
+
+def test_compact_feature_encodings_decode_through_plan_registry() -> None:
+    from common.data_features import FeaturePlanRegistry, feature_vector_view
+
+    rows = [
+        {"timestamp": "1760264160", "Device_name": "CORE-R1", "class": "H", "ICMP loss": "0", "cpu_util": "12.5"},
+        {"timestamp": "1760264220", "Device_name": "CORE-R1", "class": "F", "ICMP loss": "100", "cpu_util": ""},
+    ]
+    map_plan = AdaptiveFeatureExtractor(max_sample_rows=10).build_plan(rows)
+    expected = row_to_canonical_event(rows[1], map_plan, 1)["feature_vector"]
+    assert "feature_plan_hash" not in row_to_canonical_event(rows[1], map_plan, 1)["dataset_context"]
+
+    for encoding in ("dense", "f32b64"):
+        plan = AdaptiveFeatureExtractor(max_sample_rows=10, feature_encoding=encoding).build_plan(rows)
+        registry = FeaturePlanRegistry()
+        registry.register(json.loads(json.dumps(plan.to_document())))
+
+        event = json.loads(json.dumps(row_to_canonical_event(rows[1], plan, 1)))
+        assert event["dataset_context"]["feature_plan_hash"] == plan.plan_hash()
+        assert not isinstance(event["feature_vector"], dict)
+        assert dict(feature_vector_view(event, registry)) == expected
+
+
+def test_iter_records_from_paths_streams_json_records_with_read_ahead(tmp_path) -> None:
+    rows = [{"timestamp": 1760264160 + idx, "Device_name": f"CORE-R{idx % 3}", "class": "H"} for idx in range(1500)]
+    path = tmp_path / "sample.json"
+    path.write_text(json.dumps({"meta": {"version": 2}, "records": rows}, indent=1), encoding="utf-8")
+
+    direct = list(iter_records_from_paths([path]))
+    ahead = list(iter_records_from_paths([path], read_ahead=2))
+
+    assert direct == ahead
+    assert len(direct) == 1500
+    assert direct[1499]["Device_name"] == "CORE-R2"
+    assert direct[1499]["_source_line"] == 1500
+
+
+def test_iter_records_from_paths_merges_sources_by_time(tmp_path) -> None:
+    from common.data_features import event_time_key
+
+    (tmp_path / "a.csv").write_text("timestamp,Device_name,class\n1760000100,r1,H\n1760000300,r1,H\n,r1,H\n1760000500,r1,F\n", encoding="utf-8")
+    (tmp_path / "b.jsonl").write_text(
+        "".join(json.dumps({"timestamp": ts, "Device_name": "r2", "class": "H"}) + "\n" for ts in ("1760000200", "1760000300", "1760000400")),
+        encoding="utf-8",
+    )
+    plan = AdaptiveFeatureExtractor(max_sample_rows=10).build_plan(iter_records_from_paths([tmp_path]))
+    assert plan.primary_time_field == "timestamp"
+
+    rows = list(iter_records_from_paths([tmp_path], order_by=event_time_key(plan)))
+
+    assert [(row["Device_name"], row["timestamp"][-3:]) for row in rows] == [
+        ("r1", "100"),
+        ("r2", "200"),
+        ("r1", "300"),
+        ("r1", ""),
+        ("r2", "300"),
+        ("r2", "400"),
+        ("r1", "500"),
+    ]
+
+
+def test_build_plan_stops_profiling_once_roles_are_stable() -> None:
+    rows = [
+        {"timestamp": str(1760264160 + idx * 60), "Device_name": f"CORE-R{idx % 4}", "ICMP loss": str(idx % 7), "class": "H" if idx % 5 else "F"}
+        for idx in range(5000)
+    ]
+
+    full = AdaptiveFeatureExtractor(max_sample_rows=5000).build_plan(rows)
+    early = AdaptiveFeatureExtractor(max_sample_rows=5000, checkpoint_rows=100, stable_checkpoints=3).build_plan(rows)
+
+    assert full.profile_stop_reason == "sample_limit"
+    assert early.profile_stop_reason == "stable"
+    assert early.observed_rows == 400
+    assert early.stable_after_rows == 100
+    assert early.metric_fields == full.metric_fields
+    assert early.scenario_values == full.scenario_values
+
+    # A label that only shows up later resets the stability count.
+    late = rows[:250] + [dict(rows[250], **{"class": "TH"})] + rows[251:]
+    late_plan = AdaptiveFeatureExtractor(max_sample_rows=5000, checkpoint_rows=100, stable_checkpoints=3).build_plan(late)
+    assert late_plan.stable_after_rows == 300
+    assert late_plan.observed_rows == 600
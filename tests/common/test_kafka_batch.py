@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, OffsetTracker, PipelinedSender
+
+
+def _msg(offset: int, partition: int = 0) -> SimpleNamespace:
+    return SimpleNamespace(topic="t", partition=partition, offset=offset, value="{}")
+
+
+class _Consumer:
+    def __init__(self, batches: list[list[SimpleNamespace]], fail_commit: bool = False) -> None:
+        self._batches = batches
+        self.fail_commit = fail_commit
+        self.commits: list[dict] = []
+        self.async_callbacks: list = []
+
+    def poll(self, timeout_ms: int, max_records: int) -> dict:
+        if not self._batches:
+            return {}
+        batch = self._batches.pop(0)
+        records: dict = {}
+        for msg in batch:
+            records.setdefault(("t", msg.partition), []).append(msg)
+        return records
+
+    def commit(self, offsets: dict) -> None:
+        if self.fail_commit:
+            raise RuntimeError("commit failed")
+        self.commits.append({(tp.topic, tp.partition): meta.offset for tp, meta in offsets.items()})
+
+    def commit_async(self, offsets: dict, callback) -> None:
+        self.async_callbacks.append((offsets, callback))
+
+
+class _Future:
+    def __init__(self, error: Exception | None) -> None:
+        self.error = error
+
+    def get(self, timeout: float) -> None:
+        if self.error is not None:
+            raise self.error
+
+
+class _Producer:
+    def send(self, topic: str, key: bytes, value: str) -> _Future:
+        if value == "raise":
+            raise RuntimeError("buffer full")
+        return _Future(RuntimeError("not acked") if value == "fail" else None)
+
+
+def test_offset_tracker_commits_next_offset_once_per_move() -> None:
+    tracker = OffsetTracker()
+    tracker.ack("t", 0, 4)
+    tracker.ack("t", 0, 2)
+    tracker.ack("t", 1, 0)
+    assert tracker.pending() == {("t", 0): 5, ("t", 1): 1}
+    tracker.mark_committed(tracker.pending())
+    assert tracker.pending() == {}
+    tracker.ack("t", 1, 3)
+    assert tracker.pending() == {("t", 1): 4}
+    tracker.forget([SimpleNamespace(topic="t", partition=1)])
+    assert tracker.pending() == {}
+
+
+def test_batch_consumer_commits_on_count_and_on_close() -> None:
+    consumer = _Consumer([[_msg(0), _msg(1)], [_msg(2), _msg(0, partition=1)]])
+    settings = KafkaBatchSettings(commit_interval_sec=3600, commit_every_records=2, commit_mode="sync", max_idle_polls=1)
+    stats: dict[str, int] = {}
+    batches = BatchConsumer(consumer, settings, stats)
+    for batch in batches.batches():
+        for msg in batch:
+            if msg.offset != 2:
+                batches.ack(msg)
+        batches.maybe_commit()
+    batches.close()
+    assert consumer.commits == [{("t", 0): 2}, {("t", 1): 1}]
+    assert stats["batches"] == 2
+    assert stats["commits"] == 2
+
+
+def test_batch_consumer_async_commit_and_failures_are_counted() -> None:
+    consumer = _Consumer([[_msg(0)]])
+    stats: dict[str, int] = {}
+    batches = BatchConsumer(consumer, KafkaBatchSettings(commit_interval_sec=0, max_idle_polls=1), stats)
+    for batch in batches.batches():
+        batches.ack(batch[0])
+        batches.maybe_commit()
+    offsets, callback = consumer.async_callbacks[0]
+    callback(offsets, RuntimeError("coordinator moved"))
+    assert stats["commit_error"] == 1
+    assert batches.tracker.pending() == {("t", 0): 1}
+
+    consumer.fail_commit = True
+    batches.close()
+    assert stats["commit_error"] == 2
+
+
+def test_pipelined_sender_reports_each_failure_with_its_token() -> None:
+    sender = PipelinedSender(_Producer())
+    for token, value in enumerate(["ok", "fail", "raise", "ok"]):
+        sender.send("t", key=b"k", value=value, token=token)
+    assert len(sender) == 4
+    results = sender.gather()
+    assert [token for token, _ in results] == [0, 1, 2, 3]
+    assert [error is None for _, error in results] == [True, False, False, True]
+    assert len(sender) == 0
@@ -12,7 +12,8 @@ from core.aiops_agent.inference_worker import InferenceWorker
 from core.aiops_agent.providers import TemplateProvider, build_provider
 import core.aiops_agent.providers as providers_module
 from core.aiops_agent.reasoning_stage_requests import build_reasoning_stage_requests
-from core.aiops_agent.service import commit_if_needed, run_agent_loop
+from common.infra.kafka_batch import KafkaBatchSettings
+from core.aiops_agent.service import run_agent_loop
 from core.aiops_agent.suggestion_engine import (
     build_alert_pipeline_suggestion,
     build_pipeline_suggestion,
@@ -43,31 +44,30 @@ class _ClientFail:
         raise RuntimeError("query failed")
 
 
-class _ConsumerOK:
-    def __init__(self) -> None:
-        self.committed = 0
-
-    def commit(self) -> None:
-        self.committed += 1
-
-
-class _ConsumerFail:
-    def commit(self) -> None:
-        raise RuntimeError("commit failed")
-
-
 class _Message:
-    def __init__(self, value: str) -> None:
+    def __init__(self, value: str, offset: int) -> None:
+        self.topic = "netops.alerts.v1"
+        self.partition = 0
+        self.offset = offset
         self.value = value
 
 
-class _IterableConsumer(_ConsumerOK):
+class _PollingConsumer:
     def __init__(self, payloads: list[dict]) -> None:
-        super().__init__()
-        self._messages = [_Message(json.dumps(payload, ensure_ascii=True)) for payload in payloads]
+        self.committed: list[dict] = []
+        self._messages = [
+            _Message(json.dumps(payload, ensure_ascii=True), offset) for offset, payload in enumerate(payloads)
+        ]
 
-    def __iter__(self):
-        return iter(self._messages)
+    def poll(self, timeout_ms: int, max_records: int) -> dict:
+        batch, self._messages = self._messages[:max_records], self._messages[max_records:]
+        return {("netops.alerts.v1", 0): batch} if batch else {}
+
+    def commit(self, offsets: dict) -> None:
+        self.committed.append({(tp.topic, tp.partition): meta.offset for tp, meta in offsets.items()})
+
+
+_BATCH_SETTINGS = KafkaBatchSettings(max_records=2, poll_timeout_ms=0, commit_interval_sec=3600, max_idle_polls=1)
 
 
 class _ProducerFuture:
@@ -583,10 +583,10 @@ def test_run_agent_loop_emits_alert_scope_suggestion_for_single_alert(tmp_path)
             "src_device_key": "dev-1",
         },
     }
-    consumer = _IterableConsumer([alert])
+    consumer = _PollingConsumer([alert])
     producer = _Producer()
-    run_agent_loop(_config(str(tmp_path)), consumer, producer, clickhouse_client=None)
-    assert consumer.committed == 1
+    run_agent_loop(_config(str(tmp_path)), consumer, producer, clickhouse_client=None, batch_settings=_BATCH_SETTINGS)
+    assert consumer.committed == [{("netops.alerts.v1", 0): 1}]
     assert len(producer.sent) == 1
     assert producer.sent[0]["payload"]["suggestion_scope"] == "alert"
     assert producer.sent[0]["payload"]["reasoning_stage_requests"]["hypothesis_critique"]["stage"] == "hypothesis_critique"
@@ -609,25 +609,13 @@ def test_run_agent_loop_emits_alert_and_cluster_suggestions_when_cluster_trigger
         base | {"alert_id": "a-2", "alert_ts": "2026-03-09T00:05:00+00:00"},
         base | {"alert_id": "a-3", "alert_ts": "2026-03-09T00:10:00+00:00"},
     ]
-    consumer = _IterableConsumer(alerts)
+    consumer = _PollingConsumer(alerts)
     producer = _Producer()
-    run_agent_loop(_config(str(tmp_path)), consumer, producer, clickhouse_client=None)
+    run_agent_loop(_config(str(tmp_path)), consumer, producer, clickhouse_client=None, batch_settings=_BATCH_SETTINGS)
     scopes = [item["payload"]["suggestion_scope"] for item in producer.sent]
-    assert consumer.committed == 3
+    assert consumer.committed == [{("netops.alerts.v1", 0): 3}]
     assert scopes.count("alert") == 3
     assert scopes.count("cluster") == 1
     cluster_payload = [item["payload"] for item in producer.sent if item["payload"]["suggestion_scope"] == "cluster"][0]
     assert cluster_payload["context"]["cluster_size"] == 3
     assert cluster_payload["reasoning_stage_requests"]["runbook_draft"]["suggestion_scope"] == "cluster"
-
-
-def test_commit_if_needed_success_and_failure_paths() -> None:
-    stats = {"commit_error": 0}
-    c1 = _ConsumerOK()
-    commit_if_needed(c1, should_commit=True, stats=stats)
-    assert c1.committed == 1
-    assert stats["commit_error"] == 0
-
-    c2 = _ConsumerFail()
-    commit_if_needed(c2, should_commit=True, stats=stats)
-    assert stats["commit_error"] == 1
@@ -0,0 +1,124 @@
+import json
+from collections import defaultdict
+from types import SimpleNamespace
+
+from common.alerts import EXCERPT_FIELDS, AlertDecoder, AlertEncoder
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender
+from core.correlator.main import _process_batch
+from core.correlator.partition_state import CorrelatorState, PartitionStates
+from core.correlator.quality_gate import QualityGate
+from core.correlator.rules import RuleConfig, RuleEngine
+
+
+def _fault(index: int, device: str, scenario: str, site: str = "dc1") -> dict:
+    return {
+        "event_id": f"f{index}",
+        "event_ts": f"2026-03-08T00:{index // 60:02d}:{index % 60:02d}Z",
+        "type": "telemetry",
+        "subtype": "monitoring",
+        "src_device_key": device,
+        "site": site,
+        "fault_context": {"is_fault": scenario != "healthy", "scenario": scenario},
+        "topology_context": {"neighbor_refs": ["CORE-R2"], "path_signature": f"{device}->CORE-R2"},
+    }
+
+
+def _alerts() -> list[dict]:
+    engine = RuleEngine(RuleConfig(cooldown_sec=0))
+    scenarios = ["link down", "healthy", "node down", "healthy", "link down"]
+    events = [_fault(index, "CORE-R1", scenario) for index, scenario in enumerate(scenarios)]
+    events.append(_fault(10, "CORE-R1", "node down", site="dc2"))
+    return [alert for event in events for alert in engine.process(event)]
+
+
+def test_compact_alerts_decode_to_schema_1_and_send_contexts_once_per_version() -> None:
+    alerts = _alerts()
+    assert list(alerts[0]["event_excerpt"]) == list(EXCERPT_FIELDS)
+    clock = [0.0]
+    encoder = AlertEncoder(refresh_sec=600, clock=lambda: clock[0])
+    encoded = []
+    for alert in alerts:
+        compact = encoder.encode(alert)
+        encoder.delivered(compact)
+        encoded.append(json.loads(json.dumps(compact)))
+
+    assert [alert["schema_version"] for alert in encoded] == [2, 2, 2, 2]
+    assert None not in encoded[0]["event_excerpt"].values()
+    assert len(encoded[0]["contexts"]) == 3 and "contexts" not in encoded[1]
+    # The site moved, so only the changed topology context and device profile are sent again.
+    assert set(encoded[3]["contexts"]) == {encoded[3]["context_refs"]["topology_context"], encoded[3]["context_refs"]["device_profile"]}
+    assert len(json.dumps(encoded[1])) < len(json.dumps(alerts[1])) / 2
+
+    decoder = AlertDecoder()
+    decoded = [decoder.decode(alert) for alert in encoded]
+    assert decoded == alerts
+    assert [list(alert) for alert in decoded] == [list(alert) for alert in alerts]
+    assert decoder.unresolved == 0 and decoder.decode(alerts[0]) is alerts[0]
+
+    # A consumer that starts mid-stream resolves contexts again after the refresh interval.
+    late = AlertDecoder()
+    assert late.decode(encoded[1])["topology_context"] == {} and late.unresolved == 3
+    clock[0] = 601.0
+    refreshed = encoder.encode(alerts[2])
+    assert len(refreshed["contexts"]) == 3
+    assert late.decode(refreshed) == alerts[2]
+
+
+def test_unchanged_contexts_are_not_hashed_again(monkeypatch) -> None:
+    from common.alerts import compact
+
+    hashed: list[dict] = []
+    real_hash = compact.context_hash
+    monkeypatch.setattr(compact, "context_hash", lambda context: hashed.append(context) or real_hash(context))
+    alerts = _alerts()
+    encoder = AlertEncoder()
+    encoded = [encoder.encode(alert) for alert in alerts]
+
+    # Three contexts for the first alert, then only the two the site move changed.
+    assert len(hashed) == 5
+    assert encoded[1]["context_refs"] == encoded[0]["context_refs"]
+    assert AlertDecoder().decode(encoded[3]) == alerts[3]
+
+
+class _Future:
+    def __init__(self, error: Exception | None) -> None:
+        self.error = error
+
+    def get(self, timeout: float) -> None:
+        if self.error is not None:
+            raise self.error
+
+
+class _Producer:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.sent: list[dict] = []
+
+    def send(self, topic: str, key: bytes, value: str) -> _Future:
+        if topic == "alerts" and self.failures:
+            self.failures -= 1
+            return _Future(TimeoutError("broker unavailable"))
+        if topic == "alerts":
+            self.sent.append(json.loads(value))
+        return _Future(None)
+
+
+def test_contexts_of_a_failed_publish_are_sent_again() -> None:
+    alerts = _alerts()
+    scenarios = ["link down", "healthy", "link down", "healthy"]
+    records = [
+        SimpleNamespace(topic="raw", partition=0, offset=offset, value=json.dumps(_fault(offset, "CORE-R1", scenario)))
+        for offset, scenario in enumerate(scenarios)
+    ]
+    encoder = AlertEncoder()
+    producer = _Producer(failures=1)
+    stats: dict[str, int] = defaultdict(int)
+    states = PartitionStates(lambda: CorrelatorState(QualityGate(), RuleEngine(RuleConfig(cooldown_sec=0))))
+    batches = BatchConsumer(SimpleNamespace(), KafkaBatchSettings(commit_interval_sec=3600), stats)
+    sender = PipelinedSender(producer)
+
+    # The first fault alert times out and goes to the DLQ; the next one still carries the contexts.
+    _process_batch(records[:2], states, sender, batches, "alerts", "dlq", stats, encoder)
+    _process_batch(records[2:], states, sender, batches, "alerts", "dlq", stats, encoder)
+    assert stats["dlq_emitted"] == 1 and len(producer.sent) == 1
+    assert AlertDecoder().decode(producer.sent[0])["topology_context"] == alerts[0]["topology_context"]
@@ -0,0 +1,89 @@
+import json
+from collections import defaultdict
+from types import SimpleNamespace
+
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender, rebalance_listener
+from common.infra.partition_keys import key_shard, record_key
+from core.correlator.main import _process_batch
+from core.correlator.partition_state import CorrelatorState, PartitionStates, per_state_capacity
+from core.correlator.quality_gate import QualityGate
+from core.correlator.rules import RuleConfig, RuleEngine
+
+
+class _Future:
+    def get(self, timeout: float) -> None:
+        return None
+
+
+class _Producer:
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    def send(self, topic: str, key: bytes, value: str) -> _Future:
+        self.sent.append(json.loads(value))
+        return _Future()
+
+
+class _Consumer:
+    def __init__(self) -> None:
+        self.commits: list[dict] = []
+
+    def commit(self, offsets: dict) -> None:
+        self.commits.append({(tp.topic, tp.partition): meta.offset for tp, meta in offsets.items()})
+
+
+def _deny(partition: int, offset: int, device: str) -> SimpleNamespace:
+    event = {
+        "event_id": f"{device}-{offset}",
+        "event_ts": f"2026-03-09T00:00:{offset:02d}+00:00",
+        "type": "traffic",
+        "subtype": "forward",
+        "action": "deny",
+        "src_device_key": device,
+    }
+    return SimpleNamespace(topic="raw", partition=partition, offset=offset, value=json.dumps(event))
+
+
+def test_record_key_prefers_device_and_falls_back_to_event_id() -> None:
+    assert record_key({"src_device_key": "r1", "srcip": "10.0.0.1", "event_id": "e1"}, "{}") == b"r1"
+    assert record_key({"srcip": "10.0.0.1", "event_id": "e1"}, "{}") == b"10.0.0.1"
+    assert record_key({"event_id": "e1"}, "{}") == b"e1"
+    assert record_key({"src_device_key": "r1", "event_id": "e1"}, "{}", mode="event_id") == b"e1"
+    assert len(record_key({}, "raw line")) == 32
+    assert key_shard("r1", 6) == key_shard("r1", 6) and 0 <= key_shard("r1", 6) < 6
+
+
+def test_partition_states_keep_windows_apart_and_drop_revoked_state() -> None:
+    states = PartitionStates(lambda: CorrelatorState(QualityGate(), RuleEngine(RuleConfig(deny_threshold=3))))
+    consumer = _Consumer()
+    stats: dict[str, int] = defaultdict(int)
+    batches = BatchConsumer(consumer, KafkaBatchSettings(commit_interval_sec=3600), stats)
+    listener = rebalance_listener(batches, states.assign, states.revoke)
+    producer = _Producer()
+    sender = PipelinedSender(producer)
+
+    listener.on_partitions_assigned([SimpleNamespace(topic="raw", partition=0), SimpleNamespace(topic="raw", partition=1)])
+    assert states.partitions() == [("raw", 0), ("raw", 1)]
+
+    batch = [_deny(0, 0, "r1"), _deny(1, 0, "r2"), _deny(0, 1, "r1"), _deny(1, 1, "r2"), _deny(0, 2, "r1")]
+    _process_batch(batch, states, sender, batches, "alerts", "dlq", stats)
+    assert [alert["dimensions"]["src_device_key"] for alert in producer.sent] == ["r1"]
+
+    listener.on_partitions_revoked([SimpleNamespace(topic="raw", partition=1)])
+    assert consumer.commits == [{("raw", 0): 3, ("raw", 1): 2}]
+    assert states.partitions() == [("raw", 0)]
+    assert batches.tracker.pending() == {}
+
+
+def test_global_scope_shares_one_state() -> None:
+    states = PartitionStates(lambda: CorrelatorState(QualityGate(), RuleEngine(RuleConfig())), scope="global")
+    assert states.get("raw", 0) is states.get("raw", 5)
+    states.revoke([SimpleNamespace(topic="raw", partition=0)])
+    assert len(states) == 1
+
+
+def test_dedup_capacity_is_split_over_topic_partitions_in_partition_scope() -> None:
+    assert per_state_capacity(200_000, "partition", 6) == 33_333
+    assert 6 * per_state_capacity(200_000, "partition", 6) <= 200_000
+    assert per_state_capacity(200_000, "partition", 0) == 200_000
+    assert per_state_capacity(200_000, "global", 6) == 200_000
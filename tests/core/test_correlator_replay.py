@@ -0,0 +1,59 @@
+import json
+
+from core.benchmark.correlator_replay import main
+from core.correlator.rules import RuleConfig, RuleEngine
+
+
+def _deny(index: int, device: str) -> dict:
+    return {
+        "event_id": f"{device}-{index}",
+        "event_ts": f"2026-03-09T00:00:{index % 60:02d}+00:00",
+        "type": "traffic",
+        "subtype": "forward",
+        "action": "deny",
+        "src_device_key": device,
+    }
+
+
+def test_replay_streams_facts_through_gate_and_rules_and_reports_stages(tmp_path, monkeypatch) -> None:
+    events = [_deny(index, device) for index in range(40) for device in ("r1", "r4")]
+    lines = [json.dumps(event) for event in events]
+    lines[10:10] = [lines[3], "{not json", json.dumps({"event_id": "x", "event_ts": "2026-03-09T00:00:00Z"})]
+    capture = tmp_path / "facts.jsonl"
+    capture.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    alerts_path = tmp_path / "alerts.jsonl"
+    report_path = tmp_path / "report.json"
+
+    monkeypatch.setenv("RULE_DENY_THRESHOLD", "5")
+    monkeypatch.setenv("RULE_ALERT_COOLDOWN_SEC", "10")
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "correlator-replay",
+            "--input",
+            str(capture),
+            "--output-jsonl",
+            str(alerts_path),
+            "--report-json",
+            str(report_path),
+            "--batch-size",
+            "16",
+            "--partitions",
+            "2",
+            "--sample-every",
+            "30",
+        ],
+    )
+    main()
+
+    engines = {device: RuleEngine(RuleConfig(deny_threshold=5, cooldown_sec=10)) for device in ("r1", "r4")}
+    expected = [alert for event in events for alert in engines[event["src_device_key"]].process(event)]
+    replayed = [json.loads(line) for line in alerts_path.read_text(encoding="utf-8").splitlines()]
+    assert expected and sorted(replayed, key=lambda alert: alert["alert_id"]) == sorted(expected, key=lambda alert: alert["alert_id"])
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["events"] == 83 and report["accepted"] == 80 and report["alerts"] == len(expected)
+    assert report["drops"] == {"drop_duplicate_event_id": 1, "drop_missing_type": 1, "json_error": 1}
+    assert set(report["stage_cpu_sec"]) == {"read", "gate", "rules", "emit"}
+    assert [sample["events"] for sample in report["state_timeline"]] == [32, 64, 83]
+    assert report["state_stats"]["state_partitions"] == 2
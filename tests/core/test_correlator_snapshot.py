@@ -0,0 +1,129 @@
+import json
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+
+from common.infra.kafka_batch import BatchConsumer, KafkaBatchSettings, PipelinedSender, rebalance_listener
+from core.correlator.main import _process_batch
+from core.correlator.partition_state import CorrelatorState, PartitionStates
+from core.correlator.quality_gate import QualityGate
+from core.correlator.rules import RuleConfig, RuleEngine
+from core.correlator.snapshot import SnapshotStore, StateSnapshotter, decode_snapshot, encode_snapshot
+
+
+class _Future:
+    def get(self, timeout: float) -> None:
+        return None
+
+
+class _Producer:
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, bytes, str]] = []
+
+    def send(self, topic: str, key: bytes, value: str) -> _Future:
+        self.sent.append((topic, key, value))
+        return _Future()
+
+
+class _Consumer:
+    def __init__(self) -> None:
+        self.offsets: dict[tuple[str, int], int] = {}
+
+    def commit(self, offsets: dict) -> None:
+        for tp, meta in offsets.items():
+            self.offsets[(tp.topic, tp.partition)] = meta.offset
+
+    def committed(self, tp) -> int | None:
+        return self.offsets.get((tp.topic, tp.partition))
+
+
+def _state() -> CorrelatorState:
+    return CorrelatorState(QualityGate(), RuleEngine(RuleConfig(deny_threshold=3, cooldown_sec=600)))
+
+
+def _deny(offset: int, second: int) -> SimpleNamespace:
+    event = {
+        "event_id": f"e-{second}",
+        "event_ts": f"2026-03-09T00:00:{second:02d}+00:00",
+        "type": "traffic",
+        "subtype": "forward",
+        "action": "deny",
+        "src_device_key": "r1",
+        "srcip": "10.0.0.1",
+        "bytes_total": 10,
+    }
+    return SimpleNamespace(topic="raw", partition=0, offset=offset, value=json.dumps(event))
+
+
+def test_snapshot_round_trip_continues_windows_and_dedup() -> None:
+    live = _state()
+    for second in range(2):
+        live.gate.evaluate(json.loads(_deny(second, second).value))
+        live.engine.process(json.loads(_deny(second, second).value))
+
+    restored = _state()
+    snapshot = decode_snapshot(encode_snapshot(live, {("raw", 0): 2}))
+    assert snapshot["offsets"] == {("raw", 0): 2}
+    restored.gate.import_state(snapshot["gate"])
+    restored.engine.import_state(snapshot["engine"])
+
+    assert restored.gate.evaluate(json.loads(_deny(0, 0).value)) == (False, "duplicate_event_id")
+    next_event = json.loads(_deny(2, 2).value)
+    assert restored.engine.process(next_event) == live.engine.process(next_event)
+    assert restored.engine.export_state() == live.engine.export_state()
+
+
+def test_decode_rejects_unknown_version() -> None:
+    blob = bytearray(encode_snapshot(_state(), {("raw", 0): 1}))
+    blob[4] = 9
+    with pytest.raises(ValueError):
+        decode_snapshot(bytes(blob))
+
+
+def test_snapshotter_saves_after_commit_and_restores_on_assignment(tmp_path) -> None:
+    partition = SimpleNamespace(topic="raw", partition=0)
+    consumer = _Consumer()
+    producer = _Producer()
+
+    def run(messages: list[SimpleNamespace]) -> tuple[dict, PartitionStates]:
+        stats: dict[str, int] = defaultdict(int)
+        states = PartitionStates(_state)
+        batches = BatchConsumer(consumer, KafkaBatchSettings(commit_interval_sec=3600), stats)
+        store = SnapshotStore(str(tmp_path), producer, "correlator-changelog", "group-1")
+        snapshots = StateSnapshotter(states, batches, store, 0.0, stats)
+        snapshots.on_assigned([partition])
+        _process_batch(messages, states, PipelinedSender(producer), batches, "alerts", "dlq", stats)
+        snapshots.maybe_save()
+        return stats, states
+
+    first, _ = run([_deny(0, 0), _deny(1, 1)])
+    assert first["snapshots_written"] == 1
+    assert first["snapshot_bytes"] > 0
+    assert consumer.offsets == {("raw", 0): 2}
+    assert decode_snapshot((tmp_path / "raw-0.snap").read_bytes())["offsets"] == {("raw", 0): 2}
+    assert [key for topic, key, _ in producer.sent if topic == "correlator-changelog"] == [b"group-1/raw-0"]
+
+    second, _ = run([_deny(2, 2)])
+    assert second["restored_partitions"] == 1
+    alerts = [json.loads(value) for topic, _, value in producer.sent if topic == "alerts"]
+    assert [alert["metrics"]["deny_count"] for alert in alerts] == [3]
+
+
+def test_revoked_partition_is_snapshotted_at_its_committed_offset(tmp_path) -> None:
+    partition = SimpleNamespace(topic="raw", partition=0)
+    consumer = _Consumer()
+    producer = _Producer()
+    stats: dict[str, int] = defaultdict(int)
+    states = PartitionStates(_state)
+    batches = BatchConsumer(consumer, KafkaBatchSettings(commit_interval_sec=3600), stats)
+    snapshots = StateSnapshotter(states, batches, SnapshotStore(str(tmp_path)), 3600.0, stats)
+    listener = rebalance_listener(batches, snapshots.on_assigned, snapshots.on_revoked)
+
+    listener.on_partitions_assigned([partition])
+    _process_batch([_deny(0, 0), _deny(1, 1)], states, PipelinedSender(producer), batches, "alerts", "dlq", stats)
+    listener.on_partitions_revoked([partition])
+
+    assert stats["snapshots_written"] == 1
+    assert decode_snapshot((tmp_path / "raw-0.snap").read_bytes())["offsets"] == {("raw", 0): 2}
+    assert states.partitions() == [] and batches.tracker.committed() == {}
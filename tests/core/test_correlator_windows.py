@@ -0,0 +1,76 @@
+from core.correlator.rules import RuleConfig, RuleEngine
+from core.correlator.sketches import WindowedCountMin
+from core.correlator.windows import RingCounter
+
+
+def test_ring_counter_serves_several_windows_from_one_structure() -> None:
+    ring = RingCounter((10, 60))
+    for second in range(0, 61, 5):
+        ring.add(1000 + second + 0.5, value=second)
+
+    assert ring.count(60) == 13
+    assert ring.count(10) == 3
+    assert ring.total(10) == 50 + 55 + 60
+
+    ring.add(1100)
+    assert ring.count(60) == 6
+    assert ring.count(10) == 1
+    assert len(ring) == 6
+
+
+def test_ring_counter_late_events_and_slot_round_trip() -> None:
+    ring = RingCounter((5, 30))
+    ring.add(100, value=1)
+    ring.add(110, value=2)
+    ring.add(107.9, value=4)
+    ring.add(50, value=100)
+
+    assert (ring.count(5), ring.total(5)) == (2, 6)
+    assert (ring.count(30), ring.total(30)) == (3, 7)
+    assert ring.slots() == [(100, 1, 1), (107, 1, 4), (110, 1, 2)]
+
+    restored = RingCounter((5, 30))
+    restored.load(ring.slots())
+    assert (restored.count(5), restored.total(30)) == (2, 7)
+
+
+def test_engine_imports_per_event_windows_from_older_snapshots() -> None:
+    engine = RuleEngine(RuleConfig(deny_threshold=3, bytes_threshold=100))
+    engine.import_state(
+        {
+            "deny_windows": {"r1": [1773014400.2, 1773014401.7]},
+            "bytes_windows": {"10.0.0.1": [[1773014400.2, 60]]},
+        }
+    )
+
+    assert engine.export_state()["deny_windows"] == {"r1": [[1773014400, 1, 0], [1773014401, 1, 0]]}
+    event = {
+        "event_id": "e3",
+        "event_ts": "2026-03-09T00:00:02+00:00",
+        "action": "deny",
+        "src_device_key": "r1",
+        "srcip": "10.0.0.1",
+        "bytes_total": 50,
+    }
+    assert [alert["rule_id"] for alert in engine.process(event)] == ["deny_burst_v1", "bytes_spike_v1"]
+
+
+def test_windowed_count_min_slides_and_round_trips() -> None:
+    sketch = WindowedCountMin(window_sec=10, width=256, depth=4, top_k=2)
+    for second in range(10):
+        sketch.add("heavy", 1000 + second, count=5)
+        sketch.add(f"light-{second}", 1000 + second)
+
+    assert sketch.estimate("heavy") == 50
+    assert sketch.total == 60
+    assert [key for key, _ in sketch.heavy_hitters()][0] == "heavy"
+
+    restored = WindowedCountMin(window_sec=10, width=256, depth=4, top_k=2)
+    assert restored.import_state(sketch.export_state())
+    assert restored.estimate("heavy") == 50 and restored.in_top("heavy")
+    assert not WindowedCountMin(window_sec=10, width=128).import_state(sketch.export_state())
+
+    sketch.advance(1015)
+    assert sketch.estimate("heavy") == 25
+    assert sketch.total == 30
+    assert sketch.size_bytes == 6 * 256 * 4 * 4
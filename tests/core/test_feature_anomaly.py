@@ -0,0 +1,82 @@
+import json
+import random
+
+import pytest
+
+from core.correlator.anomaly import AnomalySpec, parse_anomaly_spec
+from core.correlator.rules import RuleConfig, RuleEngine
+
+
+def _fact(index: int, device: str, vector: object, second: int) -> dict:
+    return {
+        "event_id": f"f{index}",
+        "event_ts": f"2026-03-08T00:{second // 60:02d}:{second % 60:02d}Z",
+        "type": "telemetry",
+        "subtype": "monitoring",
+        "src_device_key": device,
+        "feature_vector": vector,
+    }
+
+
+def _facts(count: int, shifted: range) -> list[dict]:
+    rng = random.Random(3)
+    facts = []
+    for index in range(count):
+        device = f"r{index % 4}"
+        vector = {f"m{metric}": 100.0 * (metric + 1) + rng.gauss(0, 2) for metric in range(8)}
+        if device == "r1" and index in shifted:
+            vector.update(m0=400.0, m1=900.0, m2=1500.0)
+        facts.append(_fact(index, device, vector, index // 4))
+    return facts
+
+
+def test_feature_zscore_rule_alerts_on_multi_metric_shift_only() -> None:
+    config = RuleConfig(feature_anomaly=AnomalySpec(alpha=0.1, z_threshold=5.0, min_metrics=3, warmup=20))
+    facts = _facts(400, range(300, 304))
+    engine = RuleEngine(config)
+    results = [engine.process(fact) for fact in facts]
+    alerts = [alert for fact_alerts in results for alert in fact_alerts]
+
+    assert [alert["rule_id"] for alert in alerts] == ["feature_zscore_v1"]
+    assert alerts[0]["dimensions"] == {"src_device_key": "r1"}
+    metrics = alerts[0]["metrics"]
+    assert metrics["anomalous_metrics"] == 3 and metrics["metric_count"] == 8
+    assert set(metrics["top_metrics"]) == {"m0", "m1", "m2"}
+    assert metrics["max_abs_z"] >= 5.0
+
+    batched = RuleEngine(config)
+    assert [alerts for offset in range(0, 400, 64) for alerts in batched.process_batch(facts[offset : offset + 64])] == results
+    restored = RuleEngine(config)
+    restored.import_state(json.loads(json.dumps(engine.export_state())))
+    assert restored.export_state() == engine.export_state()
+    assert engine.state_stats()["feature_baseline_keys"] == 4
+
+
+def test_feature_anomaly_spec_validation() -> None:
+    assert parse_anomaly_spec(None) is None
+    assert parse_anomaly_spec({"enabled": False}) is None
+    assert parse_anomaly_spec({"z_threshold": 3, "plan_paths": ["plan.json"]}) == AnomalySpec(
+        z_threshold=3.0, plan_paths=("plan.json",)
+    )
+    with pytest.raises(ValueError, match="alpha"):
+        parse_anomaly_spec({"alpha": 0})
+
+
+def test_sparse_map_vectors_score_like_dense_ones() -> None:
+    spec = AnomalySpec(alpha=0.1, z_threshold=5.0, min_metrics=3, warmup=20)
+    facts = _facts(400, range(300, 304))
+    for index, fact in enumerate(facts):
+        # Metrics missing from a map read as missing values, wherever they sit in the layout.
+        fact["feature_vector"].pop(f"m{index % 8}" if index % 5 else "m7", None)
+    sparse = RuleEngine(RuleConfig(feature_anomaly=spec))
+    sparse_alerts = [alert for fact in facts for alert in sparse.process(fact)]
+
+    names = [f"m{metric}" for metric in range(8)]
+    dense = RuleEngine(RuleConfig(feature_anomaly=spec))
+    dense_alerts = []
+    for fact in facts:
+        dense_fact = {**fact, "feature_vector": {name: fact["feature_vector"].get(name) for name in names}}
+        dense_alerts.extend(dense.process(dense_fact))
+
+    assert sparse_alerts == dense_alerts and [alert["dimensions"] for alert in sparse_alerts] == [{"src_device_key": "r1"}]
+    assert sorted(sparse.export_state()["feature_baselines"]["r1"]["names"]) == names
@@ -0,0 +1,31 @@
+import json
+
+from core.benchmark.kafka_batch_bench import main
+
+
+def test_kafka_batch_bench_runs_every_service(monkeypatch, capsys) -> None:
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "kafka-batch-bench",
+            "--records",
+            "20",
+            "--agent-records",
+            "4",
+            "--max-records",
+            "8",
+            "--commit-latency-ms",
+            "0",
+            "--ack-latency-ms",
+            "0",
+            "--insert-latency-ms",
+            "0",
+        ],
+    )
+    main()
+
+    services = json.loads(capsys.readouterr().out)["services"]
+    assert sorted(services) == ["aiops_agent", "alerts_sink", "alerts_store", "correlator"]
+    for name, result in services.items():
+        expected = 4 if name == "aiops_agent" else 20
+        assert result["before"]["records"] == result["after"]["records"] == expected
@@ -0,0 +1,85 @@
+import json
+
+from core.benchmark.lcore_adaptive_prepare import main
+
+
+def _write_sample(path) -> None:
+    lines = ["timestamp,Device_name,ICMP loss,class"]
+    for idx in range(9):
+        label = "F" if idx % 4 == 3 else "H"
+        lines.append(f"{1760264160 + idx * 60},CORE-R{idx % 3 + 1},{idx * 10},{label}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _run(monkeypatch, input_path, output_path, plan_path, *extra: str) -> None:
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "lcore-adaptive-prepare",
+            "--input",
+            str(input_path),
+            "--output-jsonl",
+            str(output_path),
+            "--plan-json",
+            str(plan_path),
+            "--run-id",
+            "prepare-test",
+            *extra,
+        ],
+    )
+    main()
+
+
+def test_parallel_prepare_matches_serial_output_order_and_event_ids(tmp_path, monkeypatch) -> None:
+    input_path = tmp_path / "sample.csv"
+    _write_sample(input_path)
+
+    serial_path = tmp_path / "serial" / "events.jsonl"
+    parallel_path = tmp_path / "parallel" / "events.jsonl"
+    _run(monkeypatch, input_path, serial_path, tmp_path / "serial" / "plan.json")
+    _run(
+        monkeypatch,
+        input_path,
+        parallel_path,
+        tmp_path / "parallel" / "plan.json",
+        "--workers",
+        "2",
+        "--chunk-rows",
+        "2",
+    )
+
+    serial = serial_path.read_text(encoding="utf-8").splitlines()
+    parallel = parallel_path.read_text(encoding="utf-8").splitlines()
+
+    assert len(serial) == 9
+    assert parallel == serial
+    assert [json.loads(line)["dataset_context"]["row_index"] for line in parallel] == list(range(9))
+
+
+def test_sharded_prepare_writes_manifest_with_row_ranges(tmp_path, monkeypatch) -> None:
+    input_path = tmp_path / "sample.csv"
+    _write_sample(input_path)
+    output_path = tmp_path / "out" / "events.jsonl"
+
+    _run(
+        monkeypatch,
+        input_path,
+        output_path,
+        tmp_path / "out" / "plan.json",
+        "--workers",
+        "2",
+        "--chunk-rows",
+        "3",
+        "--shard-rows",
+        "4",
+    )
+
+    manifest = json.loads((tmp_path / "out" / "events.manifest.json").read_text(encoding="utf-8"))
+    shards = manifest["shards"]
+
+    assert manifest["events_written"] == 9
+    assert [shard["rows"] for shard in shards] == [4, 4, 1]
+    assert [shard["first_row_index"] for shard in shards] == [0, 4, 8]
+    first_shard = (tmp_path / "out" / "events-00000.jsonl").read_text(encoding="utf-8").splitlines()
+    assert json.loads(first_shard[0])["dataset_context"]["row_index"] == 0
+    assert not output_path.exists()
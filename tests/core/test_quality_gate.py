@@ -1,3 +1,4 @@
+from core.correlator.dedup import CuckooDedup
 from core.correlator.quality_gate import QualityGate
 
 
@@ -42,3 +43,36 @@ def test_quality_gate_drops_parse_status_not_ok() -> None:
     accepted, reason = gate.evaluate(event)
     assert accepted is False
     assert reason == "parse_status_not_ok"
+
+
+def test_cuckoo_dedup_drops_duplicates_and_survives_snapshot() -> None:
+    gate = QualityGate(dedup_cache_size=10000, dedup_backend="cuckoo")
+    assert gate.evaluate(_base_event("dup-1")) == (True, "accepted")
+    assert gate.evaluate(_base_event("dup-1")) == (False, "duplicate_event_id")
+
+    restored = QualityGate(dedup_cache_size=10000, dedup_backend="cuckoo")
+    restored.import_state(gate.export_state())
+    assert restored.evaluate(_base_event("dup-1")) == (False, "duplicate_event_id")
+    assert restored.state_stats()["dedup_bytes_approx"] < 10000 * 5
+
+    from_exact = QualityGate(dedup_cache_size=10000, dedup_backend="cuckoo")
+    from_exact.import_state({"seen_order": ["old-1"]})
+    assert from_exact.evaluate(_base_event("old-1")) == (False, "duplicate_event_id")
+
+
+def test_cuckoo_dedup_rotates_generations_by_count_and_time() -> None:
+    now = [0.0]
+    dedup = CuckooDedup(100, fp_rate=0.001, generation_sec=60, clock=lambda: now[0])
+    assert dedup.check_and_add("a") is False
+    for index in range(150):
+        dedup.check_and_add(f"fill-{index}")
+    assert dedup.state_stats()["dedup_rotations"] == 1
+    assert dedup.check_and_add("a") is True
+
+    now[0] = 61.0
+    dedup.check_and_add("b")
+    now[0] = 122.0
+    dedup.check_and_add("c")
+    assert dedup.state_stats()["dedup_rotations"] == 3
+    assert dedup.check_and_add("a") is False
+    assert dedup.check_and_add("b") is True
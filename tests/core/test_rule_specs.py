@@ -0,0 +1,118 @@
+import dataclasses
+
+import pytest
+
+from core.correlator.rule_profile import load_rule_config
+from core.correlator.rule_specs import RuleSet, parse_rule_specs
+from core.correlator.rules import RuleConfig, RuleEngine
+
+
+def _event(event_id: str, second: int, **fields: object) -> dict:
+    event = {
+        "event_id": event_id,
+        "event_ts": f"2026-03-08T00:00:{second:02d}Z",
+        "type": "traffic",
+        "subtype": "forward",
+        "action": "accept",
+        "src_device_key": "dev-1",
+        "srcip": "10.0.0.1",
+        "bytes_total": 0,
+    }
+    event.update(fields)
+    return event
+
+
+def test_declarative_profile_reproduces_builtin_rules(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CORRELATOR_RULE_PROFILE", "declarative_20260308")
+    profile_config = load_rule_config()
+    assert [spec.rule_id for spec in profile_config.rule_specs] == ["deny_burst_v1", "bytes_spike_v1"]
+
+    builtin = RuleConfig(deny_threshold=3, bytes_threshold=250, cooldown_sec=5, max_state_keys=0)
+    deny_spec, bytes_spec = profile_config.rule_specs
+    specs = (
+        dataclasses.replace(deny_spec, threshold=builtin.deny_threshold, cooldown_sec=5),
+        dataclasses.replace(bytes_spec, threshold=builtin.bytes_threshold, cooldown_sec=5),
+    )
+    declarative = dataclasses.replace(builtin, rule_specs=specs)
+    events = [
+        _event(
+            f"e{index}",
+            index // 3,
+            action="deny" if index % 2 else "accept",
+            src_device_key=f"dev-{index % 2}",
+            bytes_total=40 * (index % 5),
+        )
+        for index in range(60)
+    ]
+
+    expected = RuleEngine(builtin)
+    actual = RuleEngine(declarative)
+    expected_alerts = [expected.process(event) for event in events]
+    assert [actual.process(event) for event in events] == expected_alerts
+    assert {alert["rule_id"] for alerts in expected_alerts for alert in alerts} == {"deny_burst_v1", "bytes_spike_v1"}
+    assert actual.export_state()["deny_windows"] == {}
+    assert set(actual.export_state()["spec_rules"]) == {"deny_burst_v1", "bytes_spike_v1"}
+
+
+def test_rule_set_only_runs_rules_admitted_by_the_index() -> None:
+    specs = parse_rule_specs(
+        [
+            {
+                "rule_id": "vpn_login_fail",
+                "match": {"type": "event", "subtype": ["vpn", "user"], "action": "login_fail"},
+                "group_by": ["srcip", ["user", "srcname"]],
+                "window": {"sec": 30},
+                "threshold": 2,
+            },
+            {
+                "rule_id": "large_transfer",
+                "match": {"bytes_total": {"gte": 1000}, "dstip": {"exists": True}},
+                "group_by": ["dstip"],
+                "aggregate": {"op": "sum", "field": "bytes_total"},
+                "threshold": 5000,
+            },
+        ]
+    )
+    rules = RuleSet(specs)
+    login = {"type": "EVENT", "subtype": "vpn", "action": "login_fail", "srcip": "1.2.3.4", "srcname": "alice"}
+    transfer = {"type": "traffic", "action": "accept", "bytes_total": "4000", "dstip": "8.8.8.8"}
+
+    assert [rule.spec.rule_id for rule in rules.matching(login)] == ["vpn_login_fail"]
+    assert [rule.spec.rule_id for rule in rules.matching(transfer)] == ["large_transfer"]
+    assert rules.matching({**transfer, "dstip": ""}) == []
+
+    engine = RuleEngine(RuleConfig(rule_specs=specs))
+    assert engine.process({**login, "event_id": "l1", "event_ts": "2026-03-08T00:00:00Z"}) == []
+    alert = engine.process({**login, "event_id": "l2", "event_ts": "2026-03-08T00:00:10Z"})[0]
+    assert alert["dimensions"] == {"srcip": "1.2.3.4", "user": "alice"}
+    assert alert["metrics"] == {"count": 2, "window_sec": 30, "threshold": 2}
+
+
+def test_invalid_rule_specs_are_rejected() -> None:
+    with pytest.raises(ValueError, match="unknown aggregate"):
+        parse_rule_specs([{"rule_id": "r", "group_by": ["srcip"], "aggregate": {"op": "median"}, "threshold": 1}])
+    with pytest.raises(ValueError, match="distinct needs a field"):
+        parse_rule_specs([{"rule_id": "r", "group_by": ["srcip"], "aggregate": {"op": "distinct"}, "threshold": 1}])
+    with pytest.raises(ValueError, match="duplicate rule_id"):
+        parse_rule_specs([{"rule_id": "r", "group_by": ["srcip"], "threshold": 1}] * 2)
+
+
+def test_distinct_rule_estimates_scan_cardinality_and_round_trips(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CORRELATOR_RULE_PROFILE", "scan_detect_20260308")
+    config = load_rule_config()
+    assert [spec.rule_id for spec in config.rule_specs] == ["port_scan_v1", "host_sweep_v1"]
+
+    engine = RuleEngine(config)
+    alerts = []
+    for index in range(120):
+        alerts += engine.process(_event(f"s{index}", index // 4, srcip="10.9.9.9", dstip="192.168.1.5", dstport=index))
+        alerts += engine.process(_event(f"n{index}", index // 4, srcip="10.0.0.2", dstip="8.8.8.8", dstport=443))
+
+    assert [(alert["rule_id"], alert["dimensions"]) for alert in alerts] == [("port_scan_v1", {"srcip": "10.9.9.9"})]
+    metrics = alerts[0]["metrics"]
+    assert abs(metrics["distinct_dstport"] - 100) <= metrics["estimate_error_bound"]
+    assert metrics["estimate_error_bound"] > 0
+
+    restored = RuleEngine(config)
+    restored.import_state(engine.export_state())
+    assert restored.export_state() == engine.export_state()
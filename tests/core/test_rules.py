@@ -253,3 +253,130 @@ def test_alert_prefers_structured_context_when_event_already_contains_it() -> No
     assert alert["device_profile"]["asset_tags"] == ["iot", "lab"]
     assert alert["change_context"]["change_window_min"] == 30
     assert alert["change_context"]["change_refs"] == ["chg-1"]
+
+
+def test_state_maps_expire_by_event_time_and_spill_over_the_key_cap() -> None:
+    engine = RuleEngine(
+        RuleConfig(deny_window_sec=60, deny_threshold=2, bytes_window_sec=300, cooldown_sec=60, max_state_keys=3)
+    )
+    for index in range(5):
+        engine.process(_event(f"e{index}", "2026-03-08T00:00:00Z", action="deny", srcip=f"10.0.0.{index}", bytes_total=10))
+
+    stats = engine.state_stats()
+    assert (stats["deny_window_keys"], stats["bytes_window_keys"]) == (1, 3)
+    assert stats["state_evicted_lru"] == 2
+    assert stats["rule_state_bytes_approx"] > 0
+
+    engine.process(_event("e5", "2026-03-08T00:02:00Z", src_device_key="dev-2", srcip="10.0.0.9", bytes_total=10))
+    stats = engine.state_stats()
+    assert (stats["deny_window_keys"], stats["cooldown_keys"], stats["bytes_window_keys"]) == (0, 0, 3)
+
+    engine.process(_event("e6", "2026-03-08T00:05:01Z", src_device_key="dev-2", srcip="10.0.0.9", bytes_total=10))
+    assert engine.state_stats()["bytes_window_keys"] == 1
+
+
+def test_process_batch_matches_per_event_processing() -> None:
+    config = RuleConfig(deny_window_sec=5, deny_threshold=3, bytes_window_sec=10, bytes_threshold=250, cooldown_sec=2)
+    events = []
+    for index in range(40):
+        second = index // 6
+        if index in (23, 35):
+            second -= 3  # late event
+        events.append(
+            _event(
+                f"e{index}",
+                f"2026-03-08T00:00:{second:02d}.{index % 10}Z",
+                action="deny" if index % 3 else "allow",
+                src_device_key=f"dev-{index % 2}",
+                srcip=f"10.0.0.{index % 3}",
+                bytes_total=40 * (index % 4),
+            )
+        )
+    events.insert(10, {"event_id": "bad", "event_ts": "not-a-time", "action": "deny"})
+
+    sequential = RuleEngine(config)
+    expected = [sequential.process(event) for event in events]
+    batched = RuleEngine(config)
+    actual = batched.process_batch(events[:17]) + batched.process_batch(events[17:])
+
+    assert actual == expected
+    assert sum(len(alerts) for alerts in actual) > 3
+    assert batched.export_state() == sequential.export_state()
+
+
+def test_prefilter_skips_healthy_rows_but_clears_tracked_faults() -> None:
+    engine = RuleEngine(RuleConfig(deny_threshold=999999, bytes_threshold=10**12, cooldown_sec=0))
+
+    def row(event_id: str, second: int, is_fault: bool) -> dict:
+        event = _event(event_id, f"2026-03-08T00:00:{second:02d}Z", action="observe", src_device_key="router-1")
+        event["fault_context"] = {"is_fault": is_fault, "scenario": "node down" if is_fault else "healthy"}
+        return event
+
+    assert engine.process(row("h1", 0, False)) == []
+    assert engine.process(_event("n1", "2026-03-08T00:00:01Z", action="observe")) == []
+    assert (engine.state_stats()["rule_events"], engine.state_stats()["prefilter_skipped"]) == (2, 2)
+
+    assert len(engine.process(row("f1", 2, True))) == 1
+    assert engine.process(row("h2", 3, False)) == []
+    assert engine.state_stats()["fault_state_keys"] == 0
+    assert len(engine.process(row("f2", 4, True))) == 1
+    assert engine.state_stats()["prefilter_skipped"] == 2
+
+
+def test_heavy_hitter_deny_mode_ignores_spoofed_sources() -> None:
+    engine = RuleEngine(RuleConfig(deny_threshold=20, cooldown_sec=60, deny_mode="heavy_hitter", deny_sketch_width=512))
+    alerts = []
+    for index in range(6000):
+        source = "scanner" if index % 50 == 0 else f"spoofed-{index}"
+        second = index // 100
+        alerts += engine.process(
+            _event(f"e{index}", f"2026-03-08T00:{second // 60:02d}:{second % 60:02d}Z", action="deny", src_device_key=source)
+        )
+
+    assert [alert["dimensions"]["src_device_key"] for alert in alerts] == ["scanner"]
+    metrics = alerts[0]["metrics"]
+    assert metrics["deny_count"] - metrics["estimate_error_bound"] >= 20
+    stats = engine.state_stats()
+    assert stats["deny_window_keys"] == 0
+    assert stats["deny_heavy_hitters"] >= 1
+
+
+
+def test_storm_summary_mode_reports_suppressed_repeats_per_alert_key() -> None:
+    def ts(second: float) -> str:
+        minutes, seconds = divmod(second, 60)
+        return f"2026-03-08T00:{int(minutes):02d}:{seconds:06.3f}Z"
+
+    # Four denies per second for ten minutes, then one unrelated event after the storm went quiet.
+    events = [_event(f"e{index}", ts(index / 4), action="deny") for index in range(2400)]
+    events.append(_event("late", ts(1200)))
+    config = RuleConfig(deny_threshold=10, bytes_threshold=10**12, cooldown_sec=60)
+    off_engine = RuleEngine(config)
+    assert len([alert for event in events for alert in off_engine.process(event)]) == 10
+
+    config = RuleConfig(
+        deny_threshold=10,
+        bytes_threshold=10**12,
+        cooldown_sec=60,
+        storm_mode="summary",
+        storm_window_sec=120,
+        storm_summary_interval_sec=300,
+    )
+    engine = RuleEngine(config)
+    results = [engine.process(event) for event in events]
+    alerts = [alert for event_alerts in results for alert in event_alerts]
+
+    assert [alert.get("storm_status") for alert in alerts] == [None, "ongoing", "ended"]
+    parent, ongoing, ended = alerts
+    assert results[9] == [parent] and results[-1] == [ended]
+    assert ongoing["parent_alert_id"] == ended["parent_alert_id"] == parent["alert_id"]
+    assert "event_excerpt" not in ongoing and ongoing["dimensions"] == {"src_device_key": "dev-1"}
+    assert ongoing["metrics"]["suppressed_count"] + ended["metrics"]["suppressed_count"] == 2390
+    assert ended["metrics"]["storm_suppressed_total"] == 2390
+    assert ended["metrics"]["last_ts"] == "2026-03-08T00:09:59.750000+00:00"
+    # A 60 s window covers 61 whole seconds.
+    assert ended["metrics"]["max_deny_count"] == 244
+    assert engine.state_stats()["alert_storm_keys"] == 0
+
+    batched = RuleEngine(config)
+    assert [alerts for offset in range(0, len(events), 500) for alerts in batched.process_batch(events[offset : offset + 500])] == results
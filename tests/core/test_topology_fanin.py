@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from core.benchmark.correlator_replay import main as replay_main
+from core.correlator.rules import RuleConfig, RuleEngine
+from core.correlator.topology import FanInSpec, topology_neighbors
+
+_RING = [f"CORE-R{index}" for index in range(1, 7)]
+
+
+def _fact(event_id: str, device: str, second: int, fault: bool) -> dict:
+    position = _RING.index(device)
+    neighbors = [_RING[position - 1], _RING[(position + 1) % len(_RING)]]
+    return {
+        "event_id": event_id,
+        "event_ts": f"2026-03-08T00:{second // 60:02d}:{second % 60:02d}Z",
+        "type": "telemetry",
+        "src_device_key": device,
+        "topology_context": {"neighbor_refs": neighbors, "path_signature": f"{device}->{neighbors[1]}"},
+        "fault_context": {"is_fault": fault, "scenario": "link down" if fault else "healthy"},
+    }
+
+
+def _facts() -> list[dict]:
+    facts = []
+    for second in range(240):
+        for device in _RING:
+            fault = (device in ("CORE-R2", "CORE-R3") and 30 <= second < 90) or (device == "CORE-R5" and 60 <= second < 70)
+            fault = fault or (device == "CORE-R4" and 80 <= second < 90)
+            facts.append(_fact(f"{device}-{second}", device, second, fault))
+    return facts
+
+
+def test_adjacent_faults_raise_one_cluster_alert() -> None:
+    config = RuleConfig(topology_fanin=FanInSpec(window_sec=30))
+    facts = _facts()
+    engine = RuleEngine(config)
+    results = [engine.process(fact) for fact in facts]
+    alerts = [alert for fact_alerts in results for alert in fact_alerts]
+
+    assert [(alert["rule_id"], alert["dimensions"]["src_device_key"]) for alert in alerts] == [
+        ("annotated_fault_v1", "CORE-R2"),
+        ("topology_fanin_v1", "CORE-R3"),
+        ("annotated_fault_v1", "CORE-R5"),
+    ]
+    cluster_alert = alerts[1]
+    assert cluster_alert["dimensions"]["topology_cluster"] == "CORE-R2"
+    assert cluster_alert["metrics"]["member_devices"] == ["CORE-R2", "CORE-R3"]
+    # CORE-R4 later joins the alerted cluster and bridges CORE-R5 into it without a new alert.
+    assert engine.state_stats()["topology_faulting_devices"] == 0
+
+    batched = RuleEngine(config)
+    assert [alerts for offset in range(0, len(facts), 50) for alerts in batched.process_batch(facts[offset : offset + 50])] == results
+
+    unsuppressed = RuleEngine(RuleConfig(topology_fanin=FanInSpec(window_sec=30, suppress_member_alerts=False)))
+    rule_ids = [alert["rule_id"] for fact in facts for alert in unsuppressed.process(fact)]
+    assert rule_ids.count("annotated_fault_v1") == 4 and rule_ids.count("topology_fanin_v1") == 1
+
+
+def test_storm_summaries_with_fanin_only_refer_to_published_alerts() -> None:
+    config = RuleConfig(
+        cooldown_sec=30,
+        topology_fanin=FanInSpec(window_sec=30),
+        storm_mode="summary",
+        storm_window_sec=60,
+        storm_summary_interval_sec=20,
+    )
+    facts = _facts()
+    engine = RuleEngine(config)
+    results = [engine.process(fact) for fact in facts]
+    alerts = [alert for fact_alerts in results for alert in fact_alerts]
+
+    published = {alert["alert_id"] for alert in alerts if alert.get("alert_kind") != "storm_summary"}
+    summaries = [alert for alert in alerts if alert.get("alert_kind") == "storm_summary"]
+    assert {alert["parent_alert_id"] for alert in summaries} <= published
+    # Member faults after the cluster alert, CORE-R2's included, are counted in the cluster's storm.
+    cluster = [alert for alert in summaries if alert["rule_id"] == "topology_fanin_v1"]
+    assert [alert["storm_status"] for alert in cluster] == ["ongoing", "ongoing", "ended"]
+    assert cluster[-1]["metrics"]["storm_suppressed_total"] == 128
+
+    batched = RuleEngine(config)
+    assert [alerts for offset in range(0, len(facts), 50) for alerts in batched.process_batch(facts[offset : offset + 50])] == results
+
+
+def test_fanin_state_round_trips_and_neighbors_come_from_topology_context() -> None:
+    config = RuleConfig(topology_fanin=FanInSpec(window_sec=300))
+    engine = RuleEngine(config)
+    for second, device in enumerate(["CORE-R2", "CORE-R3"]):
+        engine.process(_fact(f"f{second}", device, second, True))
+
+    restored = RuleEngine(config)
+    restored.import_state(json.loads(json.dumps(engine.export_state())))
+    assert restored.export_state() == engine.export_state()
+    assert [alert["rule_id"] for alert in restored.process(_fact("f9", "CORE-R4", 9, True))] == []
+
+    topology = {"neighbor_refs": ["CORE-R1", "", "CORE-R2"], "path_signature": "CORE-R2->link-7->CORE-R9"}
+    assert topology_neighbors(topology, "CORE-R2") == ["CORE-R1", "link-7", "CORE-R9"]
+    assert topology_neighbors({"path_signature": "CORE-R2|hop_core=1"}, "CORE-R2") == []
+
+
+@pytest.mark.parametrize(
+    ("args", "expected"),
+    [
+        (["--partitions", "1"], ["annotated_fault_v1", "topology_fanin_v1", "annotated_fault_v1"]),
+        (["--partitions", "6", "--state-scope", "global"], ["annotated_fault_v1", "topology_fanin_v1", "annotated_fault_v1"]),
+        # Device-keyed partitions split the ring, so fan-in is disabled rather than run on part of each cluster.
+        (["--partitions", "6"], ["annotated_fault_v1"] * 4),
+    ],
+)
+def test_fanin_runs_only_where_one_state_sees_every_device(tmp_path, monkeypatch, args, expected) -> None:
+    capture = tmp_path / "facts.jsonl"
+    capture.write_text("".join(json.dumps({**fact, "subtype": "monitoring"}) + "\n" for fact in _facts()), encoding="utf-8")
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps({"topology_fanin": {"window_sec": 30}}), encoding="utf-8")
+    output = tmp_path / "alerts.jsonl"
+    # The replay sets the profile path in the environment as the pod would see it.
+    monkeypatch.delenv("CORRELATOR_RULE_PROFILE_PATH", raising=False)
+    monkeypatch.setattr(
+        "sys.argv",
+        ["correlator-replay", "--input", str(capture), "--profile-path", str(profile), "--output-jsonl", str(output), *args],
+    )
+    replay_main()
+
+    alerts = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [alert["rule_id"] for alert in alerts] == expected
@@ -0,0 +1,61 @@
+from edge.lcore_streamer.pacing import PacingStats, SourceTimePacer, TokenBucketPacer, event_epoch
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_paces_on_absolute_deadlines() -> None:
+    clock = _FakeClock()
+    pacer = TokenBucketPacer(10.0, burst=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        pacer.wait()
+    assert clock.sleeps == []
+
+    pacer.wait()
+    pacer.wait()
+    assert clock.sleeps == [0.1, 0.1]
+
+    # Per-row work that overruns the interval is reported as lag, not added as drift.
+    clock.now += 0.35
+    lag = pacer.wait()
+    assert round(lag, 6) == 0.05
+    pacer.wait()
+    assert clock.sleeps == [0.1, 0.1]
+
+
+def test_source_time_pacer_scales_inter_arrival_and_compresses_gaps() -> None:
+    clock = _FakeClock()
+    pacer = SourceTimePacer(speed=2.0, max_gap_sec=30.0, clock=clock, sleep=clock.sleep)
+
+    pacer.wait(event_epoch({"event_ts": "2026-01-01T00:00:00+00:00"}))
+    pacer.wait(event_epoch({"event_ts": "2026-01-01T00:00:10+00:00"}))
+    pacer.wait(event_epoch({"event_ts": "2026-01-01T02:00:00Z"}))
+    pacer.wait(event_epoch({"event_ts": "2026-01-01T00:00:00+00:00"}))
+
+    assert clock.sleeps == [5.0, 15.0]
+
+
+def test_pacing_stats_reports_window_and_resets() -> None:
+    clock = _FakeClock()
+    stats = PacingStats(clock=clock)
+    stats.observe(0.002)
+    stats.observe(0.004)
+    clock.now += 2.0
+
+    report = stats.report()
+    assert report["emitted"] == 2
+    assert report["achieved_eps"] == 1.0
+    assert report["lag_avg_ms"] == 3.0
+    assert report["lag_max_ms"] == 4.0
+    assert stats.report()["lag_max_ms"] == 0.0
@@ -0,0 +1,154 @@
+import json
+
+import pytest
+
+from edge.lcore_streamer.main import main
+from edge.lcore_streamer.sharding import ShardSpec, combined_checkpoint, run_shard_group
+
+
+def test_shard_specs_partition_rows_exactly_once() -> None:
+    for mode in ("modulo", "range"):
+        specs = [ShardSpec(3, index, mode, total_rows=10) for index in range(3)]
+        owners = [[spec.index for spec in specs if spec.owns(row)] for row in range(10)]
+        assert owners == [[owner[0]] for owner in owners]
+    assert [ShardSpec(3, index, "range", 10).bounds() for index in range(3)] == [(0, 4), (4, 7), (7, 10)]
+
+
+def test_combined_checkpoint_low_watermark_is_slowest_shard() -> None:
+    spec = ShardSpec(2, 0, "modulo")
+    combined = combined_checkpoint(
+        spec,
+        "run-1",
+        [{"next_row_index": 7, "pacing": {"emitted": 4}}, {"next_row_index": 4, "pacing": {"emitted": 2}}],
+        elapsed_sec=2.0,
+    )
+    assert combined["low_watermark_row_index"] == 4
+    assert combined["emitted"] == 6
+    assert combined["aggregate_eps"] == 3.0
+    assert [item["next_row_index"] for item in combined["shard_positions"]] == [7, 4]
+
+
+def test_shard_group_writes_final_checkpoint_when_all_shards_exit_between_polls(tmp_path, monkeypatch) -> None:
+    class _Shard:
+        # Running at the coordinator's first poll, exited by the time it looks for one to wait on.
+        def __init__(self, *args, **kwargs) -> None:
+            self.polls = 0
+
+        def poll(self) -> int | None:
+            self.polls += 1
+            return None if self.polls == 1 else 0
+
+        def wait(self, timeout: float | None = None) -> int:
+            return 0
+
+    monkeypatch.setattr("edge.lcore_streamer.sharding.subprocess.Popen", _Shard)
+    saved: list[dict] = []
+    code = run_shard_group(
+        [],
+        ShardSpec(2, 0, "modulo"),
+        "run-1",
+        0.0,
+        0,
+        tmp_path / "checkpoint.json",
+        lambda path, checkpoint: saved.append(checkpoint),
+        lambda path: {"next_row_index": 3, "pacing": {"emitted": 3}},
+        poll_sec=0.0,
+    )
+    assert code == 0
+    assert len(saved) == 3 and saved[-1]["emitted"] == 6
+
+
+def test_sharded_streamer_matches_single_process_output(tmp_path, monkeypatch) -> None:
+    input_path = tmp_path / "sample.csv"
+    input_path.write_text(
+        "timestamp,Device_name,ICMP loss,class\n"
+        + "".join(f"{1760264160 + idx * 60},CORE-R{idx % 3},{idx % 2 * 100},{'F' if idx % 2 else 'H'}\n" for idx in range(7)),
+        encoding="utf-8",
+    )
+
+    def run(name: str, extra: list[str]) -> None:
+        monkeypatch.setattr(
+            "sys.argv",
+            [
+                "lcore-streamer",
+                "--input",
+                str(input_path),
+                "--output-jsonl",
+                str(tmp_path / name / "events.jsonl"),
+                "--plan-json",
+                str(tmp_path / name / "feature-plan.json"),
+                "--checkpoint-json",
+                str(tmp_path / name / "checkpoint.json"),
+                "--events-per-second",
+                "0",
+                "--run-id",
+                "shard-smoke",
+                "--reset-output",
+                *extra,
+            ],
+        )
+        main()
+
+    def events(pattern: str) -> list[dict]:
+        rows = [json.loads(line) for path in sorted(tmp_path.glob(pattern)) for line in path.read_text(encoding="utf-8").splitlines()]
+        for row in rows:
+            row.pop("ingest_ts")
+        return sorted(rows, key=lambda row: row["dataset_context"]["row_index"])
+
+    run("single", [])
+    run("sharded", ["--shards", "2", "--shard-mode", "range"])
+
+    assert events("sharded/events-shard*.jsonl") == events("single/events.jsonl")
+    checkpoint = json.loads((tmp_path / "sharded" / "checkpoint.json").read_text(encoding="utf-8"))
+    assert checkpoint["shards"] == 2
+    assert checkpoint["total_rows"] == 7
+    assert [item["next_row_index"] for item in checkpoint["shard_positions"]] == [4, 7]
+    assert checkpoint["emitted"] == 7
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_device_sharded_streamer_keeps_each_device_on_one_shard(tmp_path, monkeypatch, use_cache) -> None:
+    input_path = tmp_path / "sample.csv"
+    input_path.write_text(
+        "timestamp,Device_name,ICMP loss,class\n"
+        + "".join(f"{1760264160 + idx * 60},CORE-R{idx % 5},{idx % 2 * 100},{'F' if idx % 2 else 'H'}\n" for idx in range(20)),
+        encoding="utf-8",
+    )
+    extra = ["--replay-cache", str(tmp_path / "replay.bin")] if use_cache else []
+
+    def run(name: str, args: list[str]) -> list[list[dict]]:
+        monkeypatch.setattr(
+            "sys.argv",
+            [
+                "lcore-streamer",
+                "--input",
+                str(input_path),
+                "--output-jsonl",
+                str(tmp_path / name / "events.jsonl"),
+                "--plan-json",
+                str(tmp_path / name / "feature-plan.json"),
+                "--checkpoint-json",
+                str(tmp_path / name / "checkpoint.json"),
+                "--events-per-second",
+                "0",
+                "--run-id",
+                "device-shards",
+                "--reset-output",
+                *extra,
+                *args,
+            ],
+        )
+        main()
+        return [
+            [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+            for path in sorted((tmp_path / name).glob("events*.jsonl"))
+        ]
+
+    single = run("single", [])[0]
+    shards = run("sharded", ["--shards", "3", "--shard-mode", "device"])
+
+    devices_per_shard = [{event["src_device_key"] for event in shard} for shard in shards]
+    assert sum(len(devices) for devices in devices_per_shard) == 5
+    assert set().union(*devices_per_shard) == {event["src_device_key"] for event in single}
+    merged = sorted((event for shard in shards for event in shard), key=lambda event: event["dataset_context"]["row_index"])
+    assert [event["event_id"] for event in merged] == [event["event_id"] for event in single]
@@ -99,6 +99,62 @@ def test_lcore_streamer_loop_uses_new_event_ids_per_loop(tmp_path, monkeypatch)
     assert events[0]["event_id"] != events[1]["event_id"]
 
 
+def test_lcore_streamer_replay_cache_matches_direct_path(tmp_path, monkeypatch) -> None:
+    input_path = tmp_path / "sample.csv"
+    input_path.write_text(
+        "timestamp,Device_name,ICMP loss,class\n"
+        "1760264160,CORE-R1,0,H\n"
+        "1760264220,CORE-R1,100,F\n",
+        encoding="utf-8",
+    )
+
+    def run(output_name: str, extra: list[str]) -> list[dict]:
+        output_path = tmp_path / "output" / output_name
+        monkeypatch.setattr(
+            "sys.argv",
+            [
+                "lcore-streamer",
+                "--input",
+                str(input_path),
+                "--output-jsonl",
+                str(output_path),
+                "--plan-json",
+                str(tmp_path / "work" / "feature-plan.json"),
+                "--checkpoint-json",
+                str(tmp_path / "work" / f"{output_name}.checkpoint.json"),
+                "--events-per-second",
+                "0",
+                "--run-id",
+                "cache-smoke",
+                "--loop",
+                "--max-loops",
+                "2",
+                "--loop-sleep-seconds",
+                "0",
+                "--reset-output",
+                *extra,
+            ],
+        )
+        main()
+        return [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+
+    cache_path = tmp_path / "work" / "replay.lcrc"
+    direct = run("direct.jsonl", [])
+    cached = run("cached.jsonl", ["--replay-cache", str(cache_path)])
+    rerun = run("rerun.jsonl", ["--replay-cache", str(cache_path)])
+
+    assert cache_path.exists()
+    assert len(cached) == len(direct) == 4
+
+    def strip(event: dict) -> dict:
+        return {key: value for key, value in event.items() if key != "ingest_ts"}
+
+    # Both paths derive event ids from the same row digest, so switching paths keeps ids stable.
+    assert [strip(event) for event in cached] == [strip(event) for event in direct]
+    assert len({event["event_id"] for event in cached}) == 4
+    assert [event["event_id"] for event in rerun] == [event["event_id"] for event in cached]
+
+
 def test_lcore_compact_class_labels_are_normalized() -> None:
     from common.data_features import AdaptiveFeatureExtractor, row_to_canonical_event
 